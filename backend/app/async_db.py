@@ -0,0 +1,48 @@
+# app/async_db.py
+# Async access to the SQLite layer. Database functions run on a dedicated
+# executor, so they never queue behind slow upstream calls in FastAPI's
+# shared threadpool, and async endpoints simply await them.
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.database import DB_POOL_SIZE
+from app.metrics import ExecutorStats
+
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", str(max(DB_POOL_SIZE, 4))))
+
+_db_executor = None
+_db_executor_lock = threading.Lock()
+db_executor_stats = ExecutorStats("sqlite")
+
+def get_db_executor():
+    """The database executor, created on first use (and again after a shutdown)"""
+    global _db_executor
+    if _db_executor is None:
+        with _db_executor_lock:
+            if _db_executor is None:
+                _db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="sqlite")
+                db_executor_stats.max_workers = DB_EXECUTOR_WORKERS
+    return _db_executor
+
+async def run_db(func, *args, **kwargs):
+    """Run a blocking app.database function on the database executor"""
+    loop = asyncio.get_running_loop()
+    db_executor_stats.inflight += 1
+    try:
+        return await loop.run_in_executor(get_db_executor(), functools.partial(func, *args, **kwargs))
+    finally:
+        db_executor_stats.inflight -= 1
+
+
+def shutdown_db_executor():
+    """Stop the executor (called on shutdown); the next run_db starts a new one"""
+    global _db_executor
+    with _db_executor_lock:
+        if _db_executor is not None:
+            _db_executor.shutdown(wait=True)
+            _db_executor = None
+            db_executor_stats.max_workers = None
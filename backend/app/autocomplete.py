@@ -0,0 +1,266 @@
+# app/autocomplete.py
+# Search-box completions for /foods/autocomplete: catalog names plus the
+# names already looked up on Nutritionix (the nutrition_cache table), ranked
+# by how often each name was logged (food_usage). Never calls upstream.
+#
+# Names are numbered in rank order (most logged, then shorter, then
+# alphabetical), so "best k" means "k smallest ranks", and kept sorted
+# (folded) alongside their ranks: the names starting with a prefix are one
+# contiguous slice, found with two bisections. Every prefix matching more
+# than AUTOCOMPLETE_NODE_SIZE names (a heavy trie node) stores its best
+# AUTOCOMPLETE_MAX_K ranks, merged bottom-up from its children; any other
+# prefix takes nsmallest over its slice. A lookup therefore touches at most
+# AUTOCOMPLETE_NODE_SIZE ranks however large the catalog is.
+#
+# The index lives in memory in two layers. The base holds the catalog and
+# the cached names as of its build, ranked by length and name only; it is
+# built on first use and rebuilt in the background only when the catalog
+# changes, and lookups keep using the previous one meanwhile. A small
+# overlay holds the logged names with their uses plus the names cached since
+# the base was built; it is rebuilt in place when either changes (checked at
+# most every AUTOCOMPLETE_REFRESH_SECONDS) and merged with the base per
+# lookup, so logging a food never rebuilds the base.
+
+import heapq
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from itertools import chain
+
+from app.database import db_connection
+from app.fuzzy import fold
+from app.metrics import instrument_db
+
+AUTOCOMPLETE_DEFAULT_K = 8
+AUTOCOMPLETE_MAX_K = 20
+AUTOCOMPLETE_NODE_SIZE = 256  # prefixes matching more names than this keep a precomputed top-k
+AUTOCOMPLETE_REFRESH_SECONDS = float(os.getenv("AUTOCOMPLETE_REFRESH_SECONDS", "30"))
+
+# Amount in front of a cached Nutritionix query ("100g banana", "1 egg")
+_AMOUNT_RE = re.compile(r"^\d+(?:\.\d+)?\s*(?:g|grams?|oz|ml)?\s+")
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(name):
+    """Folded name with collapsed whitespace; what prefixes are matched against"""
+    return " ".join(fold(name).split())
+
+
+class AutocompleteIndex:
+    """Sorted prefix array with precomputed top-k at heavy prefixes"""
+
+    def __init__(self, names=(), uses=None):
+        self.build(names, uses)
+
+    def build(self, names, uses=None):
+        """(Re)build from (name, food id or None, source) triples and {normalized name: times logged}
+
+        Names normalizing to the same text keep the first one given.
+        """
+        uses = uses or {}
+        entries = {}
+        for name, food_id, source in names:
+            key = normalize(name)
+            if key and key not in entries:
+                entries[key] = (name, food_id, source)
+
+        # Rank order: logged names by uses, then the rest by length and name.
+        # Stable C-level sorts; the few logged names take the Python key.
+        logged = sorted((key for key in uses if key in entries), key=lambda key: (-uses[key], len(key), key))
+        by_name = sorted(entries)
+        rest = [key for key in by_name if key not in uses]
+        rest.sort(key=len)
+        ranked = logged + rest
+        # Internal ids ("ranks") are positions in rank order
+        self._entries = list(map(entries.__getitem__, ranked))
+        self._uses = [uses[key] for key in logged]
+        rank_of = dict(zip(ranked, range(len(ranked))))
+        self._keys = by_name
+        self._ranks = list(map(rank_of.__getitem__, by_name))
+        self._top = {}
+        if by_name:
+            self._collect(0, len(by_name), 0)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _collect(self, lo, hi, depth):
+        """Best ranks among sorted keys [lo, hi), which share their first `depth` characters
+
+        Records them for the shared prefix when the range is heavy.
+        """
+        if hi - lo <= AUTOCOMPLETE_NODE_SIZE:
+            return heapq.nsmallest(AUTOCOMPLETE_MAX_K, self._ranks[lo:hi])
+        keys = self._keys
+        lists = []
+        i = lo
+        if len(keys[i]) == depth:  # the prefix itself is a name; it sorts first
+            lists.append((self._ranks[i],))
+            i += 1
+        while i < hi:
+            child = keys[i][:depth + 1]
+            end = bisect_right(keys, child + "\U0010ffff", i, hi)
+            lists.append(self._collect(i, end, depth + 1))
+            i = end
+        top = heapq.nsmallest(AUTOCOMPLETE_MAX_K, chain.from_iterable(lists))
+        self._top[keys[lo][:depth]] = top
+        return top
+
+    def entry(self, key):
+        """(name, food id, source) for a normalized name, or None"""
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            return self._entries[self._ranks[i]]
+        return None
+
+    def complete(self, prefix, k=AUTOCOMPLETE_DEFAULT_K):
+        """Best k names starting with prefix (case and accents ignored)"""
+        p = normalize(prefix)
+        top = self._top.get(p)
+        if top is None:
+            lo = bisect_left(self._keys, p)
+            hi = bisect_right(self._keys, p + "\U0010ffff", lo)
+            top = heapq.nsmallest(k, self._ranks[lo:hi])
+        suggestions = []
+        for rank in top[:k]:
+            name, food_id, source = self._entries[rank]
+            uses = self._uses[rank] if rank < len(self._uses) else 0  # logged names rank first
+            suggestions.append({"name": name, "id": food_id, "source": source, "uses": uses})
+        return suggestions
+
+
+def _unlogged_rank(suggestion):
+    """Where an unlogged name sorts: shorter first, then alphabetical"""
+    key = normalize(suggestion["name"])
+    return len(key), key
+
+
+class UsageOverlay:
+    """A base AutocompleteIndex built without uses, plus the logged and newly
+    added names in a second, small index; the two are merged per lookup"""
+
+    def __init__(self, base, names=(), uses=None):
+        """names: (name, food id or None, source) added since base was built;
+        uses: {normalized name: times logged}"""
+        self.base = base
+        uses = uses or {}
+        logged = (base.entry(key) for key in uses)
+        new = ((name, food_id, source) for name, food_id, source in names if base.entry(normalize(name)) is None)
+        self.index = AutocompleteIndex(chain(filter(None, logged), new), uses)
+
+    def __len__(self):
+        return len(self.base) + len(self.index)
+
+    def complete(self, prefix, k=AUTOCOMPLETE_DEFAULT_K):
+        """Best k names starting with prefix: logged ones by uses, then the rest of both layers"""
+        top = self.index.complete(prefix, k)
+        logged = [s for s in top if s["uses"]]
+        if len(logged) == k:
+            return logged
+        # Logged names rank first, so top holds every logged match: the base
+        # only has to fill the remaining places, skipping those names
+        taken = {normalize(s["name"]) for s in logged}
+        rest = [s for s in top if not s["uses"]]
+        rest += (s for s in self.base.complete(prefix, k) if normalize(s["name"]) not in taken)
+        return logged + heapq.nsmallest(k - len(logged), rest, key=_unlogged_rank)
+
+
+# ----------------- Sources -----------------
+def _catalog_version(conn):
+    row = conn.execute("SELECT version FROM data_versions WHERE key = 'catalog'").fetchone()
+    return row[0] if row else 0
+
+def _overlay_version(conn):
+    """Changes whenever a food is logged or a Nutritionix lookup is cached"""
+    row = conn.execute("SELECT version FROM data_versions WHERE key = 'food_usage'").fetchone()
+    cached = tuple(conn.execute("SELECT COUNT(*), MAX(fetched_at) FROM nutrition_cache").fetchone())
+    return (row[0] if row else 0), cached
+
+def _cached_food_name(query):
+    """Food name of a nutrition_cache key ("100g banana" -> "Banana")"""
+    return _AMOUNT_RE.sub("", query, count=1).title()
+
+def _load_base(conn):
+    """(catalog and cached names index, fetched_at of the newest cached name in it)"""
+    # Read first: a name cached while the base loads is picked up by the overlay
+    since = conn.execute('SELECT MAX(fetched_at) FROM nutrition_cache').fetchone()[0] or 0
+    catalog = ((name, food_id, "catalog") for food_id, name in conn.execute('SELECT id, name FROM foods ORDER BY seq'))
+    cached = ((_cached_food_name(query), None, "nutritionix") for (query,) in conn.execute('SELECT query FROM nutrition_cache'))
+    return AutocompleteIndex(chain(catalog, cached)), since
+
+def _load_overlay(conn, base, since):
+    """Uses from food_usage (one row per food, kept up to date by the diary) and names cached after since"""
+    uses = {}
+    for name, count in conn.execute('SELECT food_name, SUM(use_count) FROM food_usage GROUP BY food_name'):
+        key = normalize(name or "")
+        uses[key] = uses.get(key, 0) + count
+    cached = (
+        (_cached_food_name(query), None, "nutritionix")
+        for (query,) in conn.execute('SELECT query FROM nutrition_cache WHERE fetched_at > ?', (since,))
+    )
+    return UsageOverlay(base, cached, uses)
+
+
+# ----------------- Index lifecycle -----------------
+_state = {"index": None, "since": 0, "catalog": None, "overlay": None, "checked": 0.0, "building": False}
+_lock = threading.Lock()
+
+def _rebuild(conn, catalog_version):
+    started = time.perf_counter()
+    overlay_version = _overlay_version(conn)
+    base, since = _load_base(conn)
+    index = _load_overlay(conn, base, since)
+    _state.update(index=index, since=since, catalog=catalog_version, overlay=overlay_version)
+    logger.info("Autocomplete index built", extra={
+        "names": len(index), "duration_ms": round((time.perf_counter() - started) * 1000, 1)
+    })
+
+def _refresh_overlay(conn, overlay_version):
+    _state["index"] = _load_overlay(conn, _state["index"].base, _state["since"])
+    _state["overlay"] = overlay_version
+
+def _rebuild_in_background(catalog_version):
+    try:
+        with db_connection() as conn:
+            _rebuild(conn, catalog_version)
+    except Exception as e:
+        logger.warning("Autocomplete rebuild failed", extra={"error": repr(e)})
+    finally:
+        _state["building"] = False
+
+def _refresh_due():
+    return _state["index"] is None or time.monotonic() - _state["checked"] >= AUTOCOMPLETE_REFRESH_SECONDS
+
+def complete_from_memory(prefix, k=AUTOCOMPLETE_DEFAULT_K):
+    """Completions from the current index, or None when it must be built or checked (never touches SQLite)"""
+    index = _state["index"]
+    if index is None or _refresh_due():
+        return None
+    return index.complete(prefix, k)
+
+@instrument_db
+def complete_food_names(prefix, k=AUTOCOMPLETE_DEFAULT_K):
+    """Completions, building the index on first use and refreshing whichever layer is out of date"""
+    with _lock:
+        if _refresh_due():
+            with db_connection() as conn:
+                catalog_version = _catalog_version(conn)
+                if _state["index"] is None:
+                    _rebuild(conn, catalog_version)
+                elif _state["building"]:
+                    pass  # the rebuild loads a fresh overlay as well
+                elif catalog_version != _state["catalog"]:
+                    _state["building"] = True
+                    threading.Thread(
+                        target=_rebuild_in_background, args=(catalog_version,), name="autocomplete-rebuild", daemon=True
+                    ).start()
+                else:
+                    overlay_version = _overlay_version(conn)
+                    if overlay_version != _state["overlay"]:
+                        _refresh_overlay(conn, overlay_version)
+            _state["checked"] = time.monotonic()
+    return _state["index"].complete(prefix, k)
@@ -0,0 +1,270 @@
+# app/catalog.py
+# The food catalog: the SQLite `foods` table with an FTS5 index over names
+# (migration 7), seeded with app.data.foods and filled in bulk by
+# `python -m app.manage import-foods` (app/food_import.py).
+#
+# Search takes the cheapest path that answers the query:
+#   - one or two characters: a range scan of the name index, alphabetical,
+#     which stops as soon as the page is full
+#   - otherwise: an FTS5 prefix match on every word ranked by BM25. FTS5 is
+#     the outer loop and sorts by rank itself, then only the page's rows are
+#     read from foods by primary key; no snippet() or highlight(), so no
+#     per-row text processing.
+# SQLite builds without FTS5 fall back to LIKE scans (name prefix first,
+# then substring), the same tiers the in-memory index used.
+# When a query finds nothing, match_foods corrects misspelled words against
+# the catalog's vocabulary (app/fuzzy.py) and searches again, so typos
+# resolve locally.
+
+import os
+import re
+import threading
+
+from app.database import db_connection, bump_versions
+from app.fuzzy import TrigramIndex, words
+from app.metrics import count_statement, instrument_db
+from app.nutrients import NUTRIENT_NAMES
+
+# Fields a client may request with `fields=`
+FOOD_FIELDS = ("id", "name", "serving_size", "serving_unit") + NUTRIENT_NAMES
+DEFAULT_SEARCH_LIMIT = 50
+FOOD_IMPORT_CHUNK_SIZE = int(os.getenv("FOOD_IMPORT_CHUNK_SIZE", "5000"))  # foods per transaction
+SHORT_QUERY = 2  # queries this long or shorter use the name index
+
+# Unicode words; FTS5's unicode61 tokenizer folds case and diacritics itself
+_WORD_RE = re.compile(r"[^\W_]+")
+
+_COLUMNS = ", ".join(f"f.{field}" for field in FOOD_FIELDS)
+
+_FOOD_UPSERT = f'''
+    INSERT INTO foods ({", ".join(FOOD_FIELDS)}, source)
+    VALUES ({", ".join("?" for _ in FOOD_FIELDS)}, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        {", ".join(f"{c} = excluded.{c}" for c in FOOD_FIELDS[1:])},
+        source = excluded.source
+'''
+
+_tables = {}  # virtual table name -> exists, checked once per process
+
+# Spelling vocabulary, rebuilt when the 'catalog' data version moves
+_vocabulary = {"version": None, "index": TrigramIndex()}
+_vocabulary_lock = threading.Lock()
+
+
+def _has_table(conn, name):
+    if name not in _tables:
+        _tables[name] = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+        ).fetchone() is not None
+    return _tables[name]
+
+def _has_fts(conn):
+    return _has_table(conn, 'foods_fts')
+
+
+def _untraced(conn, sql, params):
+    """Run one statement with the statement-count trace paused, counting it once
+
+    FTS5 ranking and bulk upserts run internal statements per row (document
+    sizes, trigger bodies); tracing would expand and count every one of them.
+    """
+    conn.set_trace_callback(None)
+    try:
+        if isinstance(params, list):
+            return conn.executemany(sql, params)
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.set_trace_callback(count_statement)
+        count_statement(sql)
+
+def _escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# ----------------- Lookups -----------------
+@instrument_db
+def get_food_by_id(food_id: str):
+    """Get a food item by its ID"""
+    with db_connection() as conn:
+        row = conn.execute(f'SELECT {_COLUMNS} FROM foods f WHERE f.id = ?', (food_id,)).fetchone()
+    return dict(row) if row else None
+
+@instrument_db
+def get_foods_by_ids(food_ids):
+    """Get several foods at once, in request order; returns (found, missing ids)"""
+    food_ids = list(food_ids)
+    by_id = {}
+    with db_connection() as conn:
+        for i in range(0, len(food_ids), 500):
+            chunk = food_ids[i:i + 500]
+            rows = conn.execute(
+                f'SELECT {_COLUMNS} FROM foods f WHERE f.id IN ({", ".join("?" for _ in chunk)})', chunk
+            ).fetchall()
+            by_id.update((row['id'], dict(row)) for row in rows)
+    found = [by_id[food_id] for food_id in food_ids if food_id in by_id]
+    missing = [food_id for food_id in food_ids if food_id not in by_id]
+    return found, missing
+
+@instrument_db
+def get_foods_page(after_id=None, limit=None):
+    """Foods in catalog order after the food with id after_id; returns (page, has_more)"""
+    with db_connection() as conn:
+        after = 0
+        if after_id is not None:
+            row = conn.execute('SELECT seq FROM foods WHERE id = ?', (after_id,)).fetchone()
+            if row is None:
+                raise KeyError(after_id)
+            after = row['seq']
+        rows = conn.execute(
+            f'SELECT {_COLUMNS} FROM foods f WHERE f.seq > ? ORDER BY f.seq LIMIT ?',
+            (after, limit + 1 if limit else -1)
+        ).fetchall()
+    return [dict(row) for row in rows[:limit]], bool(limit) and len(rows) > limit
+
+@instrument_db
+def catalog_size():
+    """Number of foods in the catalog"""
+    with db_connection() as conn:
+        return conn.execute('SELECT COUNT(*) FROM foods').fetchone()[0]
+
+# ----------------- Search -----------------
+def _name_prefix(conn, q, limit, offset):
+    """Foods whose name starts with q, alphabetical (index range scan)"""
+    rows = conn.execute(f'''
+        SELECT {_COLUMNS} FROM foods f
+        WHERE f.name LIKE ? ESCAPE '\\'
+        ORDER BY f.name COLLATE NOCASE
+        LIMIT ? OFFSET ?
+    ''', (_escape_like(q) + "%", limit, offset)).fetchall()
+    return [dict(row) for row in rows]
+
+def _fts_search(conn, words, limit, offset):
+    """Every word as a prefix, best BM25 first"""
+    match = " ".join(f'"{word}"*' for word in words)
+    rows = _untraced(conn, f'''
+        SELECT {_COLUMNS}
+        FROM foods_fts
+        JOIN foods f ON f.seq = foods_fts.rowid
+        WHERE foods_fts MATCH ?
+        ORDER BY foods_fts.rank
+        LIMIT ? OFFSET ?
+    ''', (match, limit, offset))
+    return [dict(row) for row in rows]
+
+def _like_search(conn, q, limit, offset):
+    """Fallback without FTS5: name prefix matches, then substring matches"""
+    need = offset + limit
+    ranked = _name_prefix(conn, q, need, 0)
+    if len(ranked) < need:
+        seen = [food['id'] for food in ranked]
+        rows = conn.execute(f'''
+            SELECT {_COLUMNS} FROM foods f
+            WHERE f.name LIKE ? ESCAPE '\\'
+              AND f.id NOT IN ({", ".join("?" for _ in seen) or "''"})
+            ORDER BY length(f.name), f.seq
+            LIMIT ?
+        ''', ("%" + _escape_like(q) + "%", *seen, need - len(ranked))).fetchall()
+        ranked += [dict(row) for row in rows]
+    return ranked[offset:]
+
+@instrument_db
+def search_foods(query, limit=DEFAULT_SEARCH_LIMIT, offset=0):
+    """Foods matching query, best first"""
+    q = " ".join(query.lower().split())
+    words = _WORD_RE.findall(q)
+    with db_connection() as conn:
+        if not q:
+            rows = conn.execute(
+                f'SELECT {_COLUMNS} FROM foods f ORDER BY f.seq LIMIT ? OFFSET ?', (limit, offset)
+            ).fetchall()
+            return [dict(row) for row in rows]
+        if len(q) <= SHORT_QUERY or not words:
+            return _name_prefix(conn, q, limit, offset)
+        if _has_fts(conn):
+            return _fts_search(conn, words, limit, offset)
+        return _like_search(conn, q, limit, offset)
+
+# ----------------- Fuzzy Search -----------------
+def _catalog_version(conn):
+    row = conn.execute("SELECT version FROM data_versions WHERE key = 'catalog'").fetchone()
+    return row[0] if row else 0
+
+def _load_vocabulary(conn):
+    """(word, number of foods) for every word in the catalog"""
+    if _has_table(conn, 'foods_fts_vocab'):
+        return conn.execute('SELECT term, doc FROM foods_fts_vocab').fetchall()
+    counts = {}
+    for (name,) in conn.execute('SELECT name FROM foods'):
+        for word in set(words(name)):
+            counts[word] = counts.get(word, 0) + 1
+    return counts.items()
+
+def _spelling_index(conn):
+    """The vocabulary trigram index for the current catalog"""
+    version = _catalog_version(conn)
+    if _vocabulary["version"] != version:
+        with _vocabulary_lock:
+            if _vocabulary["version"] != version:
+                _vocabulary["index"] = TrigramIndex(_load_vocabulary(conn))
+                _vocabulary["version"] = version
+    return _vocabulary["index"]
+
+@instrument_db
+def correct_query(query):
+    """query with misspelled words replaced by catalog words, or None"""
+    with db_connection() as conn:
+        return _spelling_index(conn).correct_query(query)
+
+def match_foods(query, limit=DEFAULT_SEARCH_LIMIT):
+    """Search results, or those of the spelling-corrected query when there are none
+
+    Returns (foods, corrected query or None if it was not used).
+    """
+    foods = search_foods(query, limit)
+    if foods:
+        return foods, None
+    corrected = correct_query(query)
+    if corrected is None:
+        return foods, None
+    return search_foods(corrected, limit), corrected
+
+# ----------------- Import -----------------
+def _food_row(food, source):
+    """UPSERT parameters for one catalog food"""
+    return (
+        str(food['id']), food['name'], food.get('serving_size'), food.get('serving_unit'),
+        *(food.get(name) or 0 for name in NUTRIENT_NAMES),
+        source,
+    )
+
+@instrument_db
+def upsert_foods(foods, source=None):
+    """Insert or replace a batch of foods in one transaction"""
+    rows = [_food_row(food, source) for food in foods]
+    with db_connection() as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        _untraced(conn, _FOOD_UPSERT, rows)
+        bump_versions(conn, ['catalog'])
+    return len(rows)
+
+def import_foods(foods, chunk_size=FOOD_IMPORT_CHUNK_SIZE, source=None, progress=None):
+    """Stream foods into the catalog, one transaction per chunk; returns the count"""
+    total = 0
+    chunk = []
+    for food in foods:
+        chunk.append(food)
+        if len(chunk) >= chunk_size:
+            total += upsert_foods(chunk, source)
+            chunk = []
+            if progress:
+                progress(total)
+    if chunk:
+        total += upsert_foods(chunk, source)
+        if progress:
+            progress(total)
+
+    with db_connection() as conn:
+        # Merge the many small segments the chunked inserts left behind
+        if _has_fts(conn):
+            conn.execute("INSERT INTO foods_fts(foods_fts) VALUES ('optimize')")
+    return total
@@ -1,3 +1,5 @@
+# Built-in foods. Migration 7 seeds them into the SQLite catalog (app/catalog.py),
+# which is where every catalog read goes; bulk data comes from the importer.
 foods = [
     {
         "id": "1",
@@ -289,10 +291,6 @@ diary_entries = []
 # Counter for generating unique IDs
 entry_id_counter = 1
 
-def get_food_by_id(food_id: str):
-    """Get a food item by its ID"""
-    return next((food for food in foods if food["id"] == food_id), None)
-
 def add_diary_entry(
     food_id: str,
     meal_type: str,
@@ -304,6 +302,7 @@ def add_diary_entry(
     """Add a new diary entry"""
     global entry_id_counter
     
+    from app.catalog import get_food_by_id
     food = get_food_by_id(food_id)
     if not food:
         return None
@@ -1,109 +1,184 @@
 import sqlite3
-from datetime import datetime
+import time
+import threading
+import queue
+from contextlib import contextmanager
+from datetime import datetime, timezone
 import os
+import json
+import logging
+
+from app.migrations import migrate
+from app.metrics import count_statement, instrument_db
+from app.nutrients import NUTRIENT_NAMES, NutrientVector
+from app.usage import DEFAULT_USER_ID, decayed_count, record_food_usage, rebuild_food_usage as _rebuild_food_usage
+
+logger = logging.getLogger(__name__)
 
 # Database file path
-DATABASE_PATH = "tracking_app.db"
+DATABASE_PATH = os.getenv("DATABASE_PATH", "tracking_app.db")
+
+# ----------------- Connection Pool Settings -----------------
+# DB_POOL_SIZE=0 disables pooling and opens one connection per call
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))            # page cache per connection
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024)))     # bytes of memory-mapped I/O
+DB_STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", "256"))         # prepared statements per connection
+DB_BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "5.0"))             # seconds to wait on a locked db
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10.0"))            # seconds to wait for a free connection
 
 def get_db_connection():
     """Get a database connection"""
     conn = sqlite3.connect(DATABASE_PATH)
     conn.row_factory = sqlite3.Row  # This enables column access by name
+    conn.set_trace_callback(count_statement)  # per-function statement counts for /metrics
     return conn
 
+def open_tuned_connection(database=None):
+    """Open a long-lived connection with WAL and tuned pragmas"""
+    conn = sqlite3.connect(
+        database or DATABASE_PATH,
+        timeout=DB_BUSY_TIMEOUT,
+        check_same_thread=False,  # pooled connections move between worker threads
+        cached_statements=DB_STATEMENT_CACHE,
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")  # readers no longer wait behind writers
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.set_trace_callback(count_statement)  # per-function statement counts for /metrics
+    return conn
+
+class PoolExhausted(Exception):
+    """Every pooled connection stayed borrowed for DB_POOL_TIMEOUT seconds"""
+
+class ConnectionPool:
+    """Thread-safe pool of long-lived SQLite connections"""
+
+    def __init__(self, database, size, timeout=DB_POOL_TIMEOUT):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        # LIFO so the most recently used connection (warmest page cache) goes out first
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+    def acquire(self):
+        """Borrow a connection, opening a new one while under the size limit
+
+        Raises PoolExhausted when none is returned within the pool's timeout.
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self._created < self.size
+            if can_open:
+                self._created += 1
+        if not can_open:
+            try:
+                return self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise PoolExhausted(
+                    f"No database connection free after {self.timeout:g}s ({self.size} in use)"
+                ) from None
+        try:
+            return open_tuned_connection(self.database)
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def release(self, conn):
+        """Return a borrowed connection to the pool"""
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+            return
+        self._idle.put(conn)
+
+    def close(self):
+        """Close every idle connection; borrowed ones are closed on release"""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Get the process-wide connection pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DATABASE_PATH, DB_POOL_SIZE)
+    return _pool
+
+def close_pool():
+    """Close the connection pool (called on shutdown)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+@contextmanager
+def db_connection():
+    """Borrow a connection for one unit of work; commits on success, rolls back on error"""
+    if DB_POOL_SIZE <= 0:
+        conn = get_db_connection()
+        release = conn.close
+    else:
+        pool = get_pool()
+        conn = pool.acquire()
+        release = lambda: pool.release(conn)
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        release()
+
+_schema_ready = False
+
+@instrument_db
 def init_database():
-    """Initialize the database with tables"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Create user_stats table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_stats (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            age INTEGER,
-            weight REAL,
-            height REAL,
-            sex TEXT,
-            activity_level TEXT,
-            calories_target INTEGER DEFAULT 2000,
-            protein_target REAL DEFAULT 150,
-            carbs_target REAL DEFAULT 250,
-            fat_target REAL DEFAULT 67,
-            fiber_target REAL DEFAULT 25,
-            sugar_target REAL DEFAULT 50,
-            sodium_target REAL DEFAULT 2300,
-            vitamin_a_target REAL DEFAULT 900,
-            vitamin_c_target REAL DEFAULT 90,
-            vitamin_d_target REAL DEFAULT 20,
-            vitamin_e_target REAL DEFAULT 15,
-            vitamin_k_target REAL DEFAULT 120,
-            vitamin_b1_target REAL DEFAULT 1.2,
-            vitamin_b2_target REAL DEFAULT 1.3,
-            vitamin_b3_target REAL DEFAULT 16,
-            vitamin_b6_target REAL DEFAULT 1.7,
-            vitamin_b12_target REAL DEFAULT 2.4,
-            folate_target REAL DEFAULT 400,
-            calcium_target REAL DEFAULT 1000,
-            iron_target REAL DEFAULT 8,
-            magnesium_target REAL DEFAULT 400,
-            phosphorus_target REAL DEFAULT 700,
-            potassium_target REAL DEFAULT 4700,
-            zinc_target REAL DEFAULT 11,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create diary_entries table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS diary_entries (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            food_id TEXT NOT NULL,
-            food_name TEXT NOT NULL,
-            meal_type TEXT NOT NULL,
-            quantity REAL NOT NULL,
-            date TEXT NOT NULL,
-            calories REAL NOT NULL,
-            protein REAL NOT NULL,
-            fat REAL NOT NULL,
-            carbs REAL NOT NULL,
-            fiber REAL NOT NULL,
-            sugar REAL NOT NULL,
-            sodium REAL NOT NULL,
-            vitamin_a REAL DEFAULT 0,
-            vitamin_c REAL DEFAULT 0,
-            vitamin_d REAL DEFAULT 0,
-            vitamin_e REAL DEFAULT 0,
-            vitamin_k REAL DEFAULT 0,
-            vitamin_b1 REAL DEFAULT 0,
-            vitamin_b2 REAL DEFAULT 0,
-            vitamin_b3 REAL DEFAULT 0,
-            vitamin_b6 REAL DEFAULT 0,
-            vitamin_b12 REAL DEFAULT 0,
-            folate REAL DEFAULT 0,
-            calcium REAL DEFAULT 0,
-            iron REAL DEFAULT 0,
-            magnesium REAL DEFAULT 0,
-            phosphorus REAL DEFAULT 0,
-            potassium REAL DEFAULT 0,
-            zinc REAL DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Insert default user stats if none exist
-    cursor.execute('SELECT COUNT(*) FROM user_stats')
-    if cursor.fetchone()[0] == 0:
-        cursor.execute('''
-            INSERT INTO user_stats (
-                name, age, weight, height, sex, activity_level,
-                calories_target, protein_target, carbs_target, fat_target
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', ('Default User', 25, 70, 175, 'male', 'moderate', 3000, 225, 375, 100))
-    
-    conn.commit()
-    conn.close()
+    """Initialize the database, applying any pending schema migrations"""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with db_connection() as conn:
+        migrate(conn)
+    _schema_ready = True
+
+# Nutrient columns shared by diary_entries and daily_totals (registry order)
+NUTRIENT_COLUMNS = list(NUTRIENT_NAMES)
+
+# Day keys are days since 1970-01-01; they index diary rows for range scans
+EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
+def day_key(date):
+    """Convert a YYYY-MM-DD date to its integer day key (None if malformed)"""
+    try:
+        return datetime.strptime(date, '%Y-%m-%d').toordinal() - EPOCH_ORDINAL
+    except (TypeError, ValueError):
+        return None
+
+def day_date(day):
+    """Canonical YYYY-MM-DD of a day key; what rows store, however the date was sent ("2024-3-5")"""
+    return datetime.fromordinal(day + EPOCH_ORDINAL).strftime('%Y-%m-%d')
 
 def calculate_bmr(weight, height, age, sex):
     """Calculate Basal Metabolic Rate using Mifflin-St Jeor Equation"""
@@ -124,11 +199,9 @@ def calculate_tdee(bmr, activity_level):
     }
     return bmr * activity_multipliers.get(activity_level.lower(), 1.55)
 
+@instrument_db
 def update_user_stats(stats_data):
     """Update user stats in database"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     # Calculate targets based on TDEE
     bmr = calculate_bmr(stats_data['weight'], stats_data['height'], stats_data['age'], stats_data['sex'])
     tdee = calculate_tdee(bmr, stats_data['activity_level'])
@@ -139,21 +212,20 @@ def update_user_stats(stats_data):
     carbs_target = round(calories_target * 0.45 / 4, 1)   # 45% of calories from carbs
     fat_target = round(calories_target * 0.25 / 9, 1)     # 25% of calories from fat
     
-    cursor.execute('''
-        UPDATE user_stats SET
-            name = ?, age = ?, weight = ?, height = ?, sex = ?, activity_level = ?,
-            calories_target = ?, protein_target = ?, carbs_target = ?, fat_target = ?,
-            updated_at = CURRENT_TIMESTAMP
-        WHERE id = 1
-    ''', (
-        stats_data['name'], stats_data['age'], stats_data['weight'], 
-        stats_data['height'], stats_data['sex'], stats_data['activity_level'],
-        calories_target, protein_target, carbs_target, fat_target
-    ))
-    
-    conn.commit()
-    conn.close()
-    
+    with db_connection() as conn:
+        conn.execute('''
+            UPDATE user_stats SET
+                name = ?, age = ?, weight = ?, height = ?, sex = ?, activity_level = ?,
+                calories_target = ?, protein_target = ?, carbs_target = ?, fat_target = ?,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = 1
+        ''', (
+            stats_data['name'], stats_data['age'], stats_data['weight'],
+            stats_data['height'], stats_data['sex'], stats_data['activity_level'],
+            calories_target, protein_target, carbs_target, fat_target
+        ))
+        bump_versions(conn, ['user_stats'])
+
     return {
         'calories_target': calories_target,
         'protein_target': protein_target,
@@ -161,138 +233,497 @@ def update_user_stats(stats_data):
         'fat_target': fat_target
     }
 
+@instrument_db
 def get_user_stats():
     """Get current user stats"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM user_stats WHERE id = 1')
-    stats = cursor.fetchone()
-    conn.close()
+    with db_connection() as conn:
+        stats = conn.execute('SELECT * FROM user_stats WHERE id = 1').fetchone()
     return dict(stats) if stats else None
 
+_DIARY_INSERT = f'''
+    INSERT INTO diary_entries (
+        food_id, food_name, meal_type, quantity, date, day,
+        {", ".join(NUTRIENT_COLUMNS)}
+    ) VALUES ({", ".join("?" for _ in range(6 + len(NUTRIENT_COLUMNS)))})
+'''
+
+def _diary_row(entry_data, day, nutrients):
+    """INSERT parameters for one diary entry"""
+    return (
+        entry_data['food_id'], entry_data['food_name'], entry_data['meal_type'],
+        entry_data['quantity'], entry_data['date'] if day is None else day_date(day), day,
+        *nutrients.values
+    )
+
+def _diary_batch(entries):
+    """INSERT parameters and per-day totals ({day: [date, entry count, NutrientVector]}) for many entries"""
+    rows = []
+    totals = {}
+    for entry_data in entries:
+        day = day_key(entry_data['date'])
+        nutrients = NutrientVector.from_mapping(entry_data)
+        rows.append(_diary_row(entry_data, day, nutrients))
+        if day is not None:
+            day_totals = totals.setdefault(day, [day_date(day), 0, NutrientVector()])
+            day_totals[1] += 1
+            day_totals[2] += nutrients
+    return rows, totals
+
+@instrument_db
 def save_diary_entry(entry_data):
     """Save a diary entry to database"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    print(entry_data)
-    cursor.execute('''
-        INSERT INTO diary_entries (
-            food_id, food_name, meal_type, quantity, date,
-            calories, protein, fat, carbs, fiber, sugar, sodium,
-            vitamin_a, vitamin_c, vitamin_d, vitamin_e, vitamin_k,
-            vitamin_b1, vitamin_b2, vitamin_b3, vitamin_b6, vitamin_b12,
-            folate, calcium, iron, magnesium, phosphorus, potassium, zinc
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        entry_data['food_id'], entry_data['food_name'], entry_data['meal_type'],
-        entry_data['quantity'], entry_data['date'], entry_data['calories'],
-        entry_data['protein'], entry_data['fat'], entry_data['carbs'],
-        entry_data['fiber'], entry_data['sugar'], entry_data['sodium'],
-        entry_data.get('vitamin_a', 0), entry_data.get('vitamin_c', 0),
-        entry_data.get('vitamin_d', 0), entry_data.get('vitamin_e', 0),
-        entry_data.get('vitamin_k', 0), entry_data.get('vitamin_b1', 0),
-        entry_data.get('vitamin_b2', 0), entry_data.get('vitamin_b3', 0),
-        entry_data.get('vitamin_b6', 0), entry_data.get('vitamin_b12', 0),
-        entry_data.get('folate', 0), entry_data.get('calcium', 0),
-        entry_data.get('iron', 0), entry_data.get('magnesium', 0),
-        entry_data.get('phosphorus', 0), entry_data.get('potassium', 0),
-        entry_data.get('zinc', 0)
-    ))
-    
-    entry_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    logger.debug("Saving diary entry", extra={"entry": entry_data})
+    day = day_key(entry_data['date'])
+    nutrients = NutrientVector.from_mapping(entry_data)
+    with db_connection() as conn:
+        cursor = conn.execute(_DIARY_INSERT, _diary_row(entry_data, day, nutrients))
+        entry_id = cursor.lastrowid
+
+        if day is not None:
+            _add_to_daily_totals(conn, day, day_date(day), 1, nutrients)
+        record_food_usage(conn, [entry_data], time.time())
+        bump_versions(conn, diary_version_keys([day]) + ['food_usage'])
     return entry_id
 
-def get_diary_entries(date=None):
-    """Get diary entries for a specific date"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    if date:
-        cursor.execute('SELECT * FROM diary_entries WHERE date = ? ORDER BY created_at DESC', (date,))
-    else:
-        today = datetime.now().strftime('%Y-%m-%d')
-        cursor.execute('SELECT * FROM diary_entries WHERE date = ? ORDER BY created_at DESC', (today,))
-    
-    entries = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return entries
+@instrument_db
+def save_diary_entries(entries):
+    """Save many diary entries in a single transaction; returns their ids in order"""
+    if not entries:
+        return []
+
+    rows, totals = _diary_batch(entries)
+    with db_connection() as conn:
+        # IMMEDIATE holds the write lock for the whole batch, so the
+        # AUTOINCREMENT ids handed out by executemany are consecutive
+        conn.execute('BEGIN IMMEDIATE')
+        conn.executemany(_DIARY_INSERT, rows)
+        last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+        _add_batch_to_daily_totals(conn, totals)
+        record_food_usage(conn, entries, time.time())
+        bump_versions(conn, diary_version_keys(totals) + ['food_usage'])
+    return list(range(last_id - len(rows) + 1, last_id + 1))
+
+# Columns of diary_entries in table order (what SELECT * returns)
+DIARY_COLUMNS = [
+    'id', 'food_id', 'food_name', 'meal_type', 'quantity', 'date',
+    *NUTRIENT_COLUMNS, 'created_at', 'day'
+]
+
+@instrument_db
+def get_diary_page(date, limit, after=None, fields=None):
+    """One page of a day's entries, newest first; returns (entries, (created_at, id) to continue after or None)"""
+    day = day_key(date)
+    if day is None:
+        return [], None
+
+    columns = list(fields or DIARY_COLUMNS)
+    selected = columns + [c for c in ('created_at', 'id') if c not in columns]
+    sql = f'SELECT {", ".join(selected)} FROM diary_entries WHERE day = ?'
+    params = [day]
+    if after is not None:
+        # Keyset on (created_at, id): idx_diary_entries_day_created ends in
+        # the rowid, so this stays an index range scan however deep the page
+        sql += ' AND (created_at, id) < (?, ?)'
+        params.extend(after)
+    sql += ' ORDER BY created_at DESC, id DESC LIMIT ?'
+    params.append(limit + 1)
+
+    with db_connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+
+    next_after = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_after = (rows[-1]['created_at'], rows[-1]['id'])
+    return [{c: row[c] for c in columns} for row in rows], next_after
+
+# Default columns of /diary/export
+EXPORT_COLUMNS = ['date', 'food_name', 'meal_type', 'quantity', *NUTRIENT_COLUMNS]
+
+def export_day_range(from_date=None, to_date=None):
+    """Day keys bounding an export (None for an open end); ValueError if malformed"""
+    start = day_key(from_date) if from_date else None
+    end = day_key(to_date) if to_date else None
+    if (from_date and start is None) or (to_date and end is None):
+        raise ValueError('Dates must be in YYYY-MM-DD format')
+    if start is not None and end is not None and start > end:
+        raise ValueError("'from' must not be after 'to'")
+    return start, end
 
+@instrument_db
+def get_diary_batch(start, end, columns, limit, after=None):
+    """Up to limit entries between two day keys, oldest first, as tuples in column order;
+    returns (rows, (day, created_at, id) to continue after or None)"""
+    # Entries without a day belong to no date range, and a NULL day would make
+    # the keyset comparison NULL and end the export at that row
+    sql = f'SELECT {", ".join(columns)}, day, created_at, id FROM diary_entries WHERE day IS NOT NULL'
+    params = []
+    if after is not None:
+        # Keyset on idx_diary_entries_day_created (day, created_at, rowid):
+        # each batch seeks straight to where the last one stopped
+        sql += ' AND (day, created_at, id) > (?, ?, ?)'
+        params.extend(after)
+    elif start is not None:
+        sql += ' AND day >= ?'
+        params.append(start)
+    if end is not None:
+        sql += ' AND day <= ?'
+        params.append(end)
+    sql += ' ORDER BY day, created_at, id LIMIT ?'
+    params.append(limit)
+
+    with db_connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    n = len(columns)
+    next_after = tuple(rows[-1][n:]) if len(rows) == limit else None
+    return [tuple(row[:n]) for row in rows], next_after
+
+@instrument_db
 def delete_diary_entry(entry_id):
     """Delete a diary entry"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM diary_entries WHERE id = ?', (entry_id,))
-    conn.commit()
-    conn.close()
+    with db_connection() as conn:
+        # Take the write lock before reading the row, so two concurrent deletes
+        # of the same entry cannot both subtract it from daily_totals
+        conn.execute('BEGIN IMMEDIATE')
+        row = conn.execute(
+            f'SELECT day, date, {", ".join(NUTRIENT_COLUMNS)} FROM diary_entries WHERE id = ?',
+            (entry_id,)
+        ).fetchone()
+        if row is None:
+            return
+        conn.execute('DELETE FROM diary_entries WHERE id = ?', (entry_id,))
+        if row['day'] is not None:
+            _add_to_daily_totals(conn, row['day'], row['date'], -1,
+                                 -NutrientVector.from_mapping(row))
+            conn.execute('DELETE FROM daily_totals WHERE day = ? AND total_entries <= 0', (row['day'],))
+        bump_versions(conn, diary_version_keys([row['day']]))
+
+# ----------------- Data Versions -----------------
+# data_versions holds one change counter per resource ('user_stats', 'diary',
+# 'diary:<day>', 'food_usage' and 'catalog'). Write paths bump them in the
+# same transaction as the data, so conditional GETs can answer 304 from a
+# primary-key lookup alone.
+
+_VERSION_BUMP = '''
+    INSERT INTO data_versions (key, version, updated_at) VALUES (?, 1, ?)
+    ON CONFLICT(key) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at
+'''
+
+def diary_version_key(day):
+    """Version key for one day of the diary"""
+    return f'diary:{day}'
+
+def diary_version_keys(days):
+    """Keys to bump when entries on the given days change"""
+    return ['diary'] + [diary_version_key(day) for day in set(days) if day is not None]
+
+def bump_versions(conn, keys):
+    """Increment the change counters for the given keys"""
+    now = time.time()
+    conn.executemany(_VERSION_BUMP, [(key, now) for key in keys])
+
+@instrument_db
+def get_data_versions(keys):
+    """Current (version, updated_at) for each key; (0, None) if never written"""
+    keys = list(keys)
+    with db_connection() as conn:
+        rows = conn.execute(
+            f'SELECT key, version, updated_at FROM data_versions WHERE key IN ({", ".join("?" for _ in keys)})',
+            keys
+        ).fetchall()
+    versions = {key: (0, None) for key in keys}
+    versions.update((row['key'], (row['version'], row['updated_at'])) for row in rows)
+    return versions
+
+# ----------------- Daily Totals -----------------
+# daily_totals holds one row per day with the running nutrient sums; it is
+# updated in the same transaction as every diary insert/delete
+
+_DAILY_TOTALS_UPSERT = f'''
+    INSERT INTO daily_totals (day, date, total_entries, {", ".join(NUTRIENT_COLUMNS)})
+    VALUES (?, ?, ?, {", ".join("?" for _ in NUTRIENT_COLUMNS)})
+    ON CONFLICT(day) DO UPDATE SET
+        total_entries = total_entries + excluded.total_entries,
+        {", ".join(f"{c} = {c} + excluded.{c}" for c in NUTRIENT_COLUMNS)}
+'''
+
+_DAILY_TOTALS_FROM_ENTRIES = f'''
+    SELECT day, MIN(date) AS date, COUNT(*) AS total_entries,
+        {", ".join(f"TOTAL({c}) AS {c}" for c in NUTRIENT_COLUMNS)}
+    FROM diary_entries
+    WHERE day IS NOT NULL
+    GROUP BY day
+'''
+
+def _add_to_daily_totals(conn, day, date, entry_count, nutrients):
+    """Add (or with a negated vector, subtract) one entry's nutrients to its day"""
+    conn.execute(_DAILY_TOTALS_UPSERT, (day, date, entry_count, *nutrients.values))
+
+def _add_batch_to_daily_totals(conn, totals):
+    """Add the per-day totals of a batch (see _diary_batch)"""
+    conn.executemany(_DAILY_TOTALS_UPSERT, [
+        (day, date, count, *sums.values) for day, (date, count, sums) in totals.items()
+    ])
 
+@instrument_db
+def rebuild_daily_totals():
+    """Recompute daily_totals from the raw diary entries; returns the number of days"""
+    with db_connection() as conn:
+        conn.execute('DELETE FROM daily_totals')
+        conn.execute(f'''
+            INSERT INTO daily_totals (day, date, total_entries, {", ".join(NUTRIENT_COLUMNS)})
+            {_DAILY_TOTALS_FROM_ENTRIES}
+        ''')
+        # Every per-day summary may have changed
+        bump_versions(conn, ['diary'])
+        conn.execute(
+            "UPDATE data_versions SET version = version + 1, updated_at = ? WHERE key LIKE 'diary:%'",
+            (time.time(),)
+        )
+        return conn.execute('SELECT COUNT(*) FROM daily_totals').fetchone()[0]
+
+# ----------------- Food Usage -----------------
+# food_usage keeps one row per (user, food) with its use count, last use and
+# decayed frequency score (see app/usage.py). Diary inserts update it in the
+# same transaction; deleting an entry does not, a deleted log still counts
+# as a use for suggestions.
+
+FOOD_USAGE_ORDER = {'recent': 'last_used', 'frequent': 'score'}
+
+@instrument_db
+def get_food_usage(kind='recent', limit=10, user_id=DEFAULT_USER_ID):
+    """Most recently or most frequently logged foods, one index range scan"""
+    order = FOOD_USAGE_ORDER[kind]
+    with db_connection() as conn:
+        rows = conn.execute(f'''
+            SELECT food_id, food_name, use_count, last_used, score, last_portion
+            FROM food_usage
+            WHERE user_id = ?
+            ORDER BY {order} DESC
+            LIMIT ?
+        ''', (user_id, limit)).fetchall()
+
+    now = time.time()
+    foods = []
+    for row in rows:
+        portion = json.loads(row['last_portion']) if row['last_portion'] else {}
+        quantity = portion.pop('quantity', None)
+        unit_type = portion.pop('unit_type', None)
+        foods.append({
+            'id': row['food_id'],
+            'name': row['food_name'],
+            'serving_size': quantity,
+            'serving_unit': 'g' if unit_type in (None, 'grams') else unit_type,
+            **portion,
+            'use_count': row['use_count'],
+            'last_used': datetime.fromtimestamp(row['last_used'], timezone.utc).isoformat(timespec='seconds'),
+            'score': float(f"{decayed_count(row['score'], now):.4g}"),
+        })
+    return foods
+
+@instrument_db
+def rebuild_food_usage(user_id=DEFAULT_USER_ID):
+    """Recompute food_usage from the diary, e.g. after changing the half-life"""
+    with db_connection() as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        count = _rebuild_food_usage(conn, user_id)
+        bump_versions(conn, ['food_usage'])
+    return count
+
+@instrument_db
+def verify_daily_totals(tolerance=0.01):
+    """Compare daily_totals with the raw entries; returns a list of drifted days"""
+    with db_connection() as conn:
+        expected = {row['day']: dict(row) for row in conn.execute(_DAILY_TOTALS_FROM_ENTRIES)}
+        stored = {row['day']: dict(row) for row in conn.execute('SELECT * FROM daily_totals')}
+
+    drift = []
+    for day in sorted(expected.keys() | stored.keys()):
+        want = expected.get(day)
+        have = stored.get(day)
+        if want is None or have is None:
+            drift.append({'day': day, 'date': (want or have)['date'],
+                          'expected': want, 'stored': have})
+            continue
+        fields = ['total_entries'] + NUTRIENT_COLUMNS
+        diffs = {f: {'expected': want[f], 'stored': have[f]}
+                 for f in fields if abs(want[f] - have[f]) > tolerance}
+        if diffs:
+            drift.append({'day': day, 'date': want['date'], 'fields': diffs})
+    return drift
+
+@instrument_db
 def get_daily_summary(date=None):
     """Get daily nutrition summary"""
-    entries = get_diary_entries(date)
-    
-    if not entries:
-        return {
-            'date': date or datetime.now().strftime('%Y-%m-%d'),
-            'total_entries': 0,
-            'calories': 0,
-            'protein': 0,
-            'fat': 0,
-            'carbs': 0,
-            'fiber': 0,
-            'sugar': 0,
-            'sodium': 0,
-            'vitamin_a': 0,
-            'vitamin_c': 0,
-            'vitamin_d': 0,
-            'vitamin_e': 0,
-            'vitamin_k': 0,
-            'vitamin_b1': 0,
-            'vitamin_b2': 0,
-            'vitamin_b3': 0,
-            'vitamin_b6': 0,
-            'vitamin_b12': 0,
-            'folate': 0,
-            'calcium': 0,
-            'iron': 0,
-            'magnesium': 0,
-            'phosphorus': 0,
-            'potassium': 0,
-            'zinc': 0
-        }
-    
-    summary = {
-        'date': date or datetime.now().strftime('%Y-%m-%d'),
-        'total_entries': len(entries),
-        'calories': sum(entry['calories'] for entry in entries),
-        'protein': sum(entry['protein'] for entry in entries),
-        'fat': sum(entry['fat'] for entry in entries),
-        'carbs': sum(entry['carbs'] for entry in entries),
-        'fiber': sum(entry['fiber'] for entry in entries),
-        'sugar': sum(entry['sugar'] for entry in entries),
-        'sodium': sum(entry['sodium'] for entry in entries),
-        'vitamin_a': sum(entry['vitamin_a'] for entry in entries),
-        'vitamin_c': sum(entry['vitamin_c'] for entry in entries),
-        'vitamin_d': sum(entry['vitamin_d'] for entry in entries),
-        'vitamin_e': sum(entry['vitamin_e'] for entry in entries),
-        'vitamin_k': sum(entry['vitamin_k'] for entry in entries),
-        'vitamin_b1': sum(entry['vitamin_b1'] for entry in entries),
-        'vitamin_b2': sum(entry['vitamin_b2'] for entry in entries),
-        'vitamin_b3': sum(entry['vitamin_b3'] for entry in entries),
-        'vitamin_b6': sum(entry['vitamin_b6'] for entry in entries),
-        'vitamin_b12': sum(entry['vitamin_b12'] for entry in entries),
-        'folate': sum(entry['folate'] for entry in entries),
-        'calcium': sum(entry['calcium'] for entry in entries),
-        'iron': sum(entry['iron'] for entry in entries),
-        'magnesium': sum(entry['magnesium'] for entry in entries),
-        'phosphorus': sum(entry['phosphorus'] for entry in entries),
-        'potassium': sum(entry['potassium'] for entry in entries),
-        'zinc': sum(entry['zinc'] for entry in entries)
-    }
-    
-    # Round all values
-    for key in summary:
-        if isinstance(summary[key], float):
-            summary[key] = round(summary[key], 1)
-    
+    date = date or datetime.now().strftime('%Y-%m-%d')
+    day = day_key(date)
+    row = None
+    with db_connection() as conn:
+        if day is not None:
+            row = conn.execute('SELECT * FROM daily_totals WHERE day = ?', (day,)).fetchone()
+        targets = _daily_targets(conn)
+
+    summary = {'date': date, 'total_entries': row['total_entries'] if row else 0}
+    totals = NutrientVector.from_mapping(row) if row else NutrientVector()
+    summary.update(totals.to_dict(1))
+    summary['percent_of_target'] = totals.percent_of(targets)
     return summary
+
+def _daily_targets(conn):
+    """Per-day nutrient targets from user_stats (all 0 if there is no row)"""
+    stats = conn.execute('SELECT * FROM user_stats WHERE id = 1').fetchone()
+    return NutrientVector.targets_from_stats(dict(stats)) if stats else NutrientVector()
+
+# Period expressions over daily_totals: (GROUP BY key, period start date, period end date)
+# Periods are derived from the integer day, never from the stored date text
+_DAY_DATE_SQL = "date({} * 86400, 'unixepoch')"
+SUMMARY_GRANULARITIES = {
+    'day': ('day', _DAY_DATE_SQL.format('MIN(day)'), _DAY_DATE_SQL.format('MIN(day)')),
+    # day 0 (1970-01-01) was a Thursday, so (day + 3) / 7 numbers Monday-based weeks
+    'week': ('(day + 3) / 7', "date(MIN(day) * 86400, 'unixepoch', 'weekday 0', '-6 days')",
+             "date(MIN(day) * 86400, 'unixepoch', 'weekday 0')"),
+    'month': ("strftime('%Y-%m', day * 86400, 'unixepoch')", "strftime('%Y-%m-01', MIN(day) * 86400, 'unixepoch')",
+              "date(MIN(day) * 86400, 'unixepoch', 'start of month', '+1 month', '-1 day')"),
+}
+
+@instrument_db
+def get_range_summary(from_date, to_date, granularity='day'):
+    """Get nutrient totals per day/week/month between two dates (inclusive)
+
+    Each period's percent_of_target compares its totals with the daily
+    targets times the number of its days inside the range.
+    """
+    start, end = day_key(from_date), day_key(to_date)
+    if start is None or end is None:
+        raise ValueError('Dates must be in YYYY-MM-DD format')
+    if start > end:
+        raise ValueError("'from' must not be after 'to'")
+    if granularity not in SUMMARY_GRANULARITIES:
+        raise ValueError(f'Unknown granularity: {granularity}')
+
+    group_by, period_start, period_end = SUMMARY_GRANULARITIES[granularity]
+    # One range scan over the daily_totals primary key, grouped in SQLite
+    with db_connection() as conn:
+        rows = conn.execute(f'''
+            SELECT {period_start} AS period_start, {_DAY_DATE_SQL.format('MAX(day)')} AS last_date,
+                {period_end} AS period_end,
+                SUM(total_entries) AS total_entries,
+                {", ".join(f"ROUND(TOTAL({c}), 1) AS {c}" for c in NUTRIENT_COLUMNS)}
+            FROM daily_totals
+            WHERE day BETWEEN ? AND ?
+            GROUP BY {group_by}
+            ORDER BY MIN(day)
+        ''', (start, end)).fetchall()
+        targets = _daily_targets(conn)
+
+    periods = []
+    for row in rows:
+        period = dict(row)
+        days = min(day_key(period.pop('period_end')), end) - max(day_key(period['period_start']), start) + 1
+        period['percent_of_target'] = NutrientVector.from_mapping(period).percent_of(targets.scaled(days))
+        periods.append(period)
+    return {
+        'from': from_date,
+        'to': to_date,
+        'granularity': granularity,
+        'periods': periods,
+    }
+
+# ----------------- Diary Import -----------------
+# diary_imports records how far each bulk import (app/diary_import.py) got.
+# Progress is updated in the same transaction as the chunk of entries it
+# covers, so re-running an import continues exactly where it stopped.
+
+DIARY_IMPORT_MAX_ERRORS = 100  # skipped-row reasons kept per import
+
+_DIARY_IMPORT_INSERT = f'''
+    INSERT INTO diary_entries (
+        food_id, food_name, meal_type, quantity, date, day,
+        {", ".join(NUTRIENT_COLUMNS)}, created_at
+    ) VALUES ({", ".join("?" for _ in range(7 + len(NUTRIENT_COLUMNS)))})
+'''
+
+def _diary_import(row):
+    status = dict(row)
+    status['errors'] = json.loads(status['errors'])
+    return status
+
+@instrument_db
+def get_diary_import(import_id):
+    """Progress of an import, or None if unknown"""
+    with db_connection() as conn:
+        row = conn.execute('SELECT * FROM diary_imports WHERE id = ?', (import_id,)).fetchone()
+    return _diary_import(row) if row else None
+
+@instrument_db
+def start_diary_import(import_id, filename=None):
+    """Progress of an import, registering it first if it is new (a failed one runs again)"""
+    now = time.time()
+    with db_connection() as conn:
+        conn.execute(
+            'INSERT OR IGNORE INTO diary_imports (id, filename, started_at, updated_at) VALUES (?, ?, ?, ?)',
+            (import_id, filename, now, now)
+        )
+        row = conn.execute('SELECT * FROM diary_imports WHERE id = ?', (import_id,)).fetchone()
+        if row['status'] == 'failed':
+            # Running again: drop the failure reasons, keep the skipped rows
+            errors = [error for error in json.loads(row['errors']) if error['row'] is not None]
+            conn.execute(
+                "UPDATE diary_imports SET status = 'running', errors = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(errors), now, import_id)
+            )
+            row = conn.execute('SELECT * FROM diary_imports WHERE id = ?', (import_id,)).fetchone()
+    return _diary_import(row)
+
+@instrument_db
+def save_imported_entries(import_id, entries, start, end, errors=()):
+    """Insert the entries parsed from data rows [start, end) of an import and advance it, atomically
+
+    Raises RuntimeError if the import is no longer at `start` (another run got there first).
+    """
+    rows, totals = _diary_batch(entries)
+    errors = list(errors)
+    with db_connection() as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        row = conn.execute('SELECT rows_read, errors FROM diary_imports WHERE id = ?', (import_id,)).fetchone()
+        if row is None or row['rows_read'] != start:
+            raise RuntimeError(f'Import {import_id} is being run elsewhere')
+        conn.executemany(_DIARY_IMPORT_INSERT, [
+            (*params, entry_data['created_at']) for params, entry_data in zip(rows, entries)
+        ])
+        _add_batch_to_daily_totals(conn, totals)
+        kept = (json.loads(row['errors']) + errors)[:DIARY_IMPORT_MAX_ERRORS]
+        conn.execute('''
+            UPDATE diary_imports SET
+                rows_read = ?, rows_imported = rows_imported + ?, rows_skipped = rows_skipped + ?,
+                errors = ?, updated_at = ?
+            WHERE id = ?
+        ''', (end, len(rows), len(errors), json.dumps(kept), time.time(), import_id))
+        if rows:
+            bump_versions(conn, diary_version_keys(totals))
+
+@instrument_db
+def fail_diary_import(import_id, reason):
+    """Mark an import failed; its committed rows stay and running it again resumes after them"""
+    with db_connection() as conn:
+        row = conn.execute('SELECT errors FROM diary_imports WHERE id = ?', (import_id,)).fetchone()
+        if row is None:
+            return
+        errors = (json.loads(row['errors']) + [{'row': None, 'error': reason}])[-DIARY_IMPORT_MAX_ERRORS:]
+        conn.execute(
+            "UPDATE diary_imports SET status = 'failed', errors = ?, updated_at = ? WHERE id = ?",
+            (json.dumps(errors), time.time(), import_id)
+        )
+
+@instrument_db
+def finish_diary_import(import_id, user_id=DEFAULT_USER_ID):
+    """Mark an import done; food_usage is recomputed once so imported entries count from their own dates"""
+    with db_connection() as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute(
+            "UPDATE diary_imports SET status = 'done', updated_at = ? WHERE id = ?", (time.time(), import_id)
+        )
+        _rebuild_food_usage(conn, user_id)
+        bump_versions(conn, ['food_usage'])
+        row = conn.execute('SELECT * FROM diary_imports WHERE id = ?', (import_id,)).fetchone()
+    return _diary_import(row)
@@ -0,0 +1,78 @@
+# app/diary_export.py
+# Streaming diary export behind /diary/export.
+#
+# Entries are read oldest first in keyset batches of DIARY_EXPORT_BATCH rows
+# (database.get_diary_batch) and encoded into EXPORT_CHUNK_SIZE byte chunks,
+# so memory stays at one batch plus one chunk however long the range is. Each
+# batch borrows a pool connection only for its own query: a slow client
+# never pins a connection or holds a read transaction open.
+
+import csv
+import io
+import json
+import os
+
+from app.async_db import run_db
+from app.database import get_diary_batch
+
+DIARY_EXPORT_BATCH = int(os.getenv("DIARY_EXPORT_BATCH", "1000"))    # rows per query
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", str(64 * 1024)))  # bytes per response chunk
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",  # Starlette appends the charset
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _csv_encoder(columns):
+    """(header, encode rows) for CSV"""
+    text = io.StringIO()
+    writer = csv.writer(text, lineterminator="\n")
+
+    def encode(rows):
+        text.seek(0)
+        text.truncate()
+        writer.writerows(rows)
+        return text.getvalue().encode("utf-8")
+
+    return encode([columns]), encode
+
+def _ndjson_encoder(columns):
+    """(header, encode rows) for newline-delimited JSON"""
+    def encode(rows):
+        return "".join(
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False, separators=(",", ":")) + "\n"
+            for row in rows
+        ).encode("utf-8")
+
+    return b"", encode
+
+_ENCODERS = {"csv": _csv_encoder, "ndjson": _ndjson_encoder}
+
+
+def export_chunks(start, end, columns, fmt, batch=DIARY_EXPORT_BATCH, chunk_size=EXPORT_CHUNK_SIZE):
+    """Encoded export as chunk_size byte chunks (the last one shorter)"""
+    header, encode = _ENCODERS[fmt](list(columns))
+    pending = bytearray(header)
+    after = None
+    while True:
+        rows, after = get_diary_batch(start, end, columns, batch, after)
+        pending += encode(rows)
+        while len(pending) >= chunk_size:
+            yield bytes(pending[:chunk_size])
+            del pending[:chunk_size]
+        if after is None:
+            break
+    if pending:
+        yield bytes(pending)
+
+async def stream_export(start, end, columns, fmt):
+    """export_chunks for a StreamingResponse; each step runs on the database executor"""
+    # Nothing is held between chunks, so a client that disconnects just
+    # leaves the generator to be collected
+    chunks = export_chunks(start, end, columns, fmt)
+    while True:
+        chunk = await run_db(next, chunks, None)
+        if chunk is None:
+            return
+        yield chunk
@@ -0,0 +1,309 @@
+# app/diary_import.py
+# Bulk import of diary history from other trackers' CSV exports
+# (POST /diary/import, python -m app.manage import-diary).
+#
+# The file is read in streaming passes, so memory stays flat however many
+# years it covers:
+#   1. collect the distinct Nutritionix queries of rows without nutrition and
+#      resolve them concurrently, one lookup per distinct food and amount
+#   2. map rows onto diary_entries and insert them DIARY_IMPORT_CHUNK_SIZE at a
+#      time; each chunk is one transaction that also records the progress
+# An import is keyed by an id, by default the file's SHA-256. Running it
+# again with the same id skips the rows already committed, so an interrupted
+# import resumes where it stopped and a finished one is not duplicated.
+# Uploads (start_import) are copied aside and imported by a background task;
+# clients poll the import's progress.
+#
+# Columns are matched by header, ignoring case, punctuation and "(unit)"
+# suffixes, with common aliases ("food", "meal", "amount", "kcal",
+# "Carbohydrates (g)", ...); only food and date are required. Nutrient
+# columns hold the entry's totals. Rows missing any macro get nutrients from
+# Nutritionix scaled by quantity, like POST /diary/add.
+
+import asyncio
+import csv
+import hashlib
+import io
+import logging
+import os
+import re
+import shutil
+import tempfile
+from collections import deque
+from datetime import datetime, time as day_time
+from itertools import islice
+
+from app.async_db import run_db
+from app.database import (
+    fail_diary_import, finish_diary_import, get_diary_import, save_imported_entries, start_diary_import
+)
+from app.nutrients import MACROS, NUTRIENT_NAMES, NutrientVector
+from app.nutrition_cache import normalize_query
+from app.nutritionix_client import PRIORITY_BACKGROUND, UpstreamUnavailable
+from app.routes.nutrionix import get_nutrition_async
+
+logger = logging.getLogger(__name__)
+
+DIARY_IMPORT_CHUNK_SIZE = int(os.getenv("DIARY_IMPORT_CHUNK_SIZE", "2000"))  # rows per transaction
+
+_NUTRIENT_ALIASES = {
+    "calories": ("kcal", "energy", "energy_kcal", "calorie", "cals"),
+    "carbs": ("carbohydrates", "carbohydrate", "total_carbs", "total_carbohydrates"),
+    "fat": ("fats", "total_fat"),
+    "fiber": ("fibre", "dietary_fiber", "dietary_fibre"),
+    "sugar": ("sugars", "total_sugars"),
+}
+_FIELD_ALIASES = {
+    "food_name": ("food_name", "food", "name", "item", "description", "food_item"),
+    "food_id": ("food_id",),
+    "meal_type": ("meal_type", "meal", "meal_name"),
+    "quantity": ("quantity", "amount", "qty", "servings", "number_of_servings"),
+    "unit": ("unit", "unit_type", "units", "serving_unit"),
+    "date": ("date", "day", "logged_on"),
+    "time": ("time", "created_at", "timestamp", "logged_at"),
+    **{name: (name, *_NUTRIENT_ALIASES.get(name, ())) for name in NUTRIENT_NAMES},
+}
+_GRAM_UNITS = {"", "g", "gram", "grams"}
+_COUNT_UNITS = {"unit", "units", "serving", "servings", "piece", "pieces", "item", "items", "x"}
+_DATE_FORMATS = ("%m/%d/%Y", "%d.%m.%Y", "%Y/%m/%d")
+
+
+# ----------------- Columns and rows -----------------
+def _header_key(name):
+    """"Carbohydrates (g)" -> "carbohydrates" """
+    return re.sub(r"[^a-z0-9]+", "_", re.sub(r"\(.*?\)|\[.*?\]", "", name.lower())).strip("_")
+
+def map_columns(header):
+    """{diary field: column index} for a CSV header; ValueError without food and date columns"""
+    keys = [_header_key(name) for name in header]
+    columns = {}
+    for field, aliases in _FIELD_ALIASES.items():
+        index = next((keys.index(alias) for alias in aliases if alias in keys), None)
+        if index is not None:
+            columns[field] = index
+    missing = [field for field in ("food_name", "date") if field not in columns]
+    if missing:
+        raise ValueError(f"No {' or '.join(missing)} column in header {header}")
+    return columns
+
+def _cell(row, columns, field):
+    index = columns.get(field)
+    return row[index].strip() if index is not None and index < len(row) else ""
+
+def _number(text, field):
+    try:
+        return float(text)
+    except ValueError:
+        raise ValueError(f"{field} is not a number: {text!r}") from None
+
+def _timestamps(date_text, time_text):
+    """(YYYY-MM-DD, created_at) of a row; entries without a time are placed at noon"""
+    try:
+        parsed = datetime.fromisoformat(date_text)
+    except ValueError:
+        parsed = None
+        for fmt in _DATE_FORMATS:
+            try:
+                parsed = datetime.strptime(date_text, fmt)
+                break
+            except ValueError:
+                pass
+    if parsed is None:
+        raise ValueError(f"Unrecognized date {date_text!r}")
+
+    at = parsed.time() if len(date_text) > 10 else day_time(12)
+    if time_text:
+        try:
+            at = datetime.fromisoformat(time_text).time()
+        except ValueError:
+            try:
+                at = day_time.fromisoformat(time_text)
+            except ValueError:
+                pass
+    return parsed.strftime("%Y-%m-%d"), f"{parsed:%Y-%m-%d} {at:%H:%M:%S}"
+
+def parse_row(row, columns):
+    """Diary entry from a CSV row, plus the Nutritionix query and multiplier
+    its nutrients come from (None, None when the row has its own)"""
+    name = _cell(row, columns, "food_name")
+    if not name:
+        raise ValueError("No food name")
+    date, created_at = _timestamps(_cell(row, columns, "date"), _cell(row, columns, "time"))
+    quantity = _cell(row, columns, "quantity")
+    entry = {
+        "food_id": _cell(row, columns, "food_id") or f"import:{normalize_query(name)}",
+        "food_name": name,
+        "meal_type": (_cell(row, columns, "meal_type") or "snack").lower(),
+        "quantity": _number(quantity, "quantity") if quantity else 1.0,
+        "date": date,
+        "created_at": created_at,
+    }
+
+    values = {name: _cell(row, columns, name) for name in NUTRIENT_NAMES}
+    if all(values[macro] for macro in MACROS):
+        entry.update((name, _number(value, name) if value else 0.0) for name, value in values.items())
+        return entry, None, None
+
+    unit = _cell(row, columns, "unit").lower()
+    if unit in _GRAM_UNITS:
+        return entry, f"100g {name}", entry["quantity"] / 100
+    if unit in _COUNT_UNITS:
+        return entry, f"1 {name}", entry["quantity"]
+    return entry, f"1 {unit} {name}", entry["quantity"]
+
+
+# ----------------- Streaming passes -----------------
+def file_digest(stream):
+    """SHA-256 of a binary stream's content, the default import id"""
+    stream.seek(0)
+    digest = hashlib.sha256()
+    for block in iter(lambda: stream.read(1 << 20), b""):
+        digest.update(block)
+    return digest.hexdigest()
+
+def _csv_rows(stream):
+    """Column map, then every data row, of a binary UTF-8 CSV stream (BOM allowed)"""
+    stream.seek(0)
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    reader = csv.reader(text)
+    try:
+        header = next(reader, None)
+        if header is None:
+            raise ValueError("Empty file")
+        yield map_columns(header)
+        yield from reader
+    except csv.Error as e:
+        raise ValueError(f"line {reader.line_num}: {e}") from None
+    finally:
+        if not text.closed:
+            text.detach()  # leave the caller's stream open
+
+def _lookup_queries(stream, skip):
+    """Distinct Nutritionix queries of the rows after `skip` that carry no nutrition"""
+    rows = _csv_rows(stream)
+    columns = next(rows)
+    queries = {}
+    for row in islice(rows, skip, None):
+        try:
+            _, query, _ = parse_row(row, columns)
+        except ValueError:
+            continue
+        if query is not None:
+            queries.setdefault(normalize_query(query), query)
+    return queries
+
+def _chunks(stream, skip, size, nutrition):
+    """(start, end, entries, skipped rows) for consecutive chunks of data rows after `skip`"""
+    rows = _csv_rows(stream)
+    columns = next(rows)
+    deque(islice(rows, skip), maxlen=0)
+    start = skip
+    for chunk in iter(lambda: list(islice(rows, size)), []):
+        entries, errors = [], []
+        for number, row in enumerate(chunk, start + 1):
+            try:
+                entry, query, multiplier = parse_row(row, columns)
+                if query is not None:
+                    nutrients = nutrition.get(normalize_query(query))
+                    if not nutrients:
+                        raise ValueError(f"No nutrition found for {query!r}")
+                    entry.update(NutrientVector.from_mapping(nutrients).scaled(multiplier).to_dict(2))
+                entries.append(entry)
+            except ValueError as e:
+                errors.append({"row": number, "error": str(e)})
+        yield start, start + len(chunk), entries, errors
+        start += len(chunk)
+
+
+async def import_diary_csv(stream, import_id=None, filename=None, chunk_size=DIARY_IMPORT_CHUNK_SIZE, progress=None):
+    """Import a CSV diary export from a seekable binary stream; returns the import's progress
+
+    progress, if given, is called with the running counts after every chunk.
+    """
+    import_id = import_id or await asyncio.to_thread(file_digest, stream)
+    status = await run_db(start_diary_import, import_id, filename)
+    if status["status"] == "done":
+        return status
+
+    # Pass 1: resolve every missing nutrition lookup up front, once per query,
+    # behind any interactive Nutritionix calls
+    queries = await asyncio.to_thread(_lookup_queries, stream, status["rows_read"])
+    looked_up = await asyncio.gather(*(
+        get_nutrition_async(query, None, PRIORITY_BACKGROUND) for query in queries.values()
+    ))
+    nutrition = dict(zip(queries, looked_up))
+
+    # Pass 2: insert in chunks, each committed together with the progress
+    counts = {key: status[key] for key in ("rows_read", "rows_imported", "rows_skipped")}
+    chunks = _chunks(stream, status["rows_read"], chunk_size, nutrition)
+    while True:
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if chunk is None:
+            break
+        start, end, entries, errors = chunk
+        await run_db(save_imported_entries, import_id, entries, start, end, errors)
+        counts["rows_read"] = end
+        counts["rows_imported"] += len(entries)
+        counts["rows_skipped"] += len(errors)
+        if progress:
+            progress({"id": import_id, "lookups": len(queries), **counts})
+    return await run_db(finish_diary_import, import_id)
+
+
+# ----------------- Background imports -----------------
+_running = {}  # import id -> task, for the imports running in this process
+
+def _spool(upload):
+    """Copy an uploaded binary stream to a temporary file and check its header; returns (path, SHA-256)"""
+    digest = hashlib.sha256()
+    upload.seek(0)
+    with tempfile.NamedTemporaryFile("wb", prefix="diary_import_", suffix=".csv", delete=False) as copy:
+        for block in iter(lambda: upload.read(1 << 20), b""):
+            digest.update(block)
+            copy.write(block)
+    try:
+        with open(copy.name, "rb") as stream:
+            next(_csv_rows(stream))  # ValueError on an empty file or missing columns
+    except ValueError:
+        os.unlink(copy.name)
+        raise
+    return copy.name, digest.hexdigest()
+
+async def _import_in_background(path, import_id, filename):
+    try:
+        with open(path, "rb") as stream:
+            await import_diary_csv(stream, import_id, filename=filename)
+    except RuntimeError as e:  # another worker is running it
+        logger.info("Diary import skipped", extra={"import_id": import_id, "error": str(e)})
+    except UpstreamUnavailable as e:
+        await run_db(fail_diary_import, import_id, f"{e}; upload the file again to resume")
+    except Exception as e:
+        logger.exception("Diary import failed", extra={"import_id": import_id})
+        await run_db(fail_diary_import, import_id, str(e))
+    finally:
+        _running.pop(import_id, None)
+        os.unlink(path)
+
+async def start_import(upload, import_id=None, filename=None):
+    """Copy an uploaded CSV aside and import it in the background; returns the import's progress so far
+
+    ValueError when the file is not a CSV with food and date columns.
+    """
+    path, digest = await asyncio.to_thread(_spool, upload)
+    import_id = import_id or digest
+    if import_id in _running:  # the same upload twice: keep the running import
+        os.unlink(path)
+        return await run_db(get_diary_import, import_id)
+    status = await run_db(start_diary_import, import_id, filename)
+    if status["status"] == "done":
+        os.unlink(path)
+        return status
+    _running[import_id] = asyncio.create_task(_import_in_background(path, import_id, filename))
+    return status
+
+async def stop_imports():
+    """Cancel the background imports (called on shutdown); uploading their files again resumes them"""
+    tasks = list(_running.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
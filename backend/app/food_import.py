@@ -0,0 +1,189 @@
+# app/food_import.py
+# Streaming readers for bulk catalog imports (python -m app.manage import-foods).
+# Each reader yields catalog food dicts one at a time so memory stays flat
+# however large the dump is; app.catalog.import_foods writes them in chunks.
+#
+# Supported inputs (.gz compressed files work too):
+#   fdc-json  USDA FoodData Central JSON download ({"FoundationFoods": [...]},
+#             SR Legacy, Survey, Branded), decoded one food at a time
+#   jsonl     one food per line, FDC or catalog shaped
+#   fdc-csv   FDC CSV folder: food.csv, food_nutrient.csv, nutrient.csv
+#   csv       flat CSV: id, name, serving_size, serving_unit and nutrient columns
+#
+# FDC amounts are per 100 g, so FDC foods get a 100 g serving.
+
+import csv
+import gzip
+import json
+import os
+from itertools import groupby
+
+from app.nutrients import NUTRIENTS
+
+FORMATS = ("fdc-json", "jsonl", "fdc-csv", "csv")
+
+
+def _open_text(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def _number(value):
+    """FDC nutrient number as text ("208.0" and 208 -> "208")"""
+    text = str(value).strip()
+    return text[:-2] if text.endswith(".0") else text
+
+
+def _amount(value):
+    if value is None or value == "":
+        return 0.0
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _fdc_catalog_food(fdc_id, name, amounts):
+    """Catalog food from an FDC id, description and {nutrient number: amount per 100 g}"""
+    food = {"id": f"fdc:{fdc_id}", "name": name.strip(), "serving_size": 100, "serving_unit": "g"}
+    for nutrient in NUTRIENTS:
+        food[nutrient.name] = next((amounts[n] for n in nutrient.fdc if n in amounts), 0.0)
+    return food
+
+
+def fdc_food(item):
+    """Catalog food from one FDC JSON food (full or abridged format)"""
+    amounts = {}
+    for entry in item.get("foodNutrients", ()):
+        nutrient = entry.get("nutrient") or {}
+        number = nutrient.get("number", entry.get("nutrientNumber"))
+        amount = entry.get("amount", entry.get("value"))
+        if number is not None and amount is not None:
+            amounts[_number(number)] = _amount(amount)
+    return _fdc_catalog_food(item["fdcId"], item.get("description") or "", amounts)
+
+
+def flat_food(row):
+    """Catalog food from a flat record (CSV row or catalog-shaped JSON)"""
+    food = {
+        "id": row.get("id") or row.get("fdc_id"),
+        "name": (row.get("name") or row.get("description") or "").strip(),
+        "serving_size": _amount(row["serving_size"]) if row.get("serving_size") not in (None, "") else None,
+        "serving_unit": row.get("serving_unit") or None,
+    }
+    for nutrient in NUTRIENTS:
+        food[nutrient.name] = _amount(row.get(nutrient.name))
+    return food
+
+
+def _any_food(item):
+    return fdc_food(item) if "fdcId" in item else flat_food(item)
+
+
+def iter_json_array(stream, read_size=1 << 20):
+    """Items of the first JSON array in a text stream, decoded one at a time"""
+    decoder = json.JSONDecoder()
+    buffer = stream.read(read_size)
+    start = buffer.find("[")
+    while start == -1:
+        more = stream.read(read_size)
+        if not more:
+            return
+        buffer += more
+        start = buffer.find("[")
+    pos = start + 1
+    eof = False
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == "]":
+            return
+        try:
+            if pos >= len(buffer):
+                raise ValueError("need more input")
+            item, pos = decoder.raw_decode(buffer, pos)
+        except ValueError:
+            if eof:
+                raise ValueError("truncated JSON array") from None
+            more = stream.read(read_size)
+            eof = not more
+            buffer = buffer[pos:] + more
+            pos = 0
+            continue
+        yield item
+
+
+def iter_fdc_json(path):
+    with _open_text(path) as stream:
+        for item in iter_json_array(stream):
+            yield _any_food(item)
+
+
+def iter_jsonl(path):
+    with _open_text(path) as stream:
+        for line in stream:
+            if line.strip():
+                yield _any_food(json.loads(line))
+
+
+def iter_csv(path):
+    with _open_text(path) as stream:
+        for row in csv.DictReader(stream):
+            yield flat_food(row)
+
+
+def iter_fdc_csv(folder):
+    """Join food.csv with food_nutrient.csv; FDC writes each food's nutrient rows together"""
+    def table(name):
+        for candidate in (name, name + ".gz"):
+            path = os.path.join(folder, candidate)
+            if os.path.exists(path):
+                return path
+        raise FileNotFoundError(os.path.join(folder, name))
+
+    with _open_text(table("nutrient.csv")) as stream:
+        numbers = {row["id"]: _number(row["nutrient_nbr"]) for row in csv.DictReader(stream) if row.get("nutrient_nbr")}
+    # Descriptions only (a few tens of MB for the full Branded set); popped as foods are emitted
+    with _open_text(table("food.csv")) as stream:
+        names = {row["fdc_id"]: row["description"] for row in csv.DictReader(stream)}
+
+    with _open_text(table("food_nutrient.csv")) as stream:
+        for fdc_id, rows in groupby(csv.DictReader(stream), key=lambda row: row["fdc_id"]):
+            name = names.pop(fdc_id, None)
+            if not name:
+                continue
+            amounts = {}
+            for row in rows:
+                number = numbers.get(row["nutrient_id"])
+                if number:
+                    amounts[number] = _amount(row["amount"])
+            yield _fdc_catalog_food(fdc_id, name, amounts)
+
+
+def detect_format(path):
+    """Guess the input format from the path"""
+    if os.path.isdir(path):
+        return "fdc-csv"
+    name = os.path.basename(path).lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    if name.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    if name.endswith(".json"):
+        return "fdc-json"
+    if name.endswith(".csv"):
+        return "csv"
+    raise ValueError(f"Cannot tell the format of {path}; pass --format")
+
+
+def iter_foods(path, fmt=None):
+    """Catalog foods from a dump, skipping records without an id or name"""
+    fmt = fmt or detect_format(path)
+    readers = {"fdc-json": iter_fdc_json, "jsonl": iter_jsonl, "fdc-csv": iter_fdc_csv, "csv": iter_csv}
+    if fmt not in readers:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    for food in readers[fmt](path):
+        if food["id"] and food["name"]:
+            yield food
@@ -0,0 +1,182 @@
+# app/fuzzy.py
+# Typo-tolerant search: a character-trigram index over the distinct words of
+# catalog names ("bananna" -> banana, "chiken" -> chicken). app.catalog
+# corrects each unknown query word with it and runs the corrected query
+# through the normal FTS5 search, so misspellings resolve locally.
+#
+# Correcting one word:
+#   1. count shared word-padded trigrams (pg_trgm style) against every
+#      vocabulary word in one pass over the query's posting lists
+#   2. prune: length filter, then Jaccard similarity >= FUZZY_MIN_SIMILARITY,
+#      then keep the FUZZY_CANDIDATES most similar
+#   3. verify those with an edit distance (transpositions count once)
+#      bounded by the word length; a second or third edit also needs a
+#      similarity of FUZZY_MULTI_EDIT_SIMILARITY ("bread" is not "breast")
+# Among the survivors the fewest edits win, then similarity, then the word
+# found in more foods.
+#
+# A query is only corrected when every word is known or has a correction:
+# dropping a word ("apple pie" -> "apple") would answer with the wrong food.
+
+import heapq
+import math
+import os
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+from itertools import chain
+
+FUZZY_MIN_SIMILARITY = float(os.getenv("FUZZY_MIN_SIMILARITY", "0.2"))
+FUZZY_MULTI_EDIT_SIMILARITY = float(os.getenv("FUZZY_MULTI_EDIT_SIMILARITY", "0.5"))
+FUZZY_CANDIDATES = 20   # verified with edit distance per word
+FUZZY_MIN_WORD = 3      # shorter words are left alone
+FUZZY_MIN_CORRECTED = 4  # shorter unknown words have no correction ("oat" is not "oats")
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def fold(text):
+    """Lowercase without diacritics, matching FTS5's unicode61 remove_diacritics"""
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def words(text):
+    """Folded words of a name or query"""
+    return _WORD_RE.findall(fold(text))
+
+
+def trigrams(word):
+    """Word-padded trigrams ("egg" -> "  e", " eg", "egg", "gg ")"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edits(word):
+    """Typos tolerated in a word of this length"""
+    return 1 if len(word) <= 5 else 2 if len(word) <= 8 else 3
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance, or limit + 1 once it is exceeded"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+class TrigramIndex:
+    """Trigram inverted index over a vocabulary of words with document counts"""
+
+    def __init__(self, vocabulary=()):
+        self.build(vocabulary)
+
+    def build(self, vocabulary):
+        """(Re)build from (word, document count) pairs"""
+        vocabulary = sorted(dict(vocabulary).items())
+        self._words = [word for word, _ in vocabulary]
+        self._counts = [count for _, count in vocabulary]
+        self._ids = {word: i for i, word in enumerate(self._words)}
+        self._sizes = []
+        postings = {}
+        for i, word in enumerate(self._words):
+            grams = trigrams(word)
+            self._sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        self._postings = postings
+
+    def __len__(self):
+        return len(self._words)
+
+    def known(self, word, prefix=False):
+        """Whether word is in the vocabulary (or starts some word, with prefix=True)"""
+        if word in self._ids:
+            return True
+        if prefix:
+            i = bisect_left(self._words, word)
+            return i < len(self._words) and self._words[i].startswith(word)
+        return False
+
+    def correct(self, word):
+        """Closest vocabulary word within the edit budget, or None"""
+        grams = trigrams(word)
+        n = len(grams)
+        limit = max_edits(word)
+        shared = Counter(chain.from_iterable(self._postings.get(gram, ()) for gram in grams))
+        # Fewest shared trigrams that can reach the similarity floor: a word
+        # within the length filter has at least n - limit trigrams
+        t = FUZZY_MIN_SIMILARITY
+        min_shared = max(1, math.ceil(t * (2 * n - limit) / (1 + t)))
+
+        scored = []
+        for i, count in shared.items():
+            if count < min_shared or abs(self._sizes[i] - n) > limit:
+                continue
+            similarity = count / (n + self._sizes[i] - count)
+            if similarity >= t:
+                scored.append((similarity, self._counts[i], i))
+
+        best, best_key = None, None
+        for similarity, count, i in heapq.nlargest(FUZZY_CANDIDATES, scored):
+            edits = edit_distance(word, self._words[i], limit)
+            if edits > limit or (edits > 1 and similarity < FUZZY_MULTI_EDIT_SIMILARITY):
+                continue
+            key = (-edits, similarity, count)
+            if best_key is None or key > best_key:
+                best, best_key = self._words[i], key
+        return best
+
+    def _split(self, word):
+        """Two known words run together ("peanutbutter" -> "peanut butter"), or None"""
+        splits = [
+            (self._counts[self._ids[word[:i]]] + self._counts[self._ids[word[i:]]], word[:i], word[i:])
+            for i in range(FUZZY_MIN_WORD, len(word) - FUZZY_MIN_WORD + 1)
+            if word[:i] in self._ids and word[i:] in self._ids
+        ]
+        return " ".join(max(splits)[1:]) if splits else None
+
+    def correct_query(self, query):
+        """query with unknown words corrected; None if nothing changed or a word has no correction"""
+        query_words = words(query)
+        corrected, changed = [], False
+        i = 0
+        while i < len(query_words):
+            word = query_words[i]
+            last = i == len(query_words) - 1
+            i += 1
+            # The last word may still be being typed: a known prefix is fine
+            if self.known(word, prefix=last) or len(word) < FUZZY_MIN_WORD or word.isdigit():
+                corrected.append(word)
+                continue
+            changed = True
+            # A word split in two ("chick peas", "egg plant")
+            if not last and word + query_words[i] in self._ids:
+                corrected.append(word + query_words[i])
+                i += 1
+                continue
+            if corrected and corrected[-1] + word in self._ids:
+                corrected[-1] += word
+                continue
+            replacement = self._split(word)
+            if replacement is None and len(word) >= FUZZY_MIN_CORRECTED:
+                replacement = self.correct(word)
+            if replacement is None:
+                return None  # searching without the word would find some other food
+            corrected.append(replacement)
+        if not changed:
+            return None
+        return " ".join(corrected)
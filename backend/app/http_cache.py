@@ -0,0 +1,125 @@
+# app/http_cache.py
+# Conditional GET (ETag / Last-Modified -> 304) and response compression
+# helpers. Brotli is used when the optional `brotli` package is installed,
+# otherwise gzip.
+
+import gzip
+import json
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))  # bytes
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+
+# ----------------- Validators -----------------
+def make_etag(*parts) -> str:
+    """Weak ETag from version parts (weak: gzip/br variants share it)"""
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+def validator_headers(etag: str, updated_at=None) -> dict:
+    """ETag/Last-Modified headers; no-cache makes clients revalidate every time"""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if updated_at is not None:
+        headers["Last-Modified"] = formatdate(updated_at, usegmt=True)
+    return headers
+
+# One entity-tag of an If-None-Match list; the quoted part may contain commas
+_ENTITY_TAG_RE = re.compile(r'\s*(?:W/)?("[^"]*")\s*(?:,|$)')
+
+def _opaque(etag: str) -> str:
+    etag = etag.strip()
+    return etag[2:] if etag.startswith("W/") else etag
+
+def _entity_tags(header: str):
+    """Opaque tags of an If-None-Match list, or None if it is malformed"""
+    tags, pos = [], 0
+    while pos < len(header):
+        match = _ENTITY_TAG_RE.match(header, pos)
+        if match is None or match.end() == pos:
+            return None
+        tags.append(match.group(1))
+        pos = match.end()
+    return tags
+
+def is_not_modified(request: Request, etag: str, updated_at=None, exists=True) -> bool:
+    """True when the client's cached copy (If-None-Match / If-Modified-Since) is current
+
+    exists: whether the resource has a current representation, which is
+    what If-None-Match: * asks about (RFC 9110 13.1.2).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence; weak comparison per RFC 9110
+        if if_none_match.strip() == "*":
+            return exists
+        tags = _entity_tags(if_none_match)
+        return tags is not None and _opaque(etag) in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and updated_at is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have one-second resolution: a write later in the same
+        # second as the client's copy would share its date, so only a copy
+        # from a later second proves it is current
+        return updated_at < since
+    return False
+
+def not_modified(headers: dict) -> Response:
+    """Empty 304 carrying the validators"""
+    return Response(status_code=304, headers=headers)
+
+
+# ----------------- Compression -----------------
+def accepted_encoding(request: Request):
+    """Best supported Content-Encoding the client accepts (None for identity)"""
+    accepted = set()
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.partition(";")
+        quality = params.replace(" ", "").lower()
+        if quality.startswith("q=") and quality[2:].strip("0.") == "":
+            continue  # q=0 means "not acceptable"
+        accepted.add(name.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+def encode_json(payload) -> bytes:
+    """Serialize like FastAPI's JSONResponse"""
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+def compress(body: bytes, encoding) -> bytes:
+    """Compress a body for the given Content-Encoding"""
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
+
+def encoded_body(body: bytes, encoding):
+    """(body, encoding actually applied); small bodies are sent as-is"""
+    if encoding is None or len(body) < COMPRESS_MIN_SIZE:
+        return body, None
+    return compress(body, encoding), encoding
+
+def json_bytes_response(body: bytes, encoding=None, headers=None) -> Response:
+    """JSON response from an already serialized (and maybe compressed) body"""
+    headers = dict(headers or {})
+    headers["Vary"] = "Accept-Encoding"
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,140 @@
+# app/logging_config.py
+# Leveled, structured logging. Request code only enqueues records; a
+# QueueListener thread formats them as JSON lines and writes to stdout, so
+# slow terminals or log pipes never add latency to a request.
+#
+#   LOG_LEVEL=INFO                                   default level for app.*
+#   LOG_LEVELS=app.routes.diary=DEBUG,app.database=WARNING
+#   LOG_FORMAT=json|text
+#   LOG_DEBUG_SAMPLE_RATE=0.1                        fraction of hot-path DEBUG records kept
+#
+# The caller's thread only renders the message and snapshots container
+# extras (e.g. an entry dict the caller keeps changing); JSON encoding and
+# writing happen on the listener thread.
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))
+# Loggers that dump a diary entry per request at DEBUG; only these are sampled
+SAMPLED_DEBUG_LOGGERS = ("app.database", "app.routes.diary")
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener = None
+_atexit_registered = False
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, message, extra fields, exc"""
+
+    def format(self, record):
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        payload.update((k, v) for k, v in vars(record).items() if k not in _RECORD_FIELDS)
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class DebugSampler(logging.Filter):
+    """Keep only a fraction of the DEBUG records of the given loggers (entry dumps are high volume)"""
+
+    def __init__(self, rate, loggers=SAMPLED_DEBUG_LOGGERS):
+        super().__init__()
+        self.rate = rate
+        self.loggers = tuple(loggers)
+
+    def _sampled(self, name):
+        return any(name == logger or name.startswith(logger + ".") for logger in self.loggers)
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or not self._sampled(record.name) or random.random() < self.rate
+
+
+def _snapshot(value):
+    """value as it is now: containers are copied as their JSON form"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return json.loads(json.dumps(value, default=str))
+
+
+class _EnqueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves JSON encoding and writing to the listener thread"""
+
+    def prepare(self, record):
+        # Like the stock prepare(), fix the message on the caller's thread,
+        # since args and extras may change once the call returns; unlike it,
+        # keep the record structured for the listener's JsonFormatter
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        for key, value in list(vars(record).items()):
+            if key not in _RECORD_FIELDS:
+                setattr(record, key, _snapshot(value))
+        return record
+
+
+def parse_levels(spec):
+    """"logger=LEVEL,..." -> {logger: LEVEL}"""
+    levels = {}
+    for part in spec.split(","):
+        name, _, level = part.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging():
+    """Route the app's loggers through the background queue (idempotent)"""
+    global _listener, _atexit_registered
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    enqueue = _EnqueueHandler(log_queue)
+    enqueue.addFilter(DebugSampler(LOG_DEBUG_SAMPLE_RATE))
+
+    app_logger = logging.getLogger("app")
+    app_logger.handlers[:] = [enqueue]
+    app_logger.propagate = False
+    app_logger.setLevel(LOG_LEVEL)
+    for name, level in parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    if not _atexit_registered:  # setup runs again after every shutdown (one per app start)
+        atexit.register(shutdown_logging)
+        _atexit_registered = True
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+_atexit_registered = False
@@ -1,25 +1,70 @@
 # This is main.py
 # This file's purpose is to define the main application and its routes
 
-from fastapi import FastAPI, middleware, Query, HTTPException
+import logging
+import math
+
+from fastapi import FastAPI, middleware, Query, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware import cors
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional
-from app.data import foods, get_food_by_id
+from contextlib import asynccontextmanager
+from datetime import datetime
+from functools import lru_cache
+from app.catalog import (
+    get_food_by_id, get_foods_by_ids, get_foods_page, search_foods, match_foods, FOOD_FIELDS,
+    DEFAULT_SEARCH_LIMIT
+)
+from app.autocomplete import (
+    complete_from_memory, complete_food_names, AUTOCOMPLETE_DEFAULT_K, AUTOCOMPLETE_MAX_K
+)
 from app.database import (
     init_database, get_user_stats, update_user_stats, 
-     get_diary_entries, delete_diary_entry, get_daily_summary
+     delete_diary_entry, get_daily_summary, close_pool,
+     get_range_summary, get_data_versions, day_key, diary_version_key,
+     get_diary_page, DIARY_COLUMNS, get_food_usage, EXPORT_COLUMNS, export_day_range, PoolExhausted
+)
+from app.diary_export import stream_export, EXPORT_MEDIA_TYPES
+from app.diary_import import stop_imports
+from app.pagination import (
+    encode_cursor, decode_cursor, parse_fields, project,
+    FOODS_PAGE_DEFAULT, DIARY_PAGE_DEFAULT, PAGE_MAX
 )
-from app.routes import food, diary
+from app.http_cache import (
+    make_etag, validator_headers, is_not_modified, not_modified,
+    accepted_encoding, encode_json, encoded_body, json_bytes_response
+)
+from app.async_db import run_db, shutdown_db_executor
+from app.logging_config import setup_logging, shutdown_logging
+from app.metrics import MetricsMiddleware, render as render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from app.nutritionix_client import nutritionix as nutritionix_client, shutdown_upstream, UpstreamUnavailable
+from app.routes import food, diary, nutrionix
+
+logger = logging.getLogger(__name__)
 
-# Initialize database on startup
-init_database()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Per-worker startup and shutdown; nothing heavy runs at import time"""
+    setup_logging()
+    # Applies pending migrations; a no-op once the schema version matches
+    await run_db(init_database)
+    logger.debug("Routes registered", extra={"routes": [route.path for route in app.routes]})
+    yield
+    await stop_imports()
+    # Everything below is re-created on first use, so the app can start again
+    # in the same process (e.g. one TestClient per test)
+    shutdown_upstream()
+    nutritionix_client.close()
+    shutdown_db_executor()
+    close_pool()
+    shutdown_logging()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.include_router(food.router, prefix="/api")
 app.include_router(diary.router, prefix="/diary")
-print(app.routes)
+app.include_router(nutrionix.router, prefix="/admin/nutritionix")
 allowed_origins = [
     "http://localhost:8080",
     "http://localhost:5173",  # Vite default port
@@ -32,6 +77,22 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so it times the whole request including CORS handling
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(UpstreamUnavailable)
+async def upstream_unavailable(request: Request, exc: UpstreamUnavailable):
+    """Nutritionix rate limited or out of quota: 503 with Retry-After instead of a 500"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"{exc}, try again later"},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
+
+@app.exception_handler(PoolExhausted)
+async def pool_exhausted(request: Request, exc: PoolExhausted):
+    """Every database connection is busy: 503 so clients back off instead of waiting forever"""
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
 
 # Pydantic models for request/response
 class DiaryEntryCreate(BaseModel):
@@ -64,74 +125,265 @@ class DiaryEntryResponse(BaseModel):
     sugar: float
     sodium: float
 
+# ----------------- Conditional GET -----------------
+async def check_version(request: Request, *keys: str):
+    """Validators for data_versions keys; returns (304 response or None, headers)"""
+    # Read before the data: a write in between only makes the ETag older
+    # than the body, which costs one extra 200 and never a stale 304
+    versions = await run_db(get_data_versions, keys)
+    parts, updated_at = [], None
+    for key in keys:
+        version, key_updated_at = versions[key]
+        parts += [key.replace(":", "-"), version]
+        if key_updated_at is not None:
+            parts.append(int(key_updated_at * 1000))
+            updated_at = max(updated_at or 0, key_updated_at)
+    headers = validator_headers(make_etag(*parts), updated_at)
+    # Nothing recorded for any key: don't claim a representation to If-None-Match: *
+    if is_not_modified(request, headers["ETag"], updated_at, exists=updated_at is not None):
+        return not_modified(headers), headers
+    return None, headers
+
+@lru_cache(maxsize=16)
+def _catalog_page_body(etag: str, after_id: Optional[str], limit: int, fields, encoding: Optional[str]):
+    """Serialized (and compressed) catalog page, cached per catalog version; runs on the DB executor"""
+    try:
+        page, has_more = get_foods_page(after_id, limit)
+    except KeyError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    payload = {
+        "foods": project(page, fields),
+        "next_cursor": encode_cursor({"after": page[-1]["id"]}) if has_more else None,
+    }
+    return encoded_body(encode_json(payload), encoding)
+
+async def diary_page(date: str, limit: int, cursor: Optional[str], fields: Optional[str]):
+    """One page of a day's diary plus the cursor for the next one"""
+    fields = parse_fields(fields, DIARY_COLUMNS)
+    after = None
+    if cursor:
+        position = decode_cursor(cursor, created_at=str, id=int)
+        after = (position["created_at"], position["id"])
+    entries, next_after = await run_db(get_diary_page, date, limit, after, fields)
+    next_cursor = encode_cursor({"created_at": next_after[0], "id": next_after[1]}) if next_after else None
+    return entries, next_cursor
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Welcome to the Tracking App!"}
 
 @app.get("/foods")
-def get_foods(q: str = Query(None, description="Search query")):
-    if q:
-        result = [food for food in foods if q.lower() in food["name"].lower()]
+async def get_foods(
+    request: Request,
+    q: str = Query(None, description="Search query"),
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX, description=f"Page size (default {FOODS_PAGE_DEFAULT}, search {DEFAULT_SEARCH_LIMIT})"),
+    ids: Optional[str] = Query(None, description="Comma-separated food ids to fetch in one request"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,name,calories"),
+):
+    unchanged, headers = await check_version(request, "catalog")
+    if unchanged:
+        return unchanged
+
+    encoding = accepted_encoding(request)
+    fields = parse_fields(fields, FOOD_FIELDS)
+    if ids:
+        found, missing = await run_db(get_foods_by_ids, [i.strip() for i in ids.split(",") if i.strip()])
+        payload = {"foods": project(found, fields), "missing": missing}
+    elif q:
+        # Search results are ranked, not keyed: page by offset into the ranking
+        position = decode_cursor(cursor, offset=int) if cursor else {"offset": 0}
+        offset, search_q = position["offset"], position.get("q", q)
+        if offset < 0 or not isinstance(search_q, str):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        limit = limit or DEFAULT_SEARCH_LIMIT
+        if offset == 0:
+            # No hits: retry with misspelled words corrected against the catalog
+            ranked, corrected = await run_db(match_foods, q, limit + 1)
+            search_q = corrected or q
+        else:
+            ranked = await run_db(search_foods, search_q, limit + 1, offset)
+        next_position = {"offset": offset + limit}
+        if search_q != q:
+            next_position["q"] = search_q
+        payload = {
+            "foods": project(ranked[:limit], fields),
+            "next_cursor": encode_cursor(next_position) if len(ranked) > limit else None,
+            "corrected_query": search_q if search_q != q else None,
+        }
     else:
-        result = foods
-    return {"foods": result}
+        after_id = decode_cursor(cursor, after=str)["after"] if cursor else None
+        body, encoding = await run_db(
+            _catalog_page_body, headers["ETag"], after_id, limit or FOODS_PAGE_DEFAULT, fields, encoding
+        )
+        return json_bytes_response(body, encoding, headers)
+    body, encoding = encoded_body(encode_json(payload), encoding)
+    return json_bytes_response(body, encoding, headers)
+@app.get("/foods/autocomplete")
+async def autocomplete_foods(
+    prefix: str = Query("", max_length=200, description="What has been typed so far"),
+    k: int = Query(AUTOCOMPLETE_DEFAULT_K, ge=1, le=AUTOCOMPLETE_MAX_K),
+):
+    """Catalog and previously looked-up Nutritionix names starting with prefix, most logged first"""
+    # Answered on the event loop from the in-memory index; SQLite only to build or refresh it
+    suggestions = complete_from_memory(prefix, k)
+    if suggestions is None:
+        suggestions = await run_db(complete_food_names, prefix, k)
+    return {"prefix": prefix, "suggestions": suggestions}
 @app.get("/api/foods/recent")
-def get_recent_foods():
-    # For now, return the first 5 foods as "recent"
-    # Later this will be based on user's actual recent usage
-    return {"foods": foods[:5]}
+async def get_recent_foods(
+    request: Request,
+    response: Response,
+    kind: str = Query("recent", regex="^(recent|frequent)$", description="Order by last use or by decayed use count"),
+    limit: int = Query(5, ge=1, le=50),
+):
+    """Foods the user logs most recently or most often, with the last logged portion"""
+    # The catalog answers until something is logged, so its changes count too
+    unchanged, headers = await check_version(request, "food_usage", "catalog")
+    if unchanged:
+        return unchanged
+    response.headers.update(headers)
+    recent = await run_db(get_food_usage, kind, limit)
+    if not recent:
+        # Nothing logged yet: suggest from the catalog
+        recent, _ = await run_db(get_foods_page, None, limit)
+    return {"foods": recent}
 @app.get("/foods/{food_id}")
-def get_food_by_id_endpoint(food_id: str):
-    food = get_food_by_id(food_id)
+async def get_food_by_id_endpoint(food_id: str):
+    food = await run_db(get_food_by_id, food_id)
     if food is None:
         raise HTTPException(status_code=404, detail="Food not found")
     return {"food": food}
 
 # User stats endpoints
 @app.get("/user/stats")
-def get_user_stats_endpoint():
+async def get_user_stats_endpoint(request: Request, response: Response):
     """Get current user stats and targets"""
-    stats = get_user_stats()
+    unchanged, headers = await check_version(request, "user_stats")
+    if unchanged:
+        return unchanged
+    response.headers.update(headers)
+    stats = await run_db(get_user_stats)
     if not stats:
         raise HTTPException(status_code=404, detail="User stats not found")
     return stats
 
 @app.put("/user/stats")
-def update_user_stats_endpoint(stats: UserStatsUpdate):
+async def update_user_stats_endpoint(stats: UserStatsUpdate):
     """Update user stats and recalculate targets"""
-    updated_targets = update_user_stats(stats.dict())
+    updated_targets = await run_db(update_user_stats, stats.dict())
     return {"message": "User stats updated successfully", "new_targets": updated_targets}
 
 # Diary endpoints
 @app.get("/diary")
-def get_todays_diary():
+async def get_todays_diary(
+    request: Request,
+    response: Response,
+    limit: int = Query(DIARY_PAGE_DEFAULT, ge=1, le=PAGE_MAX),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+):
     """Get today's diary entries"""
-    entries = get_diary_entries()
-    return {"entries": entries}
+    today = datetime.now().strftime("%Y-%m-%d")
+    unchanged, headers = await check_version(request, diary_version_key(day_key(today)))
+    if unchanged:
+        return unchanged
+    response.headers.update(headers)
+    entries, next_cursor = await diary_page(today, limit, cursor, fields)
+    return {"entries": entries, "next_cursor": next_cursor}
 
 @app.delete("/diary/{entry_id}")
-def remove_diary_entry_endpoint(entry_id: int):
+async def remove_diary_entry_endpoint(entry_id: int):
     """Remove a diary entry"""
-    delete_diary_entry(entry_id)
+    await run_db(delete_diary_entry, entry_id)
     return {"message": "Diary entry removed successfully"}
 
 @app.get("/diary/summary/{date}")
-def get_daily_summary_endpoint(date: str):
+async def get_daily_summary_endpoint(date: str, request: Request, response: Response):
     """Get daily nutrition summary for a specific date"""
-    summary = get_daily_summary(date)
+    day = day_key(date)
+    if day is not None:
+        unchanged, headers = await check_version(request, diary_version_key(day), "user_stats")
+        if unchanged:
+            return unchanged
+        response.headers.update(headers)
+    summary = await run_db(get_daily_summary, date)
     return summary
 
 @app.get("/diary/summary")
-def get_todays_summary_endpoint():
-    """Get today's nutrition summary"""
-    summary = get_daily_summary()
-    return summary
+async def get_todays_summary_endpoint(
+    request: Request,
+    response: Response,
+    from_date: Optional[str] = Query(None, alias="from", description="Range start (YYYY-MM-DD)"),
+    to_date: Optional[str] = Query(None, alias="to", description="Range end (YYYY-MM-DD), defaults to today"),
+    granularity: str = Query("day", regex="^(day|week|month)$"),
+):
+    """Get today's nutrition summary, or per-period totals for a date range"""
+    if from_date is None and to_date is None:
+        today = datetime.now().strftime("%Y-%m-%d")
+        unchanged, headers = await check_version(request, diary_version_key(day_key(today)), "user_stats")
+        if unchanged:
+            return unchanged
+        response.headers.update(headers)
+        summary = await run_db(get_daily_summary, today)
+        return summary
+
+    if from_date is None:
+        raise HTTPException(status_code=400, detail="'from' is required when 'to' is given")
+    to_date = to_date or datetime.now().strftime("%Y-%m-%d")
+    unchanged, headers = await check_version(request, "diary", "user_stats")
+    if unchanged:
+        return unchanged
+    response.headers.update(headers)
+    try:
+        return await run_db(get_range_summary, from_date, to_date, granularity)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Declared before /diary/{date}, which would otherwise match "export"
+@app.get("/diary/export")
+async def export_diary(
+    from_date: Optional[str] = Query(None, alias="from", description="First day (YYYY-MM-DD), default the oldest entry"),
+    to_date: Optional[str] = Query(None, alias="to", description="Last day (YYYY-MM-DD), default the newest entry"),
+    format: str = Query("csv", regex="^(csv|ndjson)$"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns, default date, food, meal, quantity and nutrients"),
+):
+    """Stream diary entries in a date range as CSV or NDJSON, oldest first"""
+    columns = parse_fields(fields, DIARY_COLUMNS) or EXPORT_COLUMNS
+    try:
+        start, end = export_day_range(from_date, to_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    filename = f"diary_{from_date or 'start'}_{to_date or 'end'}.{format}"
+    return StreamingResponse(
+        stream_export(start, end, columns, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 @app.get("/diary/{date}")
-def get_diary_by_date(date: str):
+async def get_diary_by_date(
+    date: str,
+    request: Request,
+    response: Response,
+    limit: int = Query(DIARY_PAGE_DEFAULT, ge=1, le=PAGE_MAX),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+):
     """Get diary entries for a specific date (YYYY-MM-DD format)"""
-    entries = get_diary_entries(date)
-    return {"entries": entries, "date": date}
+    day = day_key(date)
+    if day is not None:
+        unchanged, headers = await check_version(request, diary_version_key(day))
+        if unchanged:
+            return unchanged
+        response.headers.update(headers)
+    entries, next_cursor = await diary_page(date, limit, cursor, fields)
+    return {"entries": entries, "date": date, "next_cursor": next_cursor}
 
 if __name__ == "__main__":
     import uvicorn
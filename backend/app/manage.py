@@ -0,0 +1,112 @@
+# app/manage.py
+# Maintenance commands, run from the backend folder:
+#   python -m app.manage verify-totals
+#   python -m app.manage rebuild-totals
+#   python -m app.manage rebuild-food-usage
+#   python -m app.manage import-foods FoodData_Central_foundation_food_json.json
+#   python -m app.manage import-diary history.csv
+
+import argparse
+import asyncio
+import math
+import os
+import sys
+
+from app.catalog import FOOD_IMPORT_CHUNK_SIZE, catalog_size, import_foods
+from app.database import init_database, rebuild_daily_totals, rebuild_food_usage, verify_daily_totals
+from app.diary_import import DIARY_IMPORT_CHUNK_SIZE, import_diary_csv
+from app.food_import import FORMATS, iter_foods
+from app.nutritionix_client import UpstreamUnavailable
+
+
+def cmd_verify_totals(args):
+    """Report days whose daily_totals row drifted from the raw entries"""
+    drift = verify_daily_totals(tolerance=args.tolerance)
+    if not drift:
+        print("daily_totals OK")
+        return 0
+    for item in drift:
+        print(f"{item['date']} (day {item['day']}): {item.get('fields') or 'missing row'}")
+    print(f"{len(drift)} day(s) drifted; run 'python -m app.manage rebuild-totals' to fix")
+    return 1
+
+
+def cmd_rebuild_totals(args):
+    """Recompute daily_totals from the raw entries"""
+    days = rebuild_daily_totals()
+    print(f"Rebuilt daily_totals for {days} day(s)")
+    return 0
+
+
+def cmd_rebuild_food_usage(args):
+    """Recompute recent/frequent food scores from the raw entries"""
+    foods = rebuild_food_usage()
+    print(f"Rebuilt food_usage for {foods} food(s)")
+    return 0
+
+
+def cmd_import_foods(args):
+    """Stream a food dump into the catalog"""
+    source = args.source or os.path.basename(os.path.normpath(args.path))
+    count = import_foods(
+        iter_foods(args.path, args.format), chunk_size=args.chunk_size, source=source,
+        progress=lambda total: print(f"  {total} foods", file=sys.stderr, flush=True),
+    )
+    print(f"Imported {count} food(s) from {args.path}; catalog has {catalog_size()}")
+    return 0
+
+
+def cmd_import_diary(args):
+    """Import diary history from another tracker's CSV export, resuming if it was interrupted"""
+    def progress(counts):
+        print(f"  {counts['rows_read']} rows, {counts['rows_skipped']} skipped", file=sys.stderr, flush=True)
+
+    with open(args.path, "rb") as stream:
+        try:
+            status = asyncio.run(import_diary_csv(
+                stream, args.import_id, filename=os.path.basename(args.path),
+                chunk_size=args.chunk_size, progress=progress,
+            ))
+        except UpstreamUnavailable as e:
+            print(f"{e}; run the import again in {math.ceil(e.retry_after)}s to resume", file=sys.stderr)
+            return 1
+    for error in status["errors"]:
+        print(f"  row {error['row']}: {error['error']}", file=sys.stderr)
+    print(f"Import {status['id']}: {status['rows_imported']} entries imported, {status['rows_skipped']} rows skipped")
+    return 0 if not status["rows_skipped"] else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.manage")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    verify = commands.add_parser("verify-totals", help="check daily_totals against diary_entries")
+    verify.add_argument("--tolerance", type=float, default=0.01)
+    verify.set_defaults(func=cmd_verify_totals)
+
+    rebuild = commands.add_parser("rebuild-totals", help="recompute daily_totals from diary_entries")
+    rebuild.set_defaults(func=cmd_rebuild_totals)
+
+    usage = commands.add_parser("rebuild-food-usage", help="recompute food_usage from diary_entries (e.g. after changing FOOD_USAGE_HALF_LIFE_DAYS)")
+    usage.set_defaults(func=cmd_rebuild_food_usage)
+
+    importer = commands.add_parser("import-foods", help="bulk load foods (USDA FoodData Central JSON/CSV, JSON Lines or flat CSV)")
+    importer.add_argument("path", help="file, or folder for the FDC CSV download")
+    importer.add_argument("--format", choices=FORMATS, help="default: guessed from the path")
+    importer.add_argument("--chunk-size", type=int, default=FOOD_IMPORT_CHUNK_SIZE, help="foods per transaction")
+    importer.add_argument("--source", help="label stored with each food (default: file name)")
+    importer.set_defaults(func=cmd_import_foods)
+
+    diary = commands.add_parser("import-diary", help="import diary history from a CSV export (resumable)")
+    diary.add_argument("path", help="CSV file with at least food and date columns")
+    diary.add_argument("--import-id", help="resume key (default: the file's SHA-256)")
+    diary.add_argument("--chunk-size", type=int, default=DIARY_IMPORT_CHUNK_SIZE, help="rows per transaction")
+    diary.set_defaults(func=cmd_import_diary)
+
+    args = parser.parse_args(argv)
+    init_database()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
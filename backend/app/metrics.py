@@ -0,0 +1,248 @@
+# app/metrics.py
+# Minimal in-process metrics in the Prometheus text exposition format.
+#
+# Observing is a perf_counter delta, a bisect and a few increments under an
+# uncontended lock, so instrumenting hot paths costs well under a
+# microsecond. Buckets are stored non-cumulatively and summed on scrape.
+
+import functools
+import threading
+import time
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4"  # Starlette appends the charset
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ----------------- Metric Types -----------------
+class Counter:
+    """Monotonic counter with labels"""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(v)}" for labels, v in values]
+
+
+class Histogram:
+    """Latency histogram with labels (seconds)"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [per-bucket counts (+Inf last), sum]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        lines = []
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class GaugeCallback:
+    """Gauge read at scrape time; fn returns [(label values, value)]"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help, labelnames, fn):
+        self.name, self.help, self.labelnames, self.fn = name, help, tuple(labelnames), fn
+        _registry.append(self)
+
+    def samples(self):
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(v)}" for labels, v in self.fn()]
+
+
+def render():
+    """Every registered metric in Prometheus text format"""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+# ----------------- HTTP -----------------
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Request latency by route template", ("method", "route"))
+http_responses = Counter(
+    "http_responses_total", "Responses by route template and status", ("method", "route", "status"))
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by its route template"""
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths = {}  # endpoint -> path template
+
+    def _route(self, scope):
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        path = self._route_paths.get(endpoint)
+        if path is None:
+            # Routes are registered at import time; refresh the map on a miss
+            self._route_paths = {
+                getattr(route, "endpoint", None): route.path for route in scope["app"].routes
+            }
+            path = self._route_paths.get(endpoint, "unmatched")
+        return path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = self._route(scope)
+            http_request_duration.observe(time.perf_counter() - start, scope["method"], route)
+            http_responses.inc(1, scope["method"], route, str(status))
+
+
+# ----------------- SQLite -----------------
+db_call_duration = Histogram(
+    "db_call_duration_seconds", "Duration of app.database functions", ("function",), DB_BUCKETS)
+db_statements = Counter(
+    "db_statements_total", "SQL statements executed by app.database functions", ("function",))
+db_errors = Counter(
+    "db_errors_total", "app.database calls that raised", ("function",))
+
+_db_local = threading.local()
+
+def count_statement(_sql):
+    """sqlite3 trace callback: count statements run on this thread"""
+    _db_local.statements = getattr(_db_local, "statements", 0) + 1
+
+def instrument_db(func):
+    """Record duration, statement count and errors of a database function"""
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        statements = getattr(_db_local, "statements", 0)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            db_errors.inc(1, name)
+            raise
+        finally:
+            db_call_duration.observe(time.perf_counter() - start, name)
+            db_statements.inc(getattr(_db_local, "statements", 0) - statements, name)
+    return wrapper
+
+
+# ----------------- Nutritionix -----------------
+upstream_duration = Histogram(
+    "nutritionix_request_duration_seconds", "Nutritionix call latency, retries included", ("endpoint",))
+upstream_responses = Counter(
+    "nutritionix_responses_total", "Nutritionix results by endpoint and status or error", ("endpoint", "status"))
+upstream_scheduled = Counter(
+    "nutritionix_scheduled_total", "Async Nutritionix calls by priority and outcome (sent, coalesced, rejected)",
+    ("priority", "outcome"))
+
+
+# ----------------- Executors -----------------
+class ExecutorStats:
+    """In-flight task count for a ThreadPoolExecutor (updated from the event loop only)
+
+    The executor's owner reports its size when it creates one and None when
+    it shuts it down; a scrape only reads these, so it never starts a pool.
+    """
+
+    _all = []
+
+    def __init__(self, name):
+        self.name = name
+        self.max_workers = None  # no executor running
+        self.inflight = 0
+        ExecutorStats._all.append(self)
+
+    @classmethod
+    def samples(cls, field):
+        rows = []
+        for stats in cls._all:
+            workers = stats.max_workers
+            if workers is None:
+                continue
+            value = {
+                "workers": workers,
+                "inflight": stats.inflight,
+                "queued": max(0, stats.inflight - workers),
+                "saturation": min(1.0, stats.inflight / workers) if workers else 0.0,
+            }[field]
+            rows.append(((stats.name,), value))
+        return rows
+
+
+for _field, _help in (
+    ("workers", "Maximum worker threads"),
+    ("inflight", "Tasks submitted and not yet finished"),
+    ("queued", "Tasks waiting for a free worker"),
+    ("saturation", "Busy workers / maximum workers"),
+):
+    GaugeCallback(f"executor_{_field}", _help, ("executor",),
+                  functools.partial(ExecutorStats.samples, _field))
@@ -0,0 +1,398 @@
+# app/migrations.py
+# Versioned schema migrations for the SQLite database.
+#
+# The applied version lives in PRAGMA user_version. Each migration runs in its
+# own write transaction and bumps the version, so a database created by any
+# earlier release (user_version 0) is brought forward step by step.
+#
+# Migrations are frozen: they never call into the rest of the app, so a
+# later change to app code cannot change what an old migration does. Copy
+# whatever SQL, constants and seed data a step needs into it.
+
+import json
+import math
+import sqlite3
+import time
+from datetime import datetime
+
+def _0001_base_tables(conn):
+    """Create the base tables and the default user"""
+    cursor = conn.cursor()
+
+    # Create user_stats table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_stats (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            age INTEGER,
+            weight REAL,
+            height REAL,
+            sex TEXT,
+            activity_level TEXT,
+            calories_target INTEGER DEFAULT 2000,
+            protein_target REAL DEFAULT 150,
+            carbs_target REAL DEFAULT 250,
+            fat_target REAL DEFAULT 67,
+            fiber_target REAL DEFAULT 25,
+            sugar_target REAL DEFAULT 50,
+            sodium_target REAL DEFAULT 2300,
+            vitamin_a_target REAL DEFAULT 900,
+            vitamin_c_target REAL DEFAULT 90,
+            vitamin_d_target REAL DEFAULT 20,
+            vitamin_e_target REAL DEFAULT 15,
+            vitamin_k_target REAL DEFAULT 120,
+            vitamin_b1_target REAL DEFAULT 1.2,
+            vitamin_b2_target REAL DEFAULT 1.3,
+            vitamin_b3_target REAL DEFAULT 16,
+            vitamin_b6_target REAL DEFAULT 1.7,
+            vitamin_b12_target REAL DEFAULT 2.4,
+            folate_target REAL DEFAULT 400,
+            calcium_target REAL DEFAULT 1000,
+            iron_target REAL DEFAULT 8,
+            magnesium_target REAL DEFAULT 400,
+            phosphorus_target REAL DEFAULT 700,
+            potassium_target REAL DEFAULT 4700,
+            zinc_target REAL DEFAULT 11,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Create diary_entries table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS diary_entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            food_id TEXT NOT NULL,
+            food_name TEXT NOT NULL,
+            meal_type TEXT NOT NULL,
+            quantity REAL NOT NULL,
+            date TEXT NOT NULL,
+            calories REAL NOT NULL,
+            protein REAL NOT NULL,
+            fat REAL NOT NULL,
+            carbs REAL NOT NULL,
+            fiber REAL NOT NULL,
+            sugar REAL NOT NULL,
+            sodium REAL NOT NULL,
+            vitamin_a REAL DEFAULT 0,
+            vitamin_c REAL DEFAULT 0,
+            vitamin_d REAL DEFAULT 0,
+            vitamin_e REAL DEFAULT 0,
+            vitamin_k REAL DEFAULT 0,
+            vitamin_b1 REAL DEFAULT 0,
+            vitamin_b2 REAL DEFAULT 0,
+            vitamin_b3 REAL DEFAULT 0,
+            vitamin_b6 REAL DEFAULT 0,
+            vitamin_b12 REAL DEFAULT 0,
+            folate REAL DEFAULT 0,
+            calcium REAL DEFAULT 0,
+            iron REAL DEFAULT 0,
+            magnesium REAL DEFAULT 0,
+            phosphorus REAL DEFAULT 0,
+            potassium REAL DEFAULT 0,
+            zinc REAL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Insert default user stats if none exist
+    cursor.execute('SELECT COUNT(*) FROM user_stats')
+    if cursor.fetchone()[0] == 0:
+        cursor.execute('''
+            INSERT INTO user_stats (
+                name, age, weight, height, sex, activity_level,
+                calories_target, protein_target, carbs_target, fat_target
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', ('Default User', 25, 70, 175, 'male', 'moderate', 3000, 225, 375, 100))
+
+
+def _0002_diary_day_index(conn):
+    """Add an integer day key to diary_entries with an index on (day, created_at)"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(diary_entries)")}
+    if "day" not in columns:
+        conn.execute("ALTER TABLE diary_entries ADD COLUMN day INTEGER")
+
+    # Backfill: days since 1970-01-01, matching database.day_key()
+    conn.execute('''
+        UPDATE diary_entries
+        SET day = CAST(julianday(date) - 2440587.5 AS INTEGER)
+        WHERE day IS NULL
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_diary_entries_day_created
+        ON diary_entries (day, created_at)
+    ''')
+
+
+# Frozen copy of the nutrient columns as of migration 3
+_DAILY_TOTALS_NUTRIENTS = [
+    "calories", "protein", "fat", "carbs", "fiber", "sugar", "sodium",
+    "vitamin_a", "vitamin_c", "vitamin_d", "vitamin_e", "vitamin_k",
+    "vitamin_b1", "vitamin_b2", "vitamin_b3", "vitamin_b6", "vitamin_b12",
+    "folate", "calcium", "iron", "magnesium", "phosphorus", "potassium", "zinc",
+]
+
+
+def _0003_daily_totals(conn):
+    """Create the per-day nutrient totals table and fill it from existing entries"""
+    columns = ",\n".join(f"            {c} REAL NOT NULL DEFAULT 0" for c in _DAILY_TOTALS_NUTRIENTS)
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS daily_totals (
+            day INTEGER PRIMARY KEY,
+            date TEXT NOT NULL,
+            total_entries INTEGER NOT NULL DEFAULT 0,
+{columns}
+        )
+    ''')
+    names = ", ".join(_DAILY_TOTALS_NUTRIENTS)
+    totals = ", ".join(f"TOTAL({c})" for c in _DAILY_TOTALS_NUTRIENTS)
+    conn.execute(f'''
+        INSERT OR REPLACE INTO daily_totals (day, date, total_entries, {names})
+        SELECT day, MIN(date), COUNT(*), {totals}
+        FROM diary_entries
+        WHERE day IS NOT NULL
+        GROUP BY day
+    ''')
+
+
+def _0004_nutrition_cache(conn):
+    """Create the persistent Nutritionix response cache"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS nutrition_cache (
+            query TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            fetched_at REAL NOT NULL
+        )
+    ''')
+
+
+def _0005_data_versions(conn):
+    """Create the change counters behind ETag/Last-Modified"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            key TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    ''')
+
+
+_0006_USAGE_EPOCH = 1704067200.0               # 2024-01-01 UTC
+_0006_USAGE_TAU = 14 * 86400 / math.log(2)     # 14-day half-life, in seconds
+
+
+def _0006_food_usage(conn):
+    """Create the per-user recent/frequent foods table and backfill it from the diary"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS food_usage (
+            user_id INTEGER NOT NULL DEFAULT 1,
+            food_id TEXT NOT NULL,
+            food_name TEXT NOT NULL,
+            use_count INTEGER NOT NULL,
+            last_used REAL NOT NULL,
+            score REAL NOT NULL,
+            last_portion TEXT,
+            PRIMARY KEY (user_id, food_id)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_food_usage_recent ON food_usage(user_id, last_used DESC)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_food_usage_frequent ON food_usage(user_id, score DESC)')
+
+    # Backfill for the default user, as app.usage.rebuild_food_usage did at
+    # this release: each use weighs exp((t - epoch) / tau), scores are logs
+    usage = {}  # food_id -> [name, uses, last used, score, quantity, nutrients]
+    for row in conn.execute(f'''
+        SELECT food_id, food_name, quantity, {", ".join(_DAILY_TOTALS_NUTRIENTS)},
+               CAST(strftime('%s', created_at) AS REAL)
+        FROM diary_entries
+        ORDER BY created_at, id
+    '''):
+        food_id, name, quantity, *nutrients, used_at = row
+        used_at = used_at or _0006_USAGE_EPOCH
+        weight = (used_at - _0006_USAGE_EPOCH) / _0006_USAGE_TAU
+        seen = usage.get(food_id)
+        if seen is None:
+            usage[food_id] = [name, 1, used_at, weight, quantity, nutrients]
+        else:
+            high, low = max(seen[3], weight), min(seen[3], weight)
+            seen[:] = [name, seen[1] + 1, max(seen[2], used_at), high + math.log1p(math.exp(low - high)),
+                       quantity, nutrients]
+    conn.executemany('''
+        INSERT INTO food_usage (user_id, food_id, food_name, use_count, last_used, score, last_portion)
+        VALUES (1, ?, ?, ?, ?, ?, ?)
+    ''', [
+        (food_id, name, uses, used_at, score, json.dumps({
+            "quantity": quantity, "unit_type": None,
+            **{column: value or 0 for column, value in zip(_DAILY_TOTALS_NUTRIENTS, nutrients)},
+        }))
+        for food_id, (name, uses, used_at, score, quantity, nutrients) in usage.items()
+    ])
+
+
+# The built-in foods (app.data.foods at this release), in _0007_food_catalog's column order
+_0007_SEED_FOODS = [
+    ('1', 'Apple', 100, 'g', 95, 0.5, 0.3, 25.0, 4.4, 19.0, 1.0, 3.0, 8.4, 0.0, 0.2, 2.2, 0.0, 0.0, 0.1, 0.1, 0.0, 3.0, 6.0, 0.1, 5.0, 11.0, 195.0, 0.0),
+    ('2', 'Banana', None, None, 105, 1.3, 0.4, 27.0, 3.1, 14.0, 1.0, 3.0, 10.3, 0.0, 0.1, 0.5, 0.0, 0.1, 0.8, 0.4, 0.0, 20.0, 5.0, 0.3, 27.0, 22.0, 422.0, 0.2),
+    ('3', 'Chicken Breast', None, None, 231, 43.5, 5.0, 0.0, 0.0, 0.0, 74.0, 6.0, 0.0, 5.0, 0.2, 0.0, 0.1, 0.1, 15.4, 1.0, 0.3, 3.0, 15.0, 1.0, 29.0, 256.0, 256.0, 1.0),
+    ('4', 'Rice (White, Cooked)', None, None, 130, 2.4, 0.3, 28.0, 0.4, 0.1, 1.0, 0.0, 0.0, 0.0, 0.1, 0.0, 0.0, 0.0, 1.6, 0.1, 0.0, 3.0, 10.0, 1.2, 12.0, 43.0, 35.0, 0.4),
+    ('5', 'Broccoli (Steamed)', None, None, 55, 3.7, 0.6, 11.2, 5.2, 2.2, 64.0, 623.0, 89.2, 0.0, 0.8, 101.6, 0.1, 0.1, 0.6, 0.2, 0.0, 63.0, 47.0, 0.7, 21.0, 66.0, 316.0, 0.4),
+    ('6', 'Almonds', None, None, 579, 21.2, 49.9, 21.6, 12.5, 4.4, 1.0, 0.0, 0.0, 0.0, 25.6, 0.0, 0.2, 1.1, 3.6, 0.1, 0.0, 44.0, 269.0, 3.7, 270.0, 481.0, 733.0, 3.1),
+    ('7', 'Egg (Boiled)', None, None, 68, 5.5, 4.8, 0.6, 0.0, 0.4, 124.0, 160.0, 0.0, 87.0, 0.5, 0.1, 0.0, 0.2, 0.1, 0.1, 0.6, 22.0, 25.0, 0.6, 5.0, 86.0, 63.0, 0.5),
+    ('8', 'Salmon (Grilled)', None, None, 208, 20.0, 13.0, 0.0, 0.0, 0.0, 59.0, 149.0, 0.0, 526.0, 3.6, 0.1, 0.2, 0.4, 8.5, 0.9, 2.6, 25.0, 9.0, 0.3, 27.0, 240.0, 363.0, 0.4),
+    ('9', 'Oats (Dry)', None, None, 389, 16.9, 6.9, 66.3, 10.6, 0.0, 2.0, 0.0, 0.0, 0.0, 0.7, 2.0, 0.5, 0.2, 1.1, 0.1, 0.0, 32.0, 54.0, 4.7, 177.0, 523.0, 429.0, 4.0),
+    ('10', 'Milk (Whole)', None, None, 61, 3.2, 3.3, 4.8, 0.0, 4.8, 43.0, 46.0, 0.0, 1.2, 0.1, 0.2, 0.0, 0.1, 0.1, 0.0, 0.4, 5.0, 113.0, 0.0, 10.0, 84.0, 143.0, 0.4),
+]
+
+
+def _0007_food_catalog(conn):
+    """Move the food catalog into SQLite with an FTS5 index over names"""
+    columns = ",\n".join(f"            {c} REAL NOT NULL DEFAULT 0" for c in _DAILY_TOTALS_NUTRIENTS)
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS foods (
+            seq INTEGER PRIMARY KEY,
+            id TEXT NOT NULL UNIQUE,
+            name TEXT NOT NULL,
+            serving_size REAL,
+            serving_unit TEXT,
+{columns},
+            source TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_foods_name ON foods(name COLLATE NOCASE)')
+
+    try:
+        # External content: the index stores tokens only, rows stay in foods
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS foods_fts USING fts5(
+                name, content='foods', content_rowid='seq',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        pass  # SQLite built without FTS5: app.catalog falls back to LIKE
+    else:
+        # executescript() would commit the migration transaction; one statement each
+        for trigger in (
+            '''CREATE TRIGGER IF NOT EXISTS foods_fts_insert AFTER INSERT ON foods BEGIN
+                INSERT INTO foods_fts(rowid, name) VALUES (new.seq, new.name);
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS foods_fts_delete AFTER DELETE ON foods BEGIN
+                INSERT INTO foods_fts(foods_fts, rowid, name) VALUES ('delete', old.seq, old.name);
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS foods_fts_update AFTER UPDATE OF name ON foods BEGIN
+                INSERT INTO foods_fts(foods_fts, rowid, name) VALUES ('delete', old.seq, old.name);
+                INSERT INTO foods_fts(rowid, name) VALUES (new.seq, new.name);
+            END''',
+        ):
+            conn.execute(trigger)
+
+    names = ["id", "name", "serving_size", "serving_unit", *_DAILY_TOTALS_NUTRIENTS]
+    conn.executemany(
+        f'INSERT OR IGNORE INTO foods ({", ".join(names)}, source) VALUES ({", ".join("?" for _ in names)}, \'builtin\')',
+        _0007_SEED_FOODS
+    )
+
+
+def _0008_food_vocabulary(conn):
+    """Expose the distinct words of food names (with document counts) for spelling correction"""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'foods_fts'").fetchone():
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS foods_fts_vocab USING fts5vocab('foods_fts', 'row')")
+
+
+def _0009_diary_imports(conn):
+    """Track bulk diary imports so an interrupted one can resume"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS diary_imports (
+            id TEXT PRIMARY KEY,
+            filename TEXT,
+            status TEXT NOT NULL DEFAULT 'running',
+            rows_read INTEGER NOT NULL DEFAULT 0,
+            rows_imported INTEGER NOT NULL DEFAULT 0,
+            rows_skipped INTEGER NOT NULL DEFAULT 0,
+            errors TEXT NOT NULL DEFAULT '[]',
+            started_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    ''')
+
+
+def _0010_canonical_diary_dates(conn):
+    """Store unpadded legacy dates ("2024-3-5") as YYYY-MM-DD with their day key, and re-total those days"""
+    epoch = datetime(1970, 1, 1).toordinal()
+    fixed = {}
+    for entry_id, text in conn.execute(
+        "SELECT id, date FROM diary_entries WHERE date IS NOT date(date) OR day IS NULL"
+    ).fetchall():
+        try:
+            parsed = datetime.strptime(text, "%Y-%m-%d")  # what database.day_key() accepts
+        except (TypeError, ValueError):
+            continue
+        fixed[entry_id] = (parsed.strftime("%Y-%m-%d"), parsed.toordinal() - epoch)
+    if not fixed:
+        return
+
+    conn.executemany(
+        "UPDATE diary_entries SET date = ?, day = ? WHERE id = ?",
+        [(date, day, entry_id) for entry_id, (date, day) in fixed.items()],
+    )
+    days = sorted({day for _, day in fixed.values()})
+    nutrients = [row[1] for row in conn.execute("PRAGMA table_info(daily_totals)")][3:]  # after day, date, total_entries
+    placeholders = ", ".join("?" for _ in days)
+    conn.execute(f"DELETE FROM daily_totals WHERE day IN ({placeholders})", days)
+    conn.execute(f'''
+        INSERT INTO daily_totals (day, date, total_entries, {", ".join(nutrients)})
+        SELECT day, MIN(date), COUNT(*), {", ".join(f"TOTAL({c})" for c in nutrients)}
+        FROM diary_entries
+        WHERE day IN ({placeholders})
+        GROUP BY day
+    ''', days)
+    # Cached summaries and diary pages of every period may have changed
+    conn.execute(
+        "UPDATE data_versions SET version = version + 1, updated_at = ? WHERE key = 'diary' OR key LIKE 'diary:%'",
+        (time.time(),),
+    )
+
+
+# Ordered list of migrations; a migration's version is its position + 1.
+# Never reorder or edit a released migration, append a new one instead.
+MIGRATIONS = [
+    _0001_base_tables,
+    _0002_diary_day_index,
+    _0003_daily_totals,
+    _0004_nutrition_cache,
+    _0005_data_versions,
+    _0006_food_usage,
+    _0007_food_catalog,
+    _0008_food_vocabulary,
+    _0009_diary_imports,
+    _0010_canonical_diary_dates,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(conn):
+    """Read the applied schema version"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Apply every pending migration, one transaction per step"""
+    # Fast path for every start after the first: one PRAGMA read, no DDL
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return
+
+    if conn.in_transaction:
+        conn.commit()
+    for version, migration in enumerate(MIGRATIONS, start=1):
+        # IMMEDIATE takes the write lock up front so two workers starting at
+        # once do not both run the same step; re-check the version under it
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if get_schema_version(conn) < version:
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
@@ -0,0 +1,163 @@
+# app/nutrients.py
+# Single registry of the 24 tracked nutrients and a compact, fixed-order
+# vector type for scaling, summing, target comparison and serialization.
+# NumPy is used for bulk sums when it is installed, but is not required; it
+# is imported on the first bulk sum so it stays off the startup path.
+
+from array import array
+from typing import NamedTuple
+
+_np = None  # numpy module once imported, False if unavailable
+
+
+def numpy():
+    """The numpy module, or None if it is not installed"""
+    global _np
+    if _np is None:
+        try:
+            import numpy as np
+        except ImportError:  # optional accelerator
+            np = False
+        _np = np
+    return _np or None
+
+
+class Nutrient(NamedTuple):
+    name: str            # column / JSON field name
+    nutritionix: str     # field in a Nutritionix natural/nutrients food
+    unit: str
+    fdc: tuple           # USDA FoodData Central nutrient numbers, preferred first
+    target_column: str   # column in user_stats
+
+
+def _nutrient(name, nutritionix, unit, fdc):
+    return Nutrient(name, nutritionix, unit, fdc, f"{name}_target")
+
+
+# Order is fixed: vectors, SQL column lists and API payloads all follow it
+NUTRIENTS = (
+    _nutrient("calories", "nf_calories", "kcal", ("208", "958", "957")),
+    _nutrient("protein", "nf_protein", "g", ("203",)),
+    _nutrient("fat", "nf_total_fat", "g", ("204",)),
+    _nutrient("carbs", "nf_total_carbohydrate", "g", ("205",)),
+    _nutrient("fiber", "nf_dietary_fiber", "g", ("291",)),
+    _nutrient("sugar", "nf_sugars", "g", ("269", "269.3")),
+    _nutrient("sodium", "nf_sodium", "mg", ("307",)),
+    # ⚠️ absolute amounts, not %DV
+    _nutrient("vitamin_a", "nf_vitamin_a_iu", "IU", ("318",)),
+    _nutrient("vitamin_c", "nf_vitamin_c_mg", "mg", ("401",)),
+    _nutrient("vitamin_d", "nf_vitamin_d_mcg", "mcg", ("328",)),
+    _nutrient("vitamin_e", "nf_vitamin_e_mg", "mg", ("323",)),
+    _nutrient("vitamin_k", "nf_vitamin_k_mcg", "mcg", ("430",)),
+    _nutrient("vitamin_b1", "nf_thiamin_mg", "mg", ("404",)),
+    _nutrient("vitamin_b2", "nf_riboflavin_mg", "mg", ("405",)),
+    _nutrient("vitamin_b3", "nf_niacin_mg", "mg", ("406",)),
+    _nutrient("vitamin_b6", "nf_vitamin_b6_mg", "mg", ("415",)),
+    _nutrient("vitamin_b12", "nf_vitamin_b12_mcg", "mcg", ("418",)),
+    _nutrient("folate", "nf_folate_mcg", "mcg", ("417", "435")),
+    _nutrient("calcium", "nf_calcium_mg", "mg", ("301",)),
+    _nutrient("iron", "nf_iron_mg", "mg", ("303",)),
+    _nutrient("magnesium", "nf_magnesium_mg", "mg", ("304",)),
+    _nutrient("phosphorus", "nf_phosphorus_mg", "mg", ("305",)),
+    _nutrient("potassium", "nf_potassium_mg", "mg", ("306",)),
+    _nutrient("zinc", "nf_zinc_mg", "mg", ("309",)),
+)
+
+NUTRIENT_NAMES = tuple(n.name for n in NUTRIENTS)
+NUTRIENT_COUNT = len(NUTRIENTS)
+MACROS = ("calories", "protein", "fat", "carbs")
+
+
+class NutrientVector:
+    """Nutrient amounts as a float64 array in NUTRIENTS order"""
+
+    __slots__ = ("values",)
+
+    def __init__(self, values=None):
+        if values is None:
+            self.values = array("d", bytes(8 * NUTRIENT_COUNT))
+        else:
+            self.values = array("d", values)
+            if len(self.values) != NUTRIENT_COUNT:
+                raise ValueError(f"Expected {NUTRIENT_COUNT} values, got {len(self.values)}")
+
+    # ----------------- Construction -----------------
+    @classmethod
+    def from_mapping(cls, mapping):
+        """From a dict/row keyed by nutrient name; missing or None counts as 0"""
+        if not hasattr(mapping, "get"):  # sqlite3.Row
+            mapping = dict(mapping)
+        return cls([mapping.get(name) or 0 for name in NUTRIENT_NAMES])
+
+    @classmethod
+    def from_nutritionix(cls, food_data):
+        """From one food of a Nutritionix natural/nutrients response"""
+        return cls([food_data.get(n.nutritionix) or 0 for n in NUTRIENTS])
+
+    @classmethod
+    def targets_from_stats(cls, stats):
+        """Daily targets from a user_stats row"""
+        return cls([stats.get(n.target_column) or 0 for n in NUTRIENTS])
+
+    @classmethod
+    def sum_rows(cls, rows):
+        """Column-wise sum of many rows, each a sequence in NUTRIENTS order"""
+        np = numpy()
+        if np is not None:
+            if isinstance(rows, np.ndarray):
+                matrix = rows
+            elif rows and isinstance(rows[0], array):
+                # Vector values are raw float64 buffers: one copy, no per-item parsing
+                matrix = np.frombuffer(b"".join(rows), dtype=np.float64)
+            else:
+                matrix = np.asarray(rows, dtype=np.float64)
+            if matrix.size == 0:
+                return cls()
+            return cls(matrix.reshape(-1, NUTRIENT_COUNT).sum(axis=0))
+        if not rows:
+            return cls()
+        return cls(map(sum, zip(*rows)))
+
+    # ----------------- Arithmetic -----------------
+    def scaled(self, factor):
+        """A copy multiplied by factor (e.g. quantity / baseline)"""
+        return NutrientVector([v * factor for v in self.values])
+
+    def __add__(self, other):
+        return NutrientVector([a + b for a, b in zip(self.values, other.values)])
+
+    def __iadd__(self, other):
+        self.values = array("d", [a + b for a, b in zip(self.values, other.values)])
+        return self
+
+    def __sub__(self, other):
+        return NutrientVector([a - b for a, b in zip(self.values, other.values)])
+
+    def __neg__(self):
+        return self.scaled(-1)
+
+    def __eq__(self, other):
+        return isinstance(other, NutrientVector) and self.values == other.values
+
+    def percent_of(self, targets):
+        """Percent of each target reached (None where the target is 0)"""
+        return NutrientVector._dict(
+            [round(100 * v / t, 1) if t else None for v, t in zip(self.values, targets.values)]
+        )
+
+    # ----------------- Serialization -----------------
+    def to_list(self, ndigits=None):
+        if ndigits is None:
+            return list(self.values)
+        return [round(v, ndigits) for v in self.values]
+
+    def to_dict(self, ndigits=None):
+        """{nutrient name: amount}, optionally rounded"""
+        return NutrientVector._dict(self.to_list(ndigits))
+
+    @staticmethod
+    def _dict(values):
+        return dict(zip(NUTRIENT_NAMES, values))
+
+    def __repr__(self):
+        return f"NutrientVector({self.to_dict(2)})"
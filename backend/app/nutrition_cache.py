@@ -0,0 +1,155 @@
+# app/nutrition_cache.py
+# Two-tier cache for Nutritionix lookups: an in-process LRU in front of the
+# nutrition_cache SQLite table, so repeated queries skip the upstream call
+# and survive restarts. Expired rows are deleted at most every
+# NUTRITION_CACHE_PURGE_INTERVAL seconds, piggybacking on a cache write, so
+# the table holds about one TTL's worth of lookups.
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from app.database import db_connection
+
+NUTRITION_CACHE_SIZE = int(os.getenv("NUTRITION_CACHE_SIZE", "2048"))       # entries kept in memory
+NUTRITION_CACHE_TTL = float(os.getenv("NUTRITION_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+NUTRITION_CACHE_PURGE_INTERVAL = float(os.getenv("NUTRITION_CACHE_PURGE_INTERVAL", "3600"))  # seconds
+
+
+def normalize_query(query: str) -> str:
+    """Cache key for a query: lowercase with collapsed whitespace"""
+    return " ".join(query.lower().split())
+
+
+class NutritionCache:
+    """LRU + TTL memory cache backed by a SQLite table"""
+
+    def __init__(self, max_entries=NUTRITION_CACHE_SIZE, ttl=NUTRITION_CACHE_TTL,
+                 purge_interval=NUTRITION_CACHE_PURGE_INTERVAL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0  # the first write after start purges
+        self._entries = OrderedDict()  # key -> (fetched_at, value)
+        self._lock = threading.Lock()
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "purged": 0,
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _remember(self, key, fetched_at, value):
+        """Put a value in the memory tier, evicting the least recently used"""
+        with self._lock:
+            self._entries[key] = (fetched_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def _from_memory(self, key):
+        """(value or None, whether an expired entry was just dropped)"""
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None:
+                return None, False
+            if time.time() - cached[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return cached[1], False
+            del self._entries[key]
+            self._counters["expirations"] += 1
+            return None, True
+
+    def get_from_memory(self, query):
+        """Check only the in-process tier (never touches SQLite)"""
+        return self._from_memory(normalize_query(query))[0]
+
+    def get(self, query):
+        """Return the cached nutrients for a query, or None on a miss"""
+        key = normalize_query(query)
+        cached, expired = self._from_memory(key)
+        if cached is not None:
+            return cached
+
+        now = time.time()
+        with db_connection() as conn:
+            row = conn.execute(
+                "SELECT data, fetched_at FROM nutrition_cache WHERE query = ?", (key,)
+            ).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+        if now - row["fetched_at"] >= self.ttl:
+            if not expired:  # the same lookup expiring in memory was counted already
+                self._count("expirations")
+            self._count("misses")
+            return None
+
+        value = json.loads(row["data"])
+        self._remember(key, row["fetched_at"], value)
+        self._count("disk_hits")
+        return value
+
+    def set(self, query, value):
+        """Store a successful lookup in both tiers"""
+        key = normalize_query(query)
+        fetched_at = time.time()
+        self._remember(key, fetched_at, value)
+        with db_connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO nutrition_cache (query, data, fetched_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), fetched_at),
+            )
+            if fetched_at >= self._next_purge:
+                self._next_purge = fetched_at + self.purge_interval
+                self._purge(conn, fetched_at)
+
+    def invalidate(self, query=None):
+        """Drop one query (or everything when query is None); returns rows removed"""
+        with db_connection() as conn:
+            if query is None:
+                with self._lock:
+                    self._entries.clear()
+                return conn.execute("DELETE FROM nutrition_cache").rowcount
+
+            key = normalize_query(query)
+            with self._lock:
+                self._entries.pop(key, None)
+            return conn.execute("DELETE FROM nutrition_cache WHERE query = ?", (key,)).rowcount
+
+    def _purge(self, conn, now):
+        removed = conn.execute("DELETE FROM nutrition_cache WHERE fetched_at < ?", (now - self.ttl,)).rowcount
+        with self._lock:
+            self._counters["purged"] += removed
+        return removed
+
+    def purge_expired(self):
+        """Delete expired rows from the SQLite tier now; returns rows removed"""
+        with db_connection() as conn:
+            return self._purge(conn, time.time())
+
+    def stats(self):
+        """Counters plus current sizes of both tiers"""
+        with db_connection() as conn:
+            stored = conn.execute("SELECT COUNT(*) FROM nutrition_cache").fetchone()[0]
+        with self._lock:
+            return {
+                **self._counters,
+                "memory_entries": len(self._entries),
+                "memory_capacity": self.max_entries,
+                "stored_entries": stored,
+                "ttl_seconds": self.ttl,
+            }
+
+
+nutrition_cache = NutritionCache()
@@ -0,0 +1,406 @@
+# app/nutritionix_client.py
+# Shared HTTP client for every Nutritionix call: one keep-alive connection
+# pool, connect/read timeouts and bounded retries with jittered backoff.
+# The *_async methods run the same calls on a dedicated upstream executor,
+# so slow upstream responses cannot tie up the threads serving cheap reads.
+#
+# Async calls also go through a token bucket (NUTRITIONIX_RATE per second,
+# bursts of NUTRITIONIX_BURST) that hands out tokens by priority: a user
+# adding a food is served before search lookups, and both before background
+# imports. A call that would queue longer than its priority allows, or that
+# arrives while the quota is exhausted (after a 429), fails fast with
+# UpstreamUnavailable, which the API answers with 503 and Retry-After.
+# Concurrent calls given the same key share one request.
+
+import asyncio
+import functools
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from app.metrics import ExecutorStats, GaugeCallback, upstream_duration, upstream_responses, upstream_scheduled
+
+load_dotenv()
+
+NUTRITIONIX_APP_ID = os.getenv("NUTRITIONIX_APP_ID")
+NUTRITIONIX_API_KEY = os.getenv("NUTRITIONIX_API_KEY")
+NUTRITIONIX_BASE_URL = os.getenv("NUTRITIONIX_BASE_URL", "https://trackapi.nutritionix.com")
+
+NUTRITIONIX_CONNECT_TIMEOUT = float(os.getenv("NUTRITIONIX_CONNECT_TIMEOUT", "3.05"))  # seconds
+NUTRITIONIX_READ_TIMEOUT = float(os.getenv("NUTRITIONIX_READ_TIMEOUT", "10"))          # seconds
+NUTRITIONIX_POOL_SIZE = int(os.getenv("NUTRITIONIX_POOL_SIZE", "32"))                 # kept-alive connections
+NUTRITIONIX_MAX_RETRIES = int(os.getenv("NUTRITIONIX_MAX_RETRIES", "2"))
+NUTRITIONIX_BACKOFF = float(os.getenv("NUTRITIONIX_BACKOFF", "0.2"))                  # seconds, doubles per retry
+UPSTREAM_EXECUTOR_WORKERS = int(os.getenv("UPSTREAM_EXECUTOR_WORKERS", str(NUTRITIONIX_POOL_SIZE)))
+
+NUTRITIONIX_RATE = float(os.getenv("NUTRITIONIX_RATE", "10"))               # calls per second; 0 disables the limit
+NUTRITIONIX_BURST = int(os.getenv("NUTRITIONIX_BURST", "20"))               # calls allowed back to back
+NUTRITIONIX_QUOTA_PAUSE = float(os.getenv("NUTRITIONIX_QUOTA_PAUSE", "60"))  # seconds, after a 429 without Retry-After
+
+PRIORITY_INTERACTIVE = 0  # a user waiting on one food: /diary/add, /api/details
+PRIORITY_SEARCH = 1       # search result lookups; a search may come back partial
+PRIORITY_BACKGROUND = 2   # bulk work such as diary imports
+PRIORITY_NAMES = ("interactive", "search", "background")
+# Longest a call may queue for a token, by priority (seconds)
+UPSTREAM_MAX_WAIT = (
+    float(os.getenv("NUTRITIONIX_MAX_WAIT_INTERACTIVE", "2")),
+    float(os.getenv("NUTRITIONIX_MAX_WAIT_SEARCH", "1")),
+    float(os.getenv("NUTRITIONIX_MAX_WAIT_BACKGROUND", "600")),
+)
+
+BASE_HEADERS = {
+    "x-app-id": NUTRITIONIX_APP_ID,
+    "x-app-key": NUTRITIONIX_API_KEY,
+    "Content-Type": "application/json",
+}
+
+
+def _retry_policy():
+    """Retry connection errors and 429/5xx responses with jittered exponential backoff"""
+    from urllib3.util.retry import Retry
+
+    options = dict(
+        total=NUTRITIONIX_MAX_RETRIES,
+        backoff_factor=NUTRITIONIX_BACKOFF,
+        status_forcelist=(500, 502, 503, 504),  # 429 pauses the scheduler instead of a worker thread
+        allowed_methods=frozenset({"GET", "POST"}),  # natural/nutrients POSTs are idempotent lookups
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    try:
+        return Retry(backoff_jitter=NUTRITIONIX_BACKOFF, **options)
+    except TypeError:  # urllib3 < 2 has no jitter option
+        return Retry(**options)
+
+
+class UpstreamUnavailable(Exception):
+    """Nutritionix cannot take the call now (rate limit or quota); retry after retry_after seconds"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _retry_after(response):
+    """Seconds from a Retry-After header in seconds, else NUTRITIONIX_QUOTA_PAUSE"""
+    try:
+        return max(1.0, float(response.headers["Retry-After"]))
+    except (KeyError, ValueError):
+        return NUTRITIONIX_QUOTA_PAUSE
+
+
+class NutritionixClient:
+    """Thread-safe wrapper around one pooled requests.Session"""
+
+    def __init__(self, base_url=NUTRITIONIX_BASE_URL):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (NUTRITIONIX_CONNECT_TIMEOUT, NUTRITIONIX_READ_TIMEOUT)
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """The shared session, created on first use"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    # requests/urllib3 are imported here, off the startup path
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=1,
+                        pool_maxsize=NUTRITIONIX_POOL_SIZE,
+                        max_retries=_retry_policy(),
+                    )
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    session.headers.update(BASE_HEADERS)
+                    self._session = session
+        return self._session
+
+    def _request(self, method, path, timeout=None, **kwargs):
+        """Send a request to a Nutritionix path such as '/v2/search/instant' (blocking; see get_async)"""
+        session = self.session
+        from requests import RequestException  # already imported by self.session
+
+        status = "error"
+        start = time.perf_counter()
+        try:
+            response = session.request(
+                method, f"{self.base_url}{path}", timeout=timeout or self.timeout, **kwargs
+            )
+            status = str(response.status_code)
+            if response.status_code == 429:
+                retry_after = _retry_after(response)
+                upstream_scheduler.pause(retry_after)
+                raise UpstreamUnavailable("Nutritionix quota exhausted", retry_after)
+            response.raise_for_status()
+            return response
+        except RequestException as e:
+            if status == "error":
+                status = type(e).__name__  # ConnectTimeout, ReadTimeout, ConnectionError, ...
+            raise
+        finally:
+            upstream_duration.observe(time.perf_counter() - start, path)
+            upstream_responses.inc(1, path, status)
+
+    # Only the async methods are public: every call then passes the scheduler,
+    # so nothing can skip the rate limit or a quota pause
+
+    def _get(self, path, params=None, timeout=None):
+        return self._request("GET", path, params=params, timeout=timeout)
+
+    def _post(self, path, json=None, timeout=None):
+        return self._request("POST", path, json=json, timeout=timeout)
+
+    async def get_async(self, path, params=None, timeout=None, priority=PRIORITY_INTERACTIVE, key=None):
+        return await run_upstream(self._get, path, params=params, timeout=timeout, priority=priority, key=key)
+
+    async def post_async(self, path, json=None, timeout=None, priority=PRIORITY_INTERACTIVE, key=None):
+        return await run_upstream(self._post, path, json=json, timeout=timeout, priority=priority, key=key)
+
+    def close(self):
+        """Close pooled connections (called on shutdown)"""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+# ----------------- Scheduling -----------------
+class UpstreamScheduler:
+    """Token bucket in front of upstream calls, granting tokens in priority order
+
+    Used from the event loop, except pause(), which worker threads call on a 429.
+    """
+
+    def __init__(self, rate=NUTRITIONIX_RATE, burst=NUTRITIONIX_BURST, max_wait=UPSTREAM_MAX_WAIT):
+        self.rate, self.burst, self.max_wait = rate, burst, max_wait
+        self._tokens = float(burst)
+        self._updated = time.monotonic()  # tokens are accounted up to here
+        self._paused_until = 0.0
+        self._waiters = []  # heap of [priority, seq, future, key, deadline]
+        self._by_key = {}   # key -> waiter, for promote()
+        self._queued = [0] * len(max_wait)  # waiting calls by priority
+        self._seq = itertools.count()
+        self._timer = None
+
+    def _refill(self, now):
+        if now < self._paused_until:
+            self._tokens, self._updated = 0.0, self._paused_until
+        elif now > self._updated:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def _delay(self, now):
+        """Seconds until the next token"""
+        return max(0.0, self._updated - now) + max(0.0, 1 - self._tokens) / self.rate
+
+    def _schedule(self, now):
+        if self._timer is None and self._waiters:
+            self._timer = asyncio.get_running_loop().call_later(self._delay(now), self._dispatch)
+
+    def _dispatch(self):
+        """Grant the tokens available now to the most urgent waiters"""
+        self._timer = None
+        now = time.monotonic()
+        self._refill(now)
+        if now < self._paused_until:
+            self._shed(now)
+        while self._waiters and self._tokens >= 1:
+            waiter = heapq.heappop(self._waiters)
+            priority, _, future, key, _ = waiter
+            if future.done():  # gave up
+                continue
+            self._queued[priority] -= 1
+            if key is not None and self._by_key.get(key) is waiter:
+                del self._by_key[key]
+            self._tokens -= 1
+            future.set_result(None)
+        self._schedule(now)
+
+    def _shed(self, now):
+        """Fail the waiters that would give up before the quota pause ends"""
+        kept = []
+        for waiter in self._waiters:
+            priority, _, future, key, deadline = waiter
+            if future.done():
+                continue
+            if deadline < self._paused_until:
+                self._queued[priority] -= 1
+                if self._by_key.get(key) is waiter:
+                    del self._by_key[key]
+                future.set_exception(UpstreamUnavailable("Nutritionix quota exhausted", self._paused_until - now))
+            else:
+                kept.append(waiter)
+        heapq.heapify(kept)
+        self._waiters = kept
+
+    async def acquire(self, priority=PRIORITY_INTERACTIVE, key=None):
+        """Wait for a token; UpstreamUnavailable when that would take longer than the priority allows"""
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        self._refill(now)
+        if not self._waiters and self._tokens >= 1:
+            self._tokens -= 1
+            return
+
+        # Calls queued at the same or a higher priority go first
+        wait = self._delay(now) + sum(self._queued[:priority + 1]) / self.rate
+        max_wait = self.max_wait[priority]
+        if wait > max_wait:
+            reason = "Nutritionix quota exhausted" if now < self._paused_until else "Nutritionix rate limit reached"
+            raise UpstreamUnavailable(reason, wait)
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = [priority, next(self._seq), future, key, now + max_wait]
+        heapq.heappush(self._waiters, waiter)
+        self._queued[priority] += 1
+        if key is not None:
+            self._by_key[key] = waiter
+        self._schedule(now)
+        try:
+            await asyncio.wait_for(future, max_wait)
+        except BaseException as e:
+            if future.cancelled():  # still queued: leave the line
+                self._queued[waiter[0]] -= 1
+                if self._by_key.get(key) is waiter:
+                    del self._by_key[key]
+            if isinstance(e, asyncio.TimeoutError):
+                raise UpstreamUnavailable("Nutritionix rate limit reached", self._delay(time.monotonic())) from None
+            raise
+
+    def promote(self, key, priority):
+        """Move a queued call up to a more urgent priority (a more urgent caller joined it)"""
+        waiter = self._by_key.get(key)
+        if waiter is not None and priority < waiter[0]:
+            self._queued[waiter[0]] -= 1
+            self._queued[priority] += 1
+            waiter[0] = priority
+            heapq.heapify(self._waiters)
+
+    def pause(self, seconds):
+        """Hold every call for `seconds` (the quota is exhausted); safe from any thread"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def reset(self):
+        """Forget queued calls and the pending timer (their event loop is going away)"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for waiter in self._waiters:
+            waiter[2].cancel()
+        self._waiters, self._by_key = [], {}
+        self._queued = [0] * len(self.max_wait)
+
+    def queued(self):
+        return [((name,), count) for name, count in zip(PRIORITY_NAMES, self._queued)]
+
+
+upstream_scheduler = UpstreamScheduler()
+GaugeCallback("nutritionix_queued_calls", "Upstream calls waiting for a rate limit token", ("priority",),
+              upstream_scheduler.queued)
+
+
+# ----------------- Execution -----------------
+_upstream_executor = None
+_upstream_executor_lock = threading.Lock()
+upstream_executor_stats = ExecutorStats("nutritionix")
+
+def get_upstream_executor():
+    """The upstream executor, created on first use (and again after a shutdown)"""
+    global _upstream_executor
+    if _upstream_executor is None:
+        with _upstream_executor_lock:
+            if _upstream_executor is None:
+                _upstream_executor = ThreadPoolExecutor(
+                    max_workers=UPSTREAM_EXECUTOR_WORKERS, thread_name_prefix="nutritionix"
+                )
+                upstream_executor_stats.max_workers = UPSTREAM_EXECUTOR_WORKERS
+    return _upstream_executor
+
+def shutdown_upstream():
+    """Stop the upstream executor and drop calls tied to the stopping event loop (called on shutdown)"""
+    global _upstream_executor
+    with _upstream_executor_lock:
+        if _upstream_executor is not None:
+            _upstream_executor.shutdown(wait=False, cancel_futures=True)
+            _upstream_executor = None
+            upstream_executor_stats.max_workers = None
+    SingleFlight.clear_all()
+    upstream_scheduler.reset()
+
+
+async def _run_scheduled(func, args, kwargs, priority, key):
+    try:
+        await upstream_scheduler.acquire(priority, key)
+    except UpstreamUnavailable:
+        upstream_scheduled.inc(1, PRIORITY_NAMES[priority], "rejected")
+        raise
+    upstream_scheduled.inc(1, PRIORITY_NAMES[priority], "sent")
+    loop = asyncio.get_running_loop()
+    upstream_executor_stats.inflight += 1
+    try:
+        return await loop.run_in_executor(get_upstream_executor(), functools.partial(func, *args, **kwargs))
+    finally:
+        upstream_executor_stats.inflight -= 1
+
+class SingleFlight:
+    """Concurrent calls with the same key share one in-flight coroutine and its result or error"""
+
+    _all = []
+
+    def __init__(self):
+        self._tasks = {}  # key -> task of the call being made for it
+        SingleFlight._all.append(self)
+
+    def _forget(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # retrieved, even if every caller gave up
+
+    async def run(self, key, make_call, priority=PRIORITY_INTERACTIVE):
+        """Await make_call(), or the call already in flight for key
+
+        A more urgent caller joining a call still queued for a token moves it
+        up (the scheduler knows queued calls by the same key).
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(make_call())
+            task.add_done_callback(functools.partial(self._forget, key))
+        else:
+            upstream_scheduled.inc(1, PRIORITY_NAMES[priority], "coalesced")
+            upstream_scheduler.promote(key, priority)
+        # Shielded: a caller giving up (say at a search deadline) leaves the call running for the others
+        return await asyncio.shield(task)
+
+    @classmethod
+    def clear_all(cls):
+        for flights in cls._all:
+            flights._tasks.clear()
+
+_upstream_flights = SingleFlight()
+
+async def run_upstream(func, *args, priority=PRIORITY_INTERACTIVE, key=None, **kwargs):
+    """Run a blocking upstream call on the upstream executor once the scheduler admits it
+
+    Calls made with the same key while one is in flight share it (SingleFlight).
+    """
+    if key is None:
+        return await _run_scheduled(func, args, kwargs, priority, None)
+    return await _upstream_flights.run(
+        key, functools.partial(_run_scheduled, func, args, kwargs, priority, key), priority
+    )
+
+
+nutritionix = NutritionixClient()
@@ -0,0 +1,51 @@
+# app/pagination.py
+# Opaque keyset cursors and `fields=` projections shared by list endpoints.
+
+import base64
+import json
+import os
+
+from fastapi import HTTPException
+
+FOODS_PAGE_DEFAULT = int(os.getenv("FOODS_PAGE_DEFAULT", "100"))
+DIARY_PAGE_DEFAULT = int(os.getenv("DIARY_PAGE_DEFAULT", "200"))
+PAGE_MAX = int(os.getenv("PAGE_MAX", "1000"))
+
+
+def encode_cursor(position: dict) -> str:
+    """Opaque, URL-safe cursor for the given keyset position"""
+    raw = json.dumps(position, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def _has_type(value, expected) -> bool:
+    # JSON true/false decode to bool, which isinstance() counts as int
+    return isinstance(value, expected) and not (isinstance(value, bool) and expected is not bool)
+
+def decode_cursor(cursor: str, **types) -> dict:
+    """Decode a cursor made by encode_cursor, checking each key's type (e.g. id=int);
+    400 if malformed, tampered with or for another listing"""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        position = None
+    if not isinstance(position, dict) or not all(
+        _has_type(position.get(key), expected) for key, expected in types.items()
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return position
+
+def parse_fields(fields, allowed):
+    """Validate a comma-separated `fields=` list; None means every field"""
+    if not fields:
+        return None
+    names = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return names or None
+
+def project(items, fields):
+    """Keep only the requested fields of each item"""
+    if fields is None:
+        return items
+    return [{name: item.get(name) for name in fields} for item in items]
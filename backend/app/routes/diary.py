@@ -1,13 +1,22 @@
 # app/routes/diary.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, File, HTTPException, Query, Request, Response, UploadFile
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
-from dotenv import load_dotenv
-from app.routes.nutrionix import get_nutrition
+from typing import Optional, List
+import asyncio
+import logging
+import os
+from app.routes.nutrionix import get_nutrition_async
+from app.nutrition_cache import normalize_query
+from app.nutrients import MACROS, NutrientVector
+from app.async_db import run_db
+from app.database import get_diary_import, save_diary_entry, save_diary_entries
+from app.diary_import import start_import
 
-load_dotenv()
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_ENTRIES = int(os.getenv("MAX_BATCH_ENTRIES", "5000"))
 
 
 # ----------------- Models -----------------
@@ -47,76 +56,161 @@ class DiaryEntryCreate(BaseModel):
     zinc: Optional[float] = None
 
 
-# ----------------- Add Food Route -----------------
-@router.post("/add")
-def add_food_to_diary(entry: DiaryEntryCreate):
-    # ----------------- Fetch Nutrition if Missing -----------------
-    if any(getattr(entry, f) is None for f in ["calories", "protein", "fat", "carbs"]):
-        if not entry.food_name:
-            raise HTTPException(status_code=400, detail="Food name required when nutrition data missing")
+# ----------------- Helpers -----------------
+def needs_nutrition(entry: DiaryEntryCreate) -> bool:
+    """True when the client did not send the core macros"""
+    return any(getattr(entry, f) is None for f in MACROS)
 
-        print("📥 Incoming entry:", entry.dict())
+def baseline_query(entry: DiaryEntryCreate) -> str:
+    """Nutritionix query for the entry's baseline: 1 unit or 100 g"""
+    if entry.unit_type == "units":
+        return f"1 {entry.food_name}"
+    return f"100g {entry.food_name}"
 
-        # Always fetch baseline depending on unit type
-        if entry.unit_type == "units":
-            # ✅ Always fetch for 1 unit baseline
-            nutrients = get_nutrition(f"1 {entry.food_name}", None)
-            if not nutrients:
-                raise HTTPException(status_code=404, detail="Food not found (units)")
-            entry.serving_size = nutrients.get("serving_weight_grams", None)  # grams per unit
-            entry.unit_type = nutrients.get("serving_unit", "unit")          # fallback "unit"
-            print("[UNITS] Serving size per unit:", entry.serving_size, "Unit type:", entry.unit_type)
+def apply_baseline(entry: DiaryEntryCreate, nutrients: dict):
+    """Fill an entry with baseline nutrients fetched for baseline_query()"""
+    if entry.unit_type == "units":
+        entry.serving_size = nutrients.get("serving_weight_grams", None)  # grams per unit
+        entry.unit_type = nutrients.get("serving_unit", "unit")          # fallback "unit"
+    else:
+        entry.serving_size = 100
+        entry.unit_type = "grams"
+
+    for key, value in nutrients.items():
+        if isinstance(value, (int, float)):
+            setattr(entry, key, round(value, 2))
         else:
-            # ✅ Always fetch for 100 g baseline
-            nutrients = get_nutrition(f"100g {entry.food_name}", None)
-            if not nutrients:
-                raise HTTPException(status_code=404, detail="Food not found (grams)")
-            entry.serving_size = 100
-            entry.unit_type = "grams"
-            print("[GRAMS] Serving size baseline:", entry.serving_size, "Unit type:", entry.unit_type)
-
-        # Fill entry with baseline nutrients
-        for key, value in nutrients.items():
-            if isinstance(value, (int, float)):
-                setattr(entry, key, round(value, 2))
-            else:
-                setattr(entry, key, value)
+            setattr(entry, key, value)
 
-    # ----------------- Scaling -----------------
+def scale_and_build(entry: DiaryEntryCreate) -> dict:
+    """Scale baseline nutrients by quantity and build the row to save"""
     if entry.unit_type == "grams":
         multiplier = entry.quantity / 100  # baseline was 100 g
-        print("[SCALING] Grams mode → quantity:", entry.quantity, "multiplier:", multiplier)
     elif entry.unit_type == "unit" and entry.serving_size:
         multiplier = entry.quantity  # baseline was 1 unit
-        print("[SCALING] Units mode → quantity:", entry.quantity, "multiplier:", multiplier, "serving_size:", entry.serving_size)
     else:
         raise HTTPException(status_code=400, detail="Invalid unit type or missing serving size")
 
-    # Apply multiplier to nutrients
-    nutrient_fields = [
-        "calories", "protein", "fat", "carbs", "fiber", "sugar", "sodium",
-        "vitamin_a", "vitamin_c", "vitamin_d", "vitamin_e", "vitamin_k",
-        "vitamin_b1", "vitamin_b2", "vitamin_b3", "vitamin_b6", "vitamin_b12",
-        "folate", "calcium", "iron", "magnesium", "phosphorus", "potassium", "zinc"
-    ]
-    for field in nutrient_fields:
-        value = getattr(entry, field)
-        if value is not None:
-            setattr(entry, field, round(value * multiplier, 2))
-
     # ----------------- Defaults -----------------
     if entry.date is None:
         entry.date = datetime.now().strftime("%Y-%m-%d")
 
+    # Apply multiplier to all nutrients at once (missing values count as 0)
     entry_data = entry.dict()
+    entry_data.update(NutrientVector.from_mapping(entry_data).scaled(multiplier).to_dict(2))
     entry_data["food_name"] = entry.food_name.title() if entry.food_name else "Unknown Food"
     entry_data["created_at"] = datetime.now().isoformat()
+    return entry_data
+
+
+# ----------------- Add Food Route -----------------
+@router.post("/add")
+async def add_food_to_diary(entry: DiaryEntryCreate):
+    # ----------------- Fetch Nutrition if Missing -----------------
+    if needs_nutrition(entry):
+        if not entry.food_name:
+            raise HTTPException(status_code=400, detail="Food name required when nutrition data missing")
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Incoming entry", extra={"entry": entry.dict()})
+
+        # Always fetch baseline depending on unit type
+        nutrients = await get_nutrition_async(baseline_query(entry), None)
+        if not nutrients:
+            mode = "units" if entry.unit_type == "units" else "grams"
+            raise HTTPException(status_code=404, detail=f"Food not found ({mode})")
+        apply_baseline(entry, nutrients)
+        logger.debug("Baseline applied", extra={"serving_size": entry.serving_size, "unit_type": entry.unit_type})
+
+    # ----------------- Scaling -----------------
+    entry_data = scale_and_build(entry)
 
     # Save to DB
-    from app.database import save_diary_entry
-    entry_id = save_diary_entry(entry_data)
+    entry_id = await run_db(save_diary_entry, entry_data)
     entry_data["id"] = entry_id
 
-    print("[FINAL ENTRY]", entry_data)
+    logger.debug("Entry saved", extra={"entry": entry_data})
 
     return {"entry": entry_data, "message": "Food added to diary successfully"}
+
+
+# ----------------- Batch Add Route -----------------
+@router.post("/add-batch")
+async def add_batch_to_diary(entries: List[DiaryEntryCreate]):
+    """Add many entries at once; either all are saved or none are"""
+    if len(entries) > MAX_BATCH_ENTRIES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_ENTRIES} entries per batch")
+
+    errors = {}
+
+    # One upstream lookup per distinct baseline query, run concurrently
+    # (bounded by the upstream executor)
+    queries = {}
+    for i, entry in enumerate(entries):
+        if not needs_nutrition(entry):
+            continue
+        if not entry.food_name:
+            errors[i] = "Food name required when nutrition data missing"
+            continue
+        query = baseline_query(entry)
+        queries.setdefault(normalize_query(query), query)
+
+    looked_up = await asyncio.gather(*(get_nutrition_async(q, None) for q in queries.values()))
+    nutrients_by_query = dict(zip(queries, looked_up))
+
+    rows = []
+    for i, entry in enumerate(entries):
+        if i in errors:
+            continue
+        try:
+            if needs_nutrition(entry):
+                nutrients = nutrients_by_query[normalize_query(baseline_query(entry))]
+                if not nutrients:
+                    raise HTTPException(status_code=404, detail="Food not found")
+                apply_baseline(entry, nutrients)
+            rows.append((i, scale_and_build(entry)))
+        except HTTPException as e:
+            errors[i] = e.detail
+
+    if errors:
+        results = [
+            {"index": i, "status": "error", "detail": errors[i]} if i in errors
+            else {"index": i, "status": "skipped"}
+            for i in range(len(entries))
+        ]
+        raise HTTPException(status_code=422, detail={"message": "No entries were saved", "results": results})
+
+    ids = await run_db(save_diary_entries, [entry_data for _, entry_data in rows])
+
+    results = [{"index": i, "status": "ok", "id": entry_id} for (i, _), entry_id in zip(rows, ids)]
+    return {"results": results, "message": f"{len(ids)} entries added to diary successfully"}
+
+
+# ----------------- Bulk Import -----------------
+@router.post("/import", status_code=202)
+async def import_diary(
+    request: Request,
+    response: Response,
+    file: UploadFile = File(..., description="CSV export from another tracker"),
+    import_id: Optional[str] = Query(None, description="Resume key; defaults to the file's SHA-256"),
+):
+    """Start importing diary history from a CSV file in the background (202; poll progress_url).
+    Uploading the same file again resumes an interrupted import; a finished one answers 200."""
+    try:
+        status = await start_import(file.file, import_id, filename=file.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid CSV: {e}")
+
+    progress_url = str(request.url_for("get_import_progress", import_id=status["id"]))
+    response.headers["Location"] = progress_url
+    if status["status"] == "done":
+        response.status_code = 200
+    return {"import_id": status["id"], "status": status["status"], "progress_url": progress_url}
+
+@router.get("/import/{import_id}")
+async def get_import_progress(import_id: str):
+    """Rows read, imported and skipped so far by an import"""
+    status = await run_db(get_diary_import, import_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return status
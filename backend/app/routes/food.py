@@ -1,59 +1,111 @@
 from fastapi import APIRouter, Query, HTTPException
-import requests
+import asyncio
+import logging
 import os
-from dotenv import load_dotenv
+import time
 
-from app.routes.nutrionix import get_nutrition
+from app.async_db import run_db
+from app.catalog import match_foods
+from app.nutritionix_client import nutritionix, PRIORITY_SEARCH
+from app.routes.nutrionix import get_nutrition_async
 
-load_dotenv()
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
-NUTRITIONIX_APP_ID = os.getenv("NUTRITIONIX_APP_ID")
-NUTRITIONIX_API_KEY = os.getenv("NUTRITIONIX_API_KEY")
+# Per-result nutrient lookups run concurrently (bounded by the upstream
+# executor), and a search returns whatever finished within SEARCH_DEADLINE seconds
+SEARCH_DEADLINE = float(os.getenv("SEARCH_DEADLINE", "3.0"))
+# Answer from the local catalog (misspellings included) before paying for upstream calls
+SEARCH_LOCAL_FIRST = os.getenv("SEARCH_LOCAL_FIRST", "1") != "0"
+SEARCH_RESULTS = 5
 
-BASE_HEADERS = {
-    "x-app-id": NUTRITIONIX_APP_ID,
-    "x-app-key": NUTRITIONIX_API_KEY,
-}
+
+def _local_result(food):
+    """A catalog food in the shape of an upstream search result"""
+    return {
+        "id": food["id"],
+        "name": food["name"],
+        "serving_unit": food["serving_unit"] or "g",
+        "serving_size": food["serving_size"] or 1,
+        "serving_weight_grams": food["serving_size"] if food["serving_unit"] in (None, "g") else None,
+        "calories": food["calories"],
+        "protein": food["protein"],
+        "fat": food["fat"],
+        "carbs": food["carbs"],
+    }
+
+
+async def _lookup_macros(food_name: str):
+    """Fetch macros for one search result"""
+    nutri_res = await nutritionix.post_async(
+        "/v2/natural/nutrients", json={"query": food_name}, timeout=SEARCH_DEADLINE,
+        priority=PRIORITY_SEARCH, key=("search-nutrients", food_name.lower()),
+    )
+    nutri_data = nutri_res.json()
+
+    if not nutri_data.get("foods"):
+        return None
+    f = nutri_data["foods"][0]
+    return {
+        "name": f.get("food_name", "").title(),
+        "serving_unit": f.get("serving_unit", "g"),
+        "serving_size": f.get("serving_qty", 1),
+        "serving_weight_grams": f.get("serving_weight_grams", 100),
+        "calories": f.get("nf_calories", 0),
+        "protein": f.get("nf_protein", 0),
+        "fat": f.get("nf_total_fat", 0),
+        "carbs": f.get("nf_total_carbohydrate", 0),
+    }
 
 # 1) SEARCH
 @router.get("/search")
-def search_food(query: str = Query(..., description="Food name to search")):
-    url = "https://trackapi.nutritionix.com/v2/search/instant"
+async def search_food(query: str = Query(..., description="Food name to search")):
+    started = time.monotonic()
+    if SEARCH_LOCAL_FIRST:
+        local, corrected = await run_db(match_foods, query, SEARCH_RESULTS)
+        if local:
+            return {
+                "results": [_local_result(food) for food in local],
+                "partial": False,
+                "source": "catalog",
+                "corrected_query": corrected,
+            }
+
     params = {"query": query, "detailed": False}
-    r = requests.get(url, headers=BASE_HEADERS, params=params)
-    r.raise_for_status()
+    r = await nutritionix.get_async(
+        "/v2/search/instant", params=params, timeout=SEARCH_DEADLINE,
+        priority=PRIORITY_SEARCH, key=("search", query.lower()),
+    )
     data = r.json()
 
-    # Return simplified results
+    # Step 2: Lookup macros for the top 5 results concurrently
+    names = [item.get("food_name", "") for item in data.get("common", [])[:SEARCH_RESULTS]]
+    tasks = [asyncio.ensure_future(_lookup_macros(name)) for name in names]
+    done, not_done = set(), set()
+    if tasks:
+        remaining = max(0.0, SEARCH_DEADLINE - (time.monotonic() - started))
+        done, not_done = await asyncio.wait(tasks, timeout=remaining)
+    for task in not_done:
+        task.cancel()
+
+    # Keep upstream ranking order; drop lookups that failed or missed the deadline
     results = []
-    for item in data.get("common", [])[:5]:  # limit to top 5 results
-        food_name = item.get("food_name", "")
-        
-        # Step 2: Lookup macros
-        nutri_url = "https://trackapi.nutritionix.com/v2/natural/nutrients"
-        nutri_res = requests.post(nutri_url, headers=BASE_HEADERS, json={"query": food_name})
-        nutri_res.raise_for_status()
-        nutri_data = nutri_res.json()
-
-        if nutri_data.get("foods"):
-            f = nutri_data["foods"][0]
-            results.append({
-                "name": f.get("food_name", "").title(),
-                "serving_unit": f.get("serving_unit", "g"),
-                "serving_size": f.get("serving_qty", 1),
-                "serving_weight_grams": f.get("serving_weight_grams", 100),
-                "calories": f.get("nf_calories", 0),
-                "protein": f.get("nf_protein", 0),
-                "fat": f.get("nf_total_fat", 0),
-                "carbs": f.get("nf_total_carbohydrate", 0),
-            })
-    return {"results": results}
+    partial = bool(not_done)
+    for task in tasks:
+        if task not in done:
+            continue
+        if task.exception() is not None:
+            logger.warning("Macro lookup failed", extra={"food": names[tasks.index(task)], "error": repr(task.exception())})
+            partial = True
+            continue
+        if task.result():
+            results.append(task.result())
+    return {"results": results, "partial": partial, "source": "nutritionix"}
 
 # 2) DETAILS
 @router.get("/details")
-def food_details(name: str = Query(..., description="Food name to fetch nutrition for")):
-    nutrition = get_nutrition(name, 1)
+async def food_details(name: str = Query(..., description="Food name to fetch nutrition for")):
+    nutrition = await get_nutrition_async(name, 1)
     if not nutrition:
         raise HTTPException(status_code=404, detail="Nutrition info not found")
     return {"food_name": name.title(), **nutrition}
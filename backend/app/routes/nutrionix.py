@@ -1,79 +1,90 @@
 #This is nutrionix.py
-from fastapi import APIRouter
-import requests
-import os
-from dotenv import load_dotenv
+import functools
+import logging
 
-load_dotenv()
+from fastapi import APIRouter, Query
+from typing import Optional
+
+from app.nutrition_cache import nutrition_cache, normalize_query
+from app.nutrients import NutrientVector
+from app.nutritionix_client import nutritionix, SingleFlight, PRIORITY_INTERACTIVE, UpstreamUnavailable
+from app.async_db import run_db
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+def nutrition_query(food_name: str, base_amount=None) -> str:
+    """Upstream query text, e.g. "100g egg" or "1 egg" """
+    return " ".join(str(part) for part in (base_amount, food_name) if part)
 
-NUTRITIONIX_APP_ID = os.getenv("NUTRITIONIX_APP_ID")
-NUTRITIONIX_API_KEY = os.getenv("NUTRITIONIX_API_KEY")
+def _lookup_key(query):
+    """Coalescing and scheduler key of a nutrients lookup"""
+    return ("nutrients", normalize_query(query))
 
-BASE_HEADERS = {
-    "x-app-id": NUTRITIONIX_APP_ID,
-    "x-app-key": NUTRITIONIX_API_KEY,
-    "Content-Type": "application/json"
-}
+_lookups = SingleFlight()  # whole lookups, cache write included
 
-def get_nutrition(food_name: str, base_amount: str = "100g"):
+async def fetch_nutrition(query: str, priority: int = PRIORITY_INTERACTIVE):
     """
-    Always fetch nutrition for a fixed base amount from Nutritionix.
+    Nutrients for a query straight from Nutritionix (no cache read), cached on success.
     Example: "100g egg" or "1 egg"
-    Returns nutrients PER base_amount, not scaled again.
+    Returns nutrients PER that amount, or None when nothing is found or the call fails.
     """
-    url = "https://trackapi.nutritionix.com/v2/natural/nutrients"
-    body = {"query": f"{base_amount} {food_name}"}
-
+    body = {"query": query}
     try:
-        r = requests.post(url, headers=BASE_HEADERS, json=body)
-        r.raise_for_status()
-        data = r.json()
+        response = await nutritionix.post_async(
+            "/v2/natural/nutrients", json=body, priority=priority, key=_lookup_key(query)
+        )
+        data = response.json()
 
         if not data.get("foods"):
-            print(f"No foods found for query: {food_name}")
+            logger.info("No foods found", extra={"query": query})
             return None
 
         food_data = data["foods"][0]
 
-        nutrients = {
-            "calories": food_data.get("nf_calories", 0),
-            "protein": food_data.get("nf_protein", 0),
-            "fat": food_data.get("nf_total_fat", 0),
-            "carbs": food_data.get("nf_total_carbohydrate", 0),
-            "fiber": food_data.get("nf_dietary_fiber", 0),
-            "sugar": food_data.get("nf_sugars", 0),
-            "sodium": food_data.get("nf_sodium", 0),
-
-            # ⚠️ use absolute values, not %DV
-            "vitamin_a": food_data.get("nf_vitamin_a_iu", 0),
-            "vitamin_c": food_data.get("nf_vitamin_c_mg", 0),
-            "vitamin_d": food_data.get("nf_vitamin_d_mcg", 0),
-            "vitamin_e": food_data.get("nf_vitamin_e_mg", 0),
-            "vitamin_k": food_data.get("nf_vitamin_k_mcg", 0),
-            "vitamin_b1": food_data.get("nf_thiamin_mg", 0),
-            "vitamin_b2": food_data.get("nf_riboflavin_mg", 0),
-            "vitamin_b3": food_data.get("nf_niacin_mg", 0),
-            "vitamin_b6": food_data.get("nf_vitamin_b6_mg", 0),
-            "vitamin_b12": food_data.get("nf_vitamin_b12_mcg", 0),
-            "folate": food_data.get("nf_folate_mcg", 0),
-            "calcium": food_data.get("nf_calcium_mg", 0),
-            "iron": food_data.get("nf_iron_mg", 0),
-            "magnesium": food_data.get("nf_magnesium_mg", 0),
-            "phosphorus": food_data.get("nf_phosphorus_mg", 0),
-            "potassium": food_data.get("nf_potassium_mg", 0),
-            "zinc": food_data.get("nf_zinc_mg", 0),
-        }
+        # ⚠️ registry maps to absolute values, not %DV
+        nutrients = NutrientVector.from_nutritionix(food_data).to_dict()
 
         nutrients["serving_size"] = {
         "qty": food_data.get("serving_qty"),             # e.g. 1
         "unit": food_data.get("serving_unit"),           # e.g. "egg"
         "weight_in_grams": food_data.get("serving_weight_grams") # e.g. 55
     }
+        await run_db(nutrition_cache.set, query, nutrients)
         return nutrients
 
+    except UpstreamUnavailable:
+        raise  # out of quota is not "not found"; the API answers 503
     except Exception as e:
-        print(f"Error fetching nutrition: {e}")
+        logger.warning("Nutrition lookup failed", extra={"query": query, "error": repr(e)})
         return None
 
+
+async def get_nutrition_async(food_name: str, base_amount: str = "100g", priority: int = PRIORITY_INTERACTIVE):
+    """Nutrition for a fixed base amount ("100g egg", "1 egg"), not scaled again.
+
+    Memory-cache hits return on the event loop, the SQLite tier is read on the
+    database executor, and a miss is one scheduled upstream call (plus cache
+    write) shared by every concurrent lookup of the same query.
+    """
+    query = nutrition_query(food_name, base_amount)
+    cached = nutrition_cache.get_from_memory(query)
+    if cached is not None:
+        return cached
+    cached = await run_db(nutrition_cache.get, query)
+    if cached is not None:
+        return cached
+    return await _lookups.run(_lookup_key(query), functools.partial(fetch_nutrition, query, priority), priority)
+
+
+# ----------------- Cache Admin -----------------
+@router.get("/cache")
+async def nutrition_cache_stats():
+    """Hit/miss/eviction counters for the Nutritionix lookup cache"""
+    return await run_db(nutrition_cache.stats)
+
+@router.delete("/cache")
+async def invalidate_nutrition_cache(query: Optional[str] = Query(None, description="Query to drop, e.g. '100g banana'; omit to clear all")):
+    """Invalidate one cached lookup, or the whole cache"""
+    removed = await run_db(nutrition_cache.invalidate, query)
+    return {"message": "Nutrition cache invalidated", "removed": removed}
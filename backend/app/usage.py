@@ -0,0 +1,117 @@
+# app/usage.py
+# Per-user food recency/frequency ("MRU") bookkeeping behind /api/foods/recent.
+#
+# Frequency decays exponentially with FOOD_USAGE_HALF_LIFE_DAYS. Instead of
+# rewriting every row as time passes, each use adds a weight that grows with
+# time, exp((t - USAGE_EPOCH) / tau), so newer uses count for more and the
+# ordering of scores equals the ordering of decayed frequencies at any
+# moment. Scores are kept as logs of those sums so they never overflow.
+#
+# These helpers take an open connection so the diary write path can update
+# food_usage in the same transaction as the entry itself.
+
+import json
+import math
+import os
+from datetime import datetime, timezone
+
+from app.nutrients import NUTRIENT_NAMES
+
+FOOD_USAGE_HALF_LIFE_DAYS = float(os.getenv("FOOD_USAGE_HALF_LIFE_DAYS", "14"))
+USAGE_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+USAGE_TAU = FOOD_USAGE_HALF_LIFE_DAYS * 86400 / math.log(2)  # seconds
+DEFAULT_USER_ID = 1
+
+_USAGE_UPSERT = '''
+    INSERT INTO food_usage (user_id, food_id, food_name, use_count, last_used, score, last_portion)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(user_id, food_id) DO UPDATE SET
+        food_name = excluded.food_name,
+        use_count = use_count + excluded.use_count,
+        last_used = MAX(last_used, excluded.last_used),
+        score = excluded.score,
+        last_portion = COALESCE(excluded.last_portion, last_portion)
+'''
+
+
+def log_weight(timestamp):
+    """log of one use's weight at the given unix time"""
+    return (timestamp - USAGE_EPOCH) / USAGE_TAU
+
+def log_add(a, b):
+    """log(exp(a) + exp(b)) without overflow"""
+    if a < b:
+        a, b = b, a
+    return a + math.log1p(math.exp(b - a))
+
+def decayed_count(score, now):
+    """Uses, each decayed by its age, as of now"""
+    return math.exp(score - log_weight(now))
+
+
+def last_portion(entry):
+    """What was logged (amount and nutrients), stored so the food can be re-logged offline"""
+    return json.dumps({
+        "quantity": entry.get("quantity"),
+        "unit_type": entry.get("unit_type"),
+        **{name: entry.get(name) or 0 for name in NUTRIENT_NAMES},
+    })
+
+
+def record_food_usage(conn, entries, now, user_id=DEFAULT_USER_ID):
+    """Fold diary entries logged at `now` into food_usage"""
+    usage = {}  # food_id -> [name, uses, last entry]
+    for entry in entries:
+        seen = usage.get(entry["food_id"])
+        if seen is None:
+            usage[entry["food_id"]] = [entry["food_name"], 1, entry]
+        else:
+            seen[1] += 1
+            seen[2] = entry
+
+    food_ids = list(usage)
+    scores = {}
+    for i in range(0, len(food_ids), 500):
+        chunk = food_ids[i:i + 500]
+        scores.update(conn.execute(
+            f'SELECT food_id, score FROM food_usage WHERE user_id = ? AND food_id IN ({", ".join("?" for _ in chunk)})',
+            [user_id, *chunk]
+        ).fetchall())
+
+    weight = log_weight(now)
+    rows = []
+    for food_id, (name, uses, entry) in usage.items():
+        score = weight + math.log(uses)
+        if food_id in scores:
+            score = log_add(scores[food_id], score)
+        rows.append((user_id, food_id, name, uses, now, score, last_portion(entry)))
+    conn.executemany(_USAGE_UPSERT, rows)
+
+
+def rebuild_food_usage(conn, user_id=DEFAULT_USER_ID):
+    """Recompute food_usage from diary_entries; returns the number of foods"""
+    conn.execute('DELETE FROM food_usage WHERE user_id = ?', (user_id,))
+    usage = {}  # food_id -> [name, uses, last used, score, last entry]
+    rows = conn.execute(f'''
+        SELECT food_id, food_name, quantity, {", ".join(NUTRIENT_NAMES)},
+               CAST(strftime('%s', created_at) AS REAL) AS used_at
+        FROM diary_entries
+        ORDER BY created_at, id
+    ''')
+    for row in rows:
+        used_at = row["used_at"] or USAGE_EPOCH
+        seen = usage.get(row["food_id"])
+        if seen is None:
+            usage[row["food_id"]] = [row["food_name"], 1, used_at, log_weight(used_at), dict(row)]
+        else:
+            seen[0] = row["food_name"]
+            seen[1] += 1
+            seen[2] = max(seen[2], used_at)
+            seen[3] = log_add(seen[3], log_weight(used_at))
+            seen[4] = dict(row)
+
+    conn.executemany(_USAGE_UPSERT, [
+        (user_id, food_id, name, uses, used_at, score, last_portion(entry))
+        for food_id, (name, uses, used_at, score, entry) in usage.items()
+    ])
+    return len(usage)
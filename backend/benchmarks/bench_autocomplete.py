@@ -0,0 +1,76 @@
+"""
+/foods/autocomplete: build time, memory and lookup latency of the prefix
+index on a synthetic catalog, against scanning the whole prefix slice on
+every lookup (no precomputed top-k).
+
+Run from the backend folder:
+    python -m benchmarks.bench_autocomplete --names 1000000
+"""
+import argparse
+import heapq
+import random
+import time
+import tracemalloc
+from bisect import bisect_left, bisect_right
+
+from app.autocomplete import AutocompleteIndex, normalize
+from benchmarks.bench_food_search import synthetic_catalog
+from benchmarks.results import summarize
+
+PREFIXES = ["", "c", "ch", "chi", "chicken", "chicken b", "b", "ba", "bro", "grilled s", "zzz"]
+
+
+def slice_scan(index, prefix, k):
+    """Top k without the precomputed lists: nsmallest over every matching rank"""
+    p = normalize(prefix)
+    lo = bisect_left(index._keys, p)
+    hi = bisect_right(index._keys, p + "\U0010ffff", lo)
+    return heapq.nsmallest(k, index._ranks[lo:hi])
+
+
+def latency(fn, prefixes, repeat):
+    latencies = []
+    for prefix in prefixes:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(prefix)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return summarize(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--names", type=int, default=1_000_000)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--memory", action="store_true", help="also measure the index size (builds it twice)")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    foods = synthetic_catalog(args.names)
+    names = [(f"{food['name']} {i}", food["id"], "catalog") for i, food in enumerate(foods)]
+    # A few thousand logged foods with a long-tailed number of uses
+    uses = {normalize(name): int(1000 / rank) for rank, (name, _, _) in enumerate(rng.sample(names, 5000), 1)}
+
+    start = time.perf_counter()
+    index = AutocompleteIndex(names, uses)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"names={len(index)} build={build_ms:.0f}ms heavy prefixes={len(index._top)}")
+    if args.memory:
+        tracemalloc.start()
+        AutocompleteIndex(names, uses)
+        print(f"memory={tracemalloc.get_traced_memory()[0] / 1e6:.0f}MB")
+        tracemalloc.stop()
+
+    # Prefixes as typed: every length of a sample of names, plus the fixed list
+    typed = [normalize(name)[:n] for name, _, _ in rng.sample(names, 200) for n in range(1, 12)] + PREFIXES
+    for label, fn in (("index", lambda p: index.complete(p, args.k)), ("slice scan", lambda p: slice_scan(index, p, args.k))):
+        stats = latency(fn, typed, args.repeat)
+        print(f"{label:<11} p50={stats['p50_ms']:.4f}ms p99={stats['p99_ms']:.4f}ms max={stats['max_ms']:.4f}ms")
+
+    for prefix in PREFIXES:
+        print(f"{prefix!r:<12} {[s['name'] for s in index.complete(prefix, 3)]}")
+
+
+if __name__ == "__main__":
+    main()
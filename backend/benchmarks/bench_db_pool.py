@@ -0,0 +1,82 @@
+"""
+Compare per-call SQLite connections with the pooled, WAL-tuned connections
+for the /diary and /diary/summary endpoints.
+
+Run from the backend folder:
+    python -m benchmarks.bench_db_pool --requests 2000 --threads 8
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Point the app at a throwaway database before it is imported
+_tmpdir = tempfile.mkdtemp(prefix="bench_db_pool_")
+os.environ["DATABASE_PATH"] = os.path.join(_tmpdir, "bench.db")
+os.environ["DB_POOL_SIZE"] = "0"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import database  # noqa: E402
+from app.main import app  # noqa: E402
+
+ENDPOINTS = ["/diary", "/diary/summary"]
+
+
+def seed(entries_per_day, days):
+    """Insert some history so the queries have rows to read"""
+    today = datetime.now().strftime("%Y-%m-%d")
+    base = {
+        "food_id": "1", "food_name": "Apple", "meal_type": "snack", "quantity": 1,
+        "calories": 95, "protein": 0.5, "fat": 0.3, "carbs": 25, "fiber": 4.4,
+        "sugar": 19, "sodium": 1,
+    }
+    for day in range(days):
+        date = today if day == 0 else f"2020-01-{(day % 28) + 1:02d}"
+        for _ in range(entries_per_day):
+            database.save_diary_entry({**base, "date": date})
+
+
+def run(client, path, requests, threads):
+    """Hit one endpoint and return per-request latencies in ms"""
+    def one(_):
+        start = time.perf_counter()
+        r = client.get(path)
+        r.raise_for_status()
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(one, range(requests)))
+
+
+def report(label, path, latencies):
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{label:<9} {path:<16} mean={statistics.mean(latencies):7.3f}ms "
+          f"p50={statistics.median(latencies):7.3f}ms p99={p99:7.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--entries", type=int, default=20, help="entries per day")
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    with TestClient(app) as client:
+        seed(args.entries, args.days)
+        # Per-call first so the database is still on the default rollback journal
+        for label, pool_size in (("per-call", 0), ("pooled", 8)):
+            database.close_pool()
+            database.DB_POOL_SIZE = pool_size
+            for path in ENDPOINTS:
+                run(client, path, 50, args.threads)  # warm-up
+                report(label, path, run(client, path, args.requests, args.threads))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+/foods search: linear substring scan vs the in-memory inverted token index
+vs the SQLite FTS5 catalog, on a synthetic catalog.
+
+Run from the backend folder:
+    python -m benchmarks.bench_food_search --foods 100000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+# Point the app at a throwaway database before it is imported
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="bench_food_search_"), "bench.db")
+
+from app import catalog  # noqa: E402
+from app.database import init_database  # noqa: E402
+from app.catalog import DEFAULT_SEARCH_LIMIT  # noqa: E402
+from benchmarks.token_index import FoodSearchIndex  # noqa: E402
+
+WORDS = [
+    "apple", "banana", "chicken", "breast", "rice", "white", "brown", "cooked",
+    "steamed", "broccoli", "almond", "egg", "boiled", "salmon", "grilled", "oats",
+    "milk", "whole", "skim", "yogurt", "greek", "cheese", "cheddar", "bread",
+    "wheat", "pasta", "tomato", "sauce", "beef", "ground", "pork", "turkey",
+    "potato", "sweet", "baked", "fried", "spinach", "raw", "carrot", "orange",
+    "juice", "butter", "peanut", "honey", "lentils", "beans", "black", "quinoa",
+]
+
+QUERIES = ["b", "ba", "ban", "bana", "banana", "chicken br", "rice", "grilled salmon", "ked", "zzz"]
+
+
+def synthetic_catalog(size, seed=42):
+    rng = random.Random(seed)
+    return [
+        {"id": str(i), "name": " ".join(rng.sample(WORDS, rng.randint(1, 4))).title()}
+        for i in range(size)
+    ]
+
+
+def linear_search(foods, q):
+    """The old /foods implementation"""
+    return [food for food in foods if q.lower() in food["name"].lower()]
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--foods", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    foods = synthetic_catalog(args.foods)
+    start = time.perf_counter()
+    index = FoodSearchIndex(foods)
+    print(f"catalog={len(foods)} index build={(time.perf_counter() - start) * 1000:.0f}ms")
+
+    init_database()
+    start = time.perf_counter()
+    catalog.import_foods(foods)
+    print(f"sqlite import={(time.perf_counter() - start) * 1000:.0f}ms")
+
+    for q in QUERIES:
+        linear = timed(lambda: linear_search(foods, q), args.repeat)
+        indexed = timed(lambda: index.search(q, DEFAULT_SEARCH_LIMIT), args.repeat)
+        fts = timed(lambda: catalog.search_foods(q, DEFAULT_SEARCH_LIMIT), args.repeat)
+        print(f"{q!r:<16} linear={linear:8.2f}ms index={indexed:8.2f}ms fts={fts:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
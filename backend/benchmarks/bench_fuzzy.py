@@ -0,0 +1,92 @@
+"""
+Typo-tolerant /foods search: runs the misspellings corpus
+(benchmarks/misspellings.json) through catalog.match_foods on a catalog of
+the corpus foods plus synthetic distractors, and reports precision (expected
+food ranked first), recall@k, false positives on nonsense queries and
+latency. A result counts as the expected food when it has the same words in
+any order: the distractors include names like "Yogurt Greek".
+
+Run from the backend folder:
+    python -m benchmarks.bench_fuzzy --distractors 100000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+# Point the app at a throwaway database before it is imported
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="bench_fuzzy_"), "bench.db")
+
+from app import catalog  # noqa: E402
+from app.fuzzy import words  # noqa: E402
+from app.database import init_database  # noqa: E402
+from benchmarks.bench_food_search import synthetic_catalog  # noqa: E402
+from benchmarks.results import SCHEMA, environment, summarize, write_json  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(__file__), "misspellings.json")
+
+
+def same_food(name, expected):
+    return sorted(words(name)) == sorted(words(expected))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--distractors", type=int, default=100_000, help="synthetic foods added to the catalog")
+    parser.add_argument("--k", type=int, default=5, help="results per query")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--verbose", action="store_true", help="print every miss")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    with open(CORPUS, encoding="utf-8") as f:
+        corpus = json.load(f)
+
+    init_database()
+    distractors = [{**food, "id": f"syn{food['id']}"} for food in synthetic_catalog(args.distractors)]
+    catalog.import_foods(distractors)
+    catalog.import_foods({"id": f"corpus{i}", "name": name} for i, name in enumerate(corpus["foods"]))
+
+    top1 = topk = 0
+    latencies = []
+    for case in corpus["queries"]:
+        foods, corrected = catalog.match_foods(case["q"], args.k)
+        names = [food["name"] for food in foods]
+        hits = [same_food(name, case["expected"]) for name in names]
+        top1 += bool(hits) and hits[0]
+        topk += any(hits)
+        if args.verbose and not (hits and hits[0]):
+            print(f"miss {case['q']!r:<22} corrected={corrected!r:<22} got={names[:3]}")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            catalog.match_foods(case["q"], args.k)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    false_positives = sum(bool(catalog.match_foods(q, args.k)[0]) for q in corpus["unmatched"])
+    total = len(corpus["queries"])
+    results = {
+        "queries": total,
+        "precision_at_1": round(top1 / total, 4),
+        f"recall_at_{args.k}": round(topk / total, 4),
+        "false_positives": false_positives,
+        "latency": summarize(latencies),
+    }
+    print(f"catalog={args.distractors + len(corpus['foods'])} queries={total}")
+    print(f"precision@1={results['precision_at_1']:.1%} recall@{args.k}={results[f'recall_at_{args.k}']:.1%} "
+          f"false positives={false_positives}/{len(corpus['unmatched'])}")
+    stats = results["latency"]
+    print(f"latency p50={stats['p50_ms']:.2f}ms p90={stats['p90_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms")
+
+    if args.json:
+        write_json({
+            "schema": SCHEMA,
+            "suite": "fuzzy",
+            "environment": environment(),
+            "params": vars(args),
+            "results": {"fuzzy": results},
+        }, args.json)
+
+
+if __name__ == "__main__":
+    main()
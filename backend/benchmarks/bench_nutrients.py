@@ -0,0 +1,80 @@
+"""
+Aggregating diary entries: per-field dict sums vs NutrientVector (pure
+array fallback and, when installed, NumPy).
+
+Run from the backend folder:
+    python -m benchmarks.bench_nutrients --entries 1000000
+"""
+import argparse
+import random
+import time
+
+from app import nutrients as nutrients_module
+from app.nutrients import NUTRIENT_NAMES, NutrientVector
+
+
+def synthetic_entries(count, seed=42):
+    rng = random.Random(seed)
+    return [{name: round(rng.uniform(0, 50), 2) for name in NUTRIENT_NAMES} for _ in range(count)]
+
+
+def dict_sums(entries):
+    """The old get_daily_summary style: one dict update per field per entry"""
+    totals = {name: 0 for name in NUTRIENT_NAMES}
+    for entry in entries:
+        for name in NUTRIENT_NAMES:
+            totals[name] += entry.get(name) or 0
+    return {name: round(value, 1) for name, value in totals.items()}
+
+
+def vector_iadd(vectors):
+    totals = NutrientVector()
+    for vector in vectors:
+        totals += vector
+    return totals.to_dict(1)
+
+
+def vector_sum_rows(rows, use_numpy):
+    saved = nutrients_module.numpy()
+    if not use_numpy:
+        nutrients_module._np = False
+    try:
+        return NutrientVector.sum_rows(rows).to_dict(1)
+    finally:
+        nutrients_module._np = saved if saved is not None else False
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<28} {(time.perf_counter() - start) * 1000:9.1f}ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    entries = synthetic_entries(args.entries)
+    vectors = [NutrientVector.from_mapping(e) for e in entries]
+    rows = [v.values for v in vectors]
+    np = nutrients_module.numpy()
+    print(f"entries={len(entries)} nutrients={len(NUTRIENT_NAMES)} numpy={np is not None}")
+
+    expected = timed("dict sums", lambda: dict_sums(entries))
+    results = [
+        timed("vector +=", lambda: vector_iadd(vectors)),
+        timed("sum_rows (array)", lambda: vector_sum_rows(rows, use_numpy=False)),
+    ]
+    if np is not None:
+        matrix = np.asarray(rows)
+        results.append(timed("sum_rows (numpy, from rows)", lambda: vector_sum_rows(rows, use_numpy=True)))
+        results.append(timed("sum_rows (numpy, matrix)", lambda: vector_sum_rows(matrix, use_numpy=True)))
+
+    for result in results:
+        assert all(abs(result[n] - expected[n]) < 0.2 for n in NUTRIENT_NAMES), "totals differ"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Search latency with sequential vs concurrent per-result nutrient lookups,
+measured against the local Nutritionix stub.
+
+Run from the backend folder:
+    python -m benchmarks.bench_search --requests 50 --latency 0.05 --jitter 0.05
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.stub_nutritionix import start_stub
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub latency per call (s)")
+    parser.add_argument("--jitter", type=float, default=0.05, help="extra random latency (s)")
+    args = parser.parse_args()
+
+    server, base_url = start_stub(args.latency, args.jitter)
+    os.environ["NUTRITIONIX_BASE_URL"] = base_url
+    from app import nutritionix_client  # imported after the base URL is set
+    from app.routes import food
+
+    # A single upstream worker reproduces the old one-after-another lookups
+    for label, workers in (("sequential", 1), ("concurrent", nutritionix_client.UPSTREAM_EXECUTOR_WORKERS)):
+        nutritionix_client.UPSTREAM_EXECUTOR_WORKERS = workers
+        nutritionix_client.shutdown_upstream()  # the next call starts an executor with `workers`
+        latencies, partial = [], 0
+        for i in range(args.requests):
+            start = time.perf_counter()
+            result = asyncio.run(food.search_food(query=f"apple{i}"))
+            latencies.append((time.perf_counter() - start) * 1000)
+            partial += result["partial"]
+        print(f"{label:<11} p50={percentile(latencies, 50):7.1f}ms "
+              f"p99={percentile(latencies, 99):7.1f}ms partial={partial}/{args.requests}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Cold start: time from launching a uvicorn worker to its first served
+request, plus the bare `import app.main` time, on a fresh database and on
+an already migrated one. Exits non-zero when the median cold start is over
+the budget, so it can gate CI.
+
+Run from the backend folder:
+    python -m benchmarks.bench_startup --runs 5 --max-ms 1000
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.results import SCHEMA, environment, summarize, write_json
+
+IMPORT_PROBE = (
+    "import time; start = time.perf_counter(); import app.main; "
+    "print((time.perf_counter() - start) * 1000)"
+)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def import_time_ms(env):
+    out = subprocess.run([sys.executable, "-c", IMPORT_PROBE], env=env, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def first_request_ms(env, timeout=30.0):
+    """Launch uvicorn and poll until GET / answers; returns elapsed ms"""
+    port = free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except (urllib.error.URLError, ConnectionError):
+                if proc.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with {proc.returncode}")
+                time.sleep(0.005)
+        raise TimeoutError("app did not answer within the timeout")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=1000.0, help="budget for the median warm cold start")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_startup_")
+    env = {**os.environ, "LOG_LEVEL": "WARNING"}
+
+    fresh, warm, imports = [], [], []
+    for i in range(args.runs):
+        # Fresh database: the first start also runs every migration
+        fresh.append(first_request_ms({**env, "DATABASE_PATH": os.path.join(tmpdir, f"fresh{i}.db")}))
+    migrated = {**env, "DATABASE_PATH": os.path.join(tmpdir, "fresh0.db")}
+    for _ in range(args.runs):
+        warm.append(first_request_ms(migrated))
+        imports.append(import_time_ms(migrated))
+
+    results = {
+        "first_request_fresh_db": summarize(fresh),
+        "first_request_migrated_db": summarize(warm),
+        "import_app_main": summarize(imports),
+    }
+    for name, stats in results.items():
+        print(f"{name:<28} p50={stats['p50_ms']:8.1f}ms max={stats['max_ms']:8.1f}ms")
+
+    median = statistics.median(warm)
+    passed = median <= args.max_ms
+    print(f"cold start budget: {median:.0f}ms of {args.max_ms:.0f}ms -> {'OK' if passed else 'REGRESSION'}")
+
+    if args.json:
+        write_json({
+            "schema": SCHEMA,
+            "suite": "startup",
+            "environment": environment(),
+            "params": vars(args),
+            "results": {"startup": {**results, "budget_ms": args.max_ms, "passed": passed}},
+        }, args.json)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Nutritionix scheduling against the stub upstream:
+  coalescing  many concurrent lookups of a few foods -> upstream requests made
+  priority    interactive lookups issued while a background import is queued
+  quota       the upstream answering 429 -> how fast callers get 503s
+
+Run from the backend folder:
+    python -m benchmarks.bench_upstream --lookups 500 --foods 5 --rate 20
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from benchmarks.results import summarize
+from benchmarks.stub_nutritionix import start_stub
+
+
+async def timed(coro):
+    start = time.perf_counter()
+    try:
+        await coro
+        outcome = "ok"
+    except Exception as e:
+        outcome = type(e).__name__
+    return (time.perf_counter() - start) * 1000, outcome
+
+
+def fresh_scheduler(rate, burst):
+    from app import nutritionix_client
+    from app.nutrition_cache import nutrition_cache
+
+    nutritionix_client.upstream_scheduler = nutritionix_client.UpstreamScheduler(rate, burst)
+    nutrition_cache.invalidate(None)
+
+
+async def coalescing(args, stub):
+    from app.routes.nutrionix import get_nutrition_async
+
+    fresh_scheduler(0, 1)  # no rate limit: count requests only
+    before = stub.stats["requests"]
+    start = time.perf_counter()
+    await asyncio.gather(*(get_nutrition_async(f"food {i % args.foods}") for i in range(args.lookups)))
+    print(f"coalescing  {args.lookups} lookups of {args.foods} foods -> "
+          f"{stub.stats['requests'] - before} upstream requests in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+
+async def priority(args):
+    from app.nutritionix_client import PRIORITY_BACKGROUND
+    from app.routes.nutrionix import get_nutrition_async
+
+    fresh_scheduler(args.rate, args.burst)
+    background = [asyncio.ensure_future(timed(get_nutrition_async(f"import {i}", None, PRIORITY_BACKGROUND)))
+                  for i in range(args.background)]
+    await asyncio.sleep(0.2)
+    interactive = await asyncio.gather(*(timed(get_nutrition_async(f"user {i}")) for i in range(args.interactive)))
+    latencies = [ms for ms, outcome in interactive if outcome == "ok"]
+    stats = summarize(latencies) if latencies else {"p50_ms": 0, "max_ms": 0}
+    print(f"priority    {args.interactive} interactive behind {args.background} queued background at "
+          f"{args.rate:g}/s: ok={len(latencies)} p50={stats['p50_ms']:.0f}ms max={stats['max_ms']:.0f}ms")
+    done = await asyncio.gather(*background)
+    print(f"            background finished in {max(ms for ms, _ in done):.0f}ms, "
+          f"{sum(outcome == 'ok' for _, outcome in done)}/{args.background} ok")
+
+
+async def quota(args):
+    from app.routes.nutrionix import get_nutrition_async
+
+    fresh_scheduler(args.rate, args.burst)
+    stub, url = start_stub(latency=0.05, error_rate=1.0, error_status=429)
+    from app.nutritionix_client import nutritionix
+
+    nutritionix.base_url = url
+    results = await asyncio.gather(*(timed(get_nutrition_async(f"quota {i}")) for i in range(args.interactive)))
+    outcomes = sorted({outcome for _, outcome in results})
+    print(f"quota       {args.interactive} lookups while out of quota: outcomes={outcomes} "
+          f"max={max(ms for ms, _ in results):.0f}ms upstream requests={stub.stats['requests']}")
+    stub.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--foods", type=int, default=5)
+    parser.add_argument("--background", type=int, default=200)
+    parser.add_argument("--interactive", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=20)
+    parser.add_argument("--burst", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.1, help="stub upstream latency (s)")
+    args = parser.parse_args()
+
+    stub, url = start_stub(latency=args.latency)
+    os.environ["NUTRITIONIX_BASE_URL"] = url
+    os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="bench_upstream_"), "bench.db")
+    from app.database import init_database
+
+    init_database()
+
+    async def run():
+        await coalescing(args, stub)
+        await priority(args)
+        await quota(args)
+
+    asyncio.run(run())
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+HTTP load harness: drives the app under uvicorn with a weighted mix of
+requests while the local Nutritionix stand-in adds latency and errors.
+
+Each worker thread keeps its own keep-alive session and picks scenarios by
+weight until the duration is up. Latency percentiles, status counts and
+throughput are reported per scenario.
+
+Run from the backend folder:
+    python -m benchmarks.load --duration 20 --concurrency 16 --latency 0.08 --error-rate 0.02 \
+        --json results/load.json
+"""
+import argparse
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import requests
+
+from benchmarks.results import SCHEMA, environment, summarize, write_json
+from benchmarks.stub_nutritionix import start_stub
+
+FOOD_NAMES = [
+    "apple", "banana", "chicken breast", "white rice", "broccoli", "almonds", "boiled egg",
+    "salmon", "oats", "whole milk", "greek yogurt", "cheddar", "brown bread", "pasta",
+    "ground beef", "sweet potato", "spinach", "carrot", "orange juice", "peanut butter",
+]
+
+DEFAULT_MIX = "diary_add=2,diary_add_macros=2,diary_read=4,summary=4,range_summary=1,search=2,foods=3"
+
+
+# ----------------- Scenarios -----------------
+# Each takes (session, base_url, rng) and returns the response
+def diary_add(session, base_url, rng):
+    """Add by name only: needs a Nutritionix lookup unless cached"""
+    name = rng.choice(FOOD_NAMES)
+    body = {"food_id": name, "food_name": name, "meal_type": "lunch", "quantity": rng.choice([50, 100, 150])}
+    return session.post(f"{base_url}/diary/add", json=body)
+
+
+def diary_add_macros(session, base_url, rng):
+    """Add with the macros supplied: database only"""
+    body = {
+        "food_id": "1", "food_name": "apple", "meal_type": "snack", "quantity": 100,
+        "calories": 52, "protein": 0.3, "fat": 0.2, "carbs": 14,
+    }
+    return session.post(f"{base_url}/diary/add", json=body)
+
+
+def diary_read(session, base_url, rng):
+    return session.get(f"{base_url}/diary")
+
+
+def summary(session, base_url, rng):
+    return session.get(f"{base_url}/diary/summary")
+
+
+def range_summary(session, base_url, rng):
+    today = date.today()
+    return session.get(f"{base_url}/diary/summary", params={
+        "from": today.replace(month=1, day=1).isoformat(), "to": today.isoformat(), "granularity": "week",
+    })
+
+
+def search(session, base_url, rng):
+    """/api/search fans out to Nutritionix"""
+    return session.get(f"{base_url}/api/search", params={"query": rng.choice(FOOD_NAMES)})
+
+
+def foods(session, base_url, rng):
+    """Catalog search, served from the FTS5 index"""
+    return session.get(f"{base_url}/foods", params={"q": rng.choice(FOOD_NAMES)[:3]})
+
+
+SCENARIOS = {
+    "diary_add": diary_add,
+    "diary_add_macros": diary_add_macros,
+    "diary_read": diary_read,
+    "summary": summary,
+    "range_summary": range_summary,
+    "search": search,
+    "foods": foods,
+}
+
+
+def parse_mix(mix):
+    """"name=weight,..." -> (names, weights)"""
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        weights[name] = float(weight or 1)
+    return list(weights), list(weights.values())
+
+
+# ----------------- Harness -----------------
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(port):
+    """Run the app under uvicorn on a background thread"""
+    import uvicorn
+    from app.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def worker(base_url, names, weights, deadline, seed):
+    """Run scenarios until the deadline; returns [(scenario, status, latency ms)]"""
+    rng = random.Random(seed)
+    session = requests.Session()
+    samples = []
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        start = time.perf_counter()
+        try:
+            status = SCENARIOS[name](session, base_url, rng).status_code
+        except requests.RequestException:
+            status = "error"
+        samples.append((name, status, (time.perf_counter() - start) * 1000))
+    session.close()
+    return samples
+
+
+def run_load(base_url, names, weights, duration, concurrency, seed):
+    deadline = time.perf_counter() + duration
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(worker, base_url, names, weights, deadline, seed + i) for i in range(concurrency)]
+        return [sample for f in futures for sample in f.result()]
+
+
+def report(samples, duration):
+    latencies, statuses = defaultdict(list), defaultdict(Counter)
+    for name, status, latency in samples:
+        latencies[name].append(latency)
+        statuses[name][str(status)] += 1
+
+    results = {}
+    for name in sorted(latencies):
+        results[name] = {
+            **summarize(latencies[name]),
+            "rps": round(len(latencies[name]) / duration, 2),
+            "status": dict(statuses[name]),
+        }
+    results["total"] = {
+        **summarize([latency for _, _, latency in samples]),
+        "rps": round(len(samples) / duration, 2),
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of load")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds of unmeasured load first")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.08, help="stub latency per call (s)")
+    parser.add_argument("--jitter", type=float, default=0.04, help="extra random stub latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub calls that fail")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="scenario=weight,...")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    names, weights = parse_mix(args.mix)
+
+    stub, stub_url = start_stub(args.latency, args.jitter, error_rate=args.error_rate, error_status=args.error_status)
+    os.environ["NUTRITIONIX_BASE_URL"] = stub_url
+    os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="bench_load_"), "load.db")
+    port = free_port()
+    server = start_app(port)
+    base_url = f"http://127.0.0.1:{port}"
+
+    if args.warmup:
+        run_load(base_url, names, weights, args.warmup, args.concurrency, args.seed + 10_000)
+    stub.stats.update(requests=0, errors=0)
+    samples = run_load(base_url, names, weights, args.duration, args.concurrency, args.seed)
+    results = report(samples, args.duration)
+    results["upstream"] = {"requests": stub.stats["requests"], "injected_errors": stub.stats["errors"]}
+
+    for name, stats in results.items():
+        if "p50_ms" in stats:
+            print(f"{name:<18} n={stats['count']:6d} rps={stats['rps']:8.1f} p50={stats['p50_ms']:8.2f}ms "
+                  f"p99={stats['p99_ms']:8.2f}ms {stats.get('status', '')}")
+    print(f"upstream calls={results['upstream']['requests']} injected errors={results['upstream']['injected_errors']}")
+
+    if args.json:
+        write_json({
+            "schema": SCHEMA,
+            "suite": "load",
+            "environment": environment(),
+            "params": vars(args),
+            "results": {"load": results},
+        }, args.json)
+
+    server.should_exit = True
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Load test: /diary read latency while Nutritionix is slow.
+
+Starts the stub upstream with a large latency and the app under uvicorn,
+then measures /diary reads on an idle server and again while a burst of
+/diary/add calls (each needing an upstream lookup) is in flight.
+
+Run from the backend folder:
+    python -m benchmarks.load_slow_upstream --adds 200 --latency 2.0
+"""
+import argparse
+import os
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.stub_nutritionix import start_stub
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(port):
+    """Run the app under uvicorn on a background thread"""
+    import uvicorn
+    from app.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def measure_reads(base_url, count, threads):
+    """Latencies (ms) of GET /diary"""
+    session = requests.Session()
+
+    def one(_):
+        start = time.perf_counter()
+        session.get(f"{base_url}/diary").raise_for_status()
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return sorted(pool.map(one, range(count)))
+
+
+def report(label, latencies):
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:<22} p50={statistics.median(latencies):7.2f}ms p99={p99:7.2f}ms n={len(latencies)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--adds", type=int, default=200, help="concurrent slow /diary/add calls")
+    parser.add_argument("--reads", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=2.0, help="upstream latency (s)")
+    args = parser.parse_args()
+
+    stub, stub_url = start_stub(latency=args.latency)
+    os.environ["NUTRITIONIX_BASE_URL"] = stub_url
+    os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="load_"), "load.db")
+    port = free_port()
+    server = start_app(port)
+    base_url = f"http://127.0.0.1:{port}"
+
+    report("idle", measure_reads(base_url, args.reads, 4))
+
+    def slow_add(i):
+        body = {"food_id": f"x{i}", "food_name": f"food {i}", "meal_type": "snack", "quantity": 100}
+        return requests.post(f"{base_url}/diary/add", json=body).status_code
+
+    with ThreadPoolExecutor(max_workers=args.adds) as pool:
+        adds = [pool.submit(slow_add, i) for i in range(args.adds)]
+        time.sleep(0.2)  # let the burst occupy the upstream path
+        report("during slow upstream", measure_reads(base_url, args.reads, 4))
+        statuses = [f.result() for f in adds]
+    print(f"adds completed: {statuses.count(200)}/{args.adds} ok")
+
+    server.should_exit = True
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Micro-benchmarks for the database layer and nutrient aggregation: diary
+writes, summaries, diary pages, scaling and search, against a throwaway
+database seeded with history.
+
+Run from the backend folder:
+    python -m benchmarks.micro --days 365 --entries 20 --json results/micro.json
+"""
+import argparse
+import os
+import random
+import tempfile
+from datetime import date, timedelta
+
+# Point the app at a throwaway database before it is imported
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="bench_micro_"), "bench.db")
+
+from app import database  # noqa: E402
+from app import catalog  # noqa: E402
+from app.nutrients import NUTRIENT_NAMES, NutrientVector  # noqa: E402
+from app.routes.diary import DiaryEntryCreate, scale_and_build  # noqa: E402
+from benchmarks.results import SCHEMA, environment, time_calls, write_json  # noqa: E402
+
+
+def make_entry(rng, day):
+    entry = {"food_id": "1", "food_name": "Apple", "meal_type": "snack", "quantity": 1, "date": day}
+    entry.update((name, round(rng.uniform(0, 50), 2)) for name in NUTRIENT_NAMES)
+    return entry
+
+
+def seed(days, entries_per_day, rng):
+    """History ending today; returns the list of dates"""
+    today = date.today()
+    dates = [(today - timedelta(days=i)).isoformat() for i in range(days)]
+    database.save_diary_entries([make_entry(rng, d) for d in dates for _ in range(entries_per_day)])
+    return dates
+
+
+def db_benchmarks(dates, repeat, rng):
+    today, year_ago = dates[0], dates[-1]
+    batch = [make_entry(rng, today) for _ in range(100)]
+    return {
+        "get_daily_summary": time_calls(lambda: database.get_daily_summary(today), repeat),
+        "get_range_summary_day": time_calls(lambda: database.get_range_summary(year_ago, today, "day"), repeat),
+        "get_range_summary_month": time_calls(lambda: database.get_range_summary(year_ago, today, "month"), repeat),
+        "get_diary_page_50": time_calls(lambda: database.get_diary_page(today, 50), repeat),
+        "get_user_stats": time_calls(database.get_user_stats, repeat),
+        "food_search_prefix": time_calls(lambda: catalog.search_foods("ba"), repeat),
+        "food_search_words": time_calls(lambda: catalog.search_foods("chicken br"), repeat),
+        "get_food_by_id": time_calls(lambda: catalog.get_food_by_id("3"), repeat),
+        # Writes last so the reads above see the seeded history only
+        "save_diary_entry": time_calls(lambda: database.save_diary_entry(make_entry(rng, today)), repeat),
+        "save_diary_entries_x100": time_calls(lambda: database.save_diary_entries(batch), max(1, repeat // 10)),
+    }
+
+
+def aggregation_benchmarks(repeat, rng):
+    vectors = [NutrientVector.from_mapping(make_entry(rng, "2024-01-01")) for _ in range(1000)]
+    rows = [v.values for v in vectors]
+    entry = DiaryEntryCreate(**make_entry(rng, "2024-01-01"), unit_type="grams")
+    return {
+        "vector_from_mapping": time_calls(lambda: NutrientVector.from_mapping(entry.dict()), repeat),
+        "vector_scaled": time_calls(lambda: vectors[0].scaled(1.5).to_dict(2), repeat),
+        "sum_rows_x1000": time_calls(lambda: NutrientVector.sum_rows(rows), repeat),
+        "scale_and_build": time_calls(lambda: scale_and_build(entry.copy()), repeat),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--entries", type=int, default=20, help="entries per day")
+    parser.add_argument("--repeat", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    database.init_database()
+    dates = seed(args.days, args.entries, rng)
+
+    results = {
+        "database": db_benchmarks(dates, args.repeat, rng),
+        "aggregation": aggregation_benchmarks(args.repeat, rng),
+    }
+    for group, cases in results.items():
+        for name, stats in cases.items():
+            print(f"{group + '.' + name:<40} p50={stats['p50_ms']:8.3f}ms p99={stats['p99_ms']:8.3f}ms")
+
+    if args.json:
+        write_json({
+            "schema": SCHEMA,
+            "suite": "micro",
+            "environment": environment(),
+            "params": vars(args),
+            "results": {"micro": results},
+        }, args.json)
+    database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
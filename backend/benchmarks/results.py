@@ -0,0 +1,137 @@
+"""
+Shared helpers for the benchmark suite: latency summaries, run metadata and
+the JSON result files that runs are compared with.
+
+Compare two result files from the backend folder:
+    python -m benchmarks.results results/old.json results/new.json
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+SCHEMA = 1
+
+
+def summarize(latencies_ms):
+    """count/mean/percentiles for a list of latencies in ms"""
+    values = sorted(latencies_ms)
+    if not values:
+        return {"count": 0}
+
+    def pct(p):
+        return round(values[min(len(values) - 1, int(len(values) * p / 100))], 4)
+
+    return {
+        "count": len(values),
+        "mean_ms": round(statistics.fmean(values), 4),
+        "p50_ms": pct(50),
+        "p90_ms": pct(90),
+        "p99_ms": pct(99),
+        "max_ms": round(values[-1], 4),
+    }
+
+
+def time_calls(fn, repeat, warmup=3):
+    """Call fn repeat times and summarize the per-call latency"""
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return summarize(latencies)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    """Where and on what the benchmarks ran"""
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "sqlite": sqlite3.sqlite_version,
+        "numpy": numpy_version,
+    }
+
+
+def write_json(report, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _flatten(results, prefix=""):
+    """{"suite.case.metric": value} for every numeric leaf"""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(old, new, metric_suffix="_ms"):
+    """Rows of (name, old, new, change %) for latency metrics present in both runs"""
+    old_flat, new_flat = _flatten(old["results"]), _flatten(new["results"])
+    rows = []
+    for name in sorted(old_flat.keys() & new_flat.keys()):
+        if not name.endswith(metric_suffix):
+            continue
+        before, after = old_flat[name], new_flat[name]
+        change = (after - before) / before * 100 if before else None
+        rows.append((name, before, after, change))
+    return rows
+
+
+def print_comparison(rows, threshold=10.0):
+    for name, before, after, change in rows:
+        flag = ""
+        if change is not None and abs(change) >= threshold:
+            flag = "  SLOWER" if change > 0 else "  faster"
+        change_text = f"{change:+7.1f}%" if change is not None else "    n/a"
+        print(f"{name:<60} {before:10.3f} -> {after:10.3f}ms {change_text}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="flag changes above this %%")
+    args = parser.parse_args()
+    old, new = read_json(args.old), read_json(args.new)
+    print(f"old: {old['environment'].get('commit')}  new: {new['environment'].get('commit')}")
+    print_comparison(compare(old, new), args.threshold)
+
+
+if __name__ == "__main__":
+    main()
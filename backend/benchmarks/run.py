@@ -0,0 +1,83 @@
+"""
+Benchmark runner: runs the micro-benchmarks and the HTTP load harness, each
+in a fresh interpreter (they configure the app through environment
+variables before importing it), and merges their results into one JSON
+file per run.
+
+Run from the backend folder:
+    python -m benchmarks.run                          # every suite
+    python -m benchmarks.run --suite micro --compare benchmarks/results/<older>.json
+    python -m benchmarks.run --load-args "--duration 60 --error-rate 0.05"
+
+Exits non-zero if a suite reports a failed budget (e.g. the startup suite).
+
+Results go to benchmarks/results/<timestamp>-<commit>.json unless --out is given.
+"""
+import argparse
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+from benchmarks.results import (
+    RESULTS_DIR, SCHEMA, compare, environment, print_comparison, read_json, write_json
+)
+
+SUITES = {
+    "micro": "benchmarks.micro",
+    "load": "benchmarks.load",
+    "startup": "benchmarks.bench_startup",
+}
+
+
+def run_suite(name, extra_args):
+    """Run one suite as a subprocess; returns (parsed JSON report, passed)"""
+    with tempfile.TemporaryDirectory(prefix=f"bench_{name}_") as tmpdir:
+        out = os.path.join(tmpdir, f"{name}.json")
+        cmd = [sys.executable, "-m", SUITES[name], "--json", out, *shlex.split(extra_args or "")]
+        print(f"==> {' '.join(cmd)}", flush=True)
+        returncode = subprocess.run(cmd).returncode
+        if not os.path.exists(out):
+            raise SystemExit(f"{name} failed with exit code {returncode}")
+        return read_json(out), returncode == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suite", action="append", choices=list(SUITES), help="repeatable; default: all")
+    parser.add_argument("--micro-args", default="", help="extra arguments for benchmarks.micro")
+    parser.add_argument("--load-args", default="", help="extra arguments for benchmarks.load")
+    parser.add_argument("--startup-args", default="", help="extra arguments for benchmarks.bench_startup")
+    parser.add_argument("--out", help="result file (default: benchmarks/results/<timestamp>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="flag changes above this %%")
+    args = parser.parse_args()
+
+    env = environment()
+    report = {"schema": SCHEMA, "environment": env, "params": {}, "results": {}}
+    failed = []
+    for name in args.suite or list(SUITES):
+        suite, passed = run_suite(name, getattr(args, f"{name}_args"))
+        if not passed:
+            failed.append(name)
+        report["params"][name] = suite["params"]
+        report["results"].update(suite["results"])
+
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    out = args.out or os.path.join(RESULTS_DIR, f"{stamp}-{env['commit'] or 'unknown'}.json")
+    write_json(report, out)
+    print(f"Results written to {out}")
+
+    if args.compare:
+        baseline = read_json(args.compare)
+        print(f"\nCompared with {args.compare} ({baseline['environment'].get('commit')}):")
+        print_comparison(compare(baseline, report), args.threshold)
+
+    if failed:
+        raise SystemExit(f"Budget exceeded in: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Local stand-in for the Nutritionix API with configurable latency and
+error rate.
+
+Serves GET /v2/search/instant and POST /v2/natural/nutrients with canned
+data. Use start_stub() from a benchmark, or run it standalone:
+    python -m benchmarks.stub_nutritionix --port 9100 --latency 0.08 --error-rate 0.05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def fake_food(name):
+    """Deterministic nutrition for a food name"""
+    seed = sum(map(ord, name))
+    return {
+        "food_name": name,
+        "serving_qty": 1,
+        "serving_unit": "serving",
+        "serving_weight_grams": 100,
+        "nf_calories": 50 + seed % 400,
+        "nf_protein": seed % 30,
+        "nf_total_fat": seed % 20,
+        "nf_total_carbohydrate": seed % 60,
+        "nf_dietary_fiber": seed % 8,
+        "nf_sugars": seed % 25,
+        "nf_sodium": seed % 500,
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    disable_nagle_algorithm = True
+    latency = 0.05     # seconds per request
+    jitter = 0.0       # extra uniform random delay, seconds
+    error_rate = 0.0   # fraction of requests answered with error_status
+    error_status = 500
+    stats = None       # per-server request counters, set by start_stub()
+
+    def _delay(self):
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+
+    def _fail(self):
+        """Answer with an error for error_rate of the requests; True if it did"""
+        failed = random.random() < self.error_rate
+        with self.stats["lock"]:
+            self.stats["requests"] += 1
+            self.stats["errors"] += failed
+        if failed:
+            self._send({"message": "stub error"}, self.error_status)
+        return failed
+
+    def _send(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/v2/search/instant":
+            return self._send({"message": "not found"}, 404)
+        self._delay()
+        if self._fail():
+            return
+        query = parse_qs(url.query).get("query", ["food"])[0]
+        self._send({"common": [{"food_name": f"{query} {i}"} for i in range(10)]})
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/v2/natural/nutrients":
+            return self._send({"message": "not found"}, 404)
+        length = int(self.headers.get("Content-Length", 0))
+        query = json.loads(self.rfile.read(length) or b"{}").get("query", "")
+        self._delay()
+        if self._fail():
+            return
+        self._send({"foods": [fake_food(query)]})
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub(latency=0.05, jitter=0.0, port=0, error_rate=0.0, error_status=500):
+    """Start the stub on a background thread; returns (server, base_url)
+
+    server.stats counts the requests served and the errors injected.
+    """
+    stats = {"requests": 0, "errors": 0, "lock": threading.Lock()}
+    handler = type("Handler", (StubHandler,), {
+        "latency": latency, "jitter": jitter, "stats": stats,
+        "error_rate": error_rate, "error_status": error_status,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.stats = stats
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    args = parser.parse_args()
+    server, url = start_stub(args.latency, args.jitter, args.port, args.error_rate, args.error_status)
+    print(f"Stub Nutritionix listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,121 @@
+"""
+In-memory inverted index over food names: how /foods search worked before
+the catalog moved into SQLite FTS5 (app/catalog.py). Kept only as the
+baseline for bench_food_search.
+
+Results are ranked in three tiers:
+  0. the whole name starts with the query
+  1. every query word is a prefix of some word in the name
+  2. the query appears anywhere in the name (substring)
+Within a tier shorter names come first, then catalog order. Foods are kept
+internally in that rank order, so every tier can stop as soon as the
+limit is filled instead of scoring the whole catalog.
+"""
+import heapq
+import re
+from bisect import bisect_left, bisect_right
+
+from app.catalog import DEFAULT_SEARCH_LIMIT
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Lowercase alphanumeric words of a name or query"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class FoodSearchIndex:
+    """Token/prefix inverted index over a list of food dicts"""
+
+    def __init__(self, foods=()):
+        self.build(foods)
+
+    def build(self, foods):
+        """(Re)build the index; call whenever the catalog is loaded"""
+        foods = list(foods)
+        order = sorted(range(len(foods)), key=lambda i: (len(foods[i]["name"]), i))
+        # Internal ids ("ranks") are positions in rank order
+        self._foods = [foods[i] for i in order]
+        self._names = [food["name"].lower() for food in self._foods]
+        self._name_tokens = [tuple(tokenize(name)) for name in self._names]
+
+        postings = {}
+        for rank, tokens in enumerate(self._name_tokens):
+            for token in set(tokens):
+                postings.setdefault(token, []).append(rank)  # ascending by construction
+        self._postings = postings
+        self._tokens = sorted(postings)
+
+        # Names sorted alphabetically, for the "starts with" tier
+        by_name = sorted(range(len(self._names)), key=self._names.__getitem__)
+        self._sorted_names = [self._names[r] for r in by_name]
+        self._sorted_ranks = by_name
+
+        # All names in rank order as one string, for a C-speed substring scan
+        self._haystack = "\n".join(self._names)
+        self._offsets = []
+        offset = 0
+        for name in self._names:
+            self._offsets.append(offset)
+            offset += len(name) + 1
+
+    def _name_prefix(self, q, need):
+        """Best `need` ranks whose name starts with q"""
+        lo = bisect_left(self._sorted_names, q)
+        hi = bisect_right(self._sorted_names, q + "\U0010ffff", lo)
+        return heapq.nsmallest(need, self._sorted_ranks[lo:hi])
+
+    def _word_prefix(self, q, words, need, exclude):
+        """Best `need` ranks where every query word prefixes a word of the name"""
+        anchor = max(words, key=len)  # longest word is usually the most selective
+        others = [w for w in words if w != anchor]
+
+        lists = []
+        i = bisect_left(self._tokens, anchor)
+        while i < len(self._tokens) and self._tokens[i].startswith(anchor):
+            lists.append(self._postings[self._tokens[i]])
+            i += 1
+
+        found, last = [], None
+        for rank in heapq.merge(*lists):
+            if rank == last:
+                continue
+            last = rank
+            if rank in exclude:
+                continue
+            tokens = self._name_tokens[rank]
+            if all(any(t.startswith(w) for t in tokens) for w in others):
+                found.append(rank)
+                if len(found) >= need:
+                    break
+        return found
+
+    def _substring(self, q, need, exclude):
+        """Best `need` ranks whose name contains q anywhere"""
+        found = []
+        if "\n" in q:
+            return found
+        pos = self._haystack.find(q)
+        while pos != -1 and len(found) < need:
+            rank = bisect_right(self._offsets, pos) - 1
+            if rank not in exclude:
+                found.append(rank)
+            next_name = self._offsets[rank + 1] if rank + 1 < len(self._offsets) else len(self._haystack)
+            pos = self._haystack.find(q, next_name)
+        return found
+
+    def search(self, query, limit=DEFAULT_SEARCH_LIMIT):
+        """Foods matching query, best first; limit=None returns every match"""
+        q = query.lower().strip()
+        need = limit if limit is not None else len(self._foods)
+        if not q:
+            return self._foods[:need]
+
+        ranked = self._name_prefix(q, need)
+        words = sorted(set(tokenize(q)))
+        if len(ranked) < need and words:
+            ranked += self._word_prefix(q, words, need - len(ranked), set(ranked))
+        if len(ranked) < need:
+            ranked += self._substring(q, need - len(ranked), set(ranked))
+        return [self._foods[rank] for rank in ranked]
@@ -0,0 +1,40 @@
+# Tests run against a throwaway database and never reach the real Nutritionix
+# API; both are configured before any app module reads its settings.
+import os
+import tempfile
+
+import pytest
+
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="tracking_tests_"), "tracking_app.db")
+os.environ.setdefault("NUTRITIONIX_BASE_URL", "http://127.0.0.1:9")  # discard port: fails fast
+
+
+@pytest.fixture
+def client():
+    """The app with its lifespan run, as under uvicorn"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Point the client at a stub; returns start(**stub options) -> stub server"""
+    from app import nutritionix_client
+    from app.nutritionix_client import UpstreamScheduler, nutritionix
+    from benchmarks.stub_nutritionix import start_stub
+
+    monkeypatch.setattr(nutritionix_client, "upstream_scheduler", UpstreamScheduler(rate=50, burst=5))
+    servers = []
+
+    def start(**options):
+        server, url = start_stub(**options)
+        servers.append(server)
+        monkeypatch.setattr(nutritionix, "base_url", url)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
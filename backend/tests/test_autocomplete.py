@@ -0,0 +1,57 @@
+import random
+import time
+
+import pytest
+
+from app import autocomplete
+from app.autocomplete import AutocompleteIndex, UsageOverlay, complete_food_names, normalize
+from app.catalog import upsert_foods
+from app.database import init_database, save_diary_entries
+
+WORDS = ["apple", "apricot", "banana", "bread", "brown", "rice", "chicken", "cheese", "chili"]
+
+
+def test_overlay_ranks_like_one_index(monkeypatch):
+    monkeypatch.setattr(autocomplete, "AUTOCOMPLETE_NODE_SIZE", 4)  # exercise the precomputed top-k too
+    rng = random.Random(3)
+    names = list(dict.fromkeys(" ".join(rng.sample(WORDS, rng.randint(1, 3))) for _ in range(300)))
+    base_names = [(name.title(), str(i), "catalog") for i, name in enumerate(names[:200])]
+    new_names = [(name.title(), None, "nutritionix") for name in names[200:]]
+    uses = {normalize(name): rng.randint(1, 5) for name in rng.sample(names, 40)}
+
+    layered = UsageOverlay(AutocompleteIndex(base_names), new_names, uses)
+    single = AutocompleteIndex(base_names + new_names, uses)
+    for prefix in ["", "a", "b", "br", "brown", "chi", "chicken b", "z"]:
+        for k in (1, 5, 20):
+            assert layered.complete(prefix, k) == single.complete(prefix, k)
+
+
+@pytest.fixture
+def fresh_index(monkeypatch):
+    init_database()
+    monkeypatch.setattr(autocomplete, "AUTOCOMPLETE_REFRESH_SECONDS", 0)
+    monkeypatch.setattr(autocomplete, "_state", {**autocomplete._state, "index": None})
+
+
+def test_logging_a_food_refreshes_only_the_overlay(fresh_index):
+    complete_food_names("chicken")
+    base = autocomplete._state["index"].base
+
+    save_diary_entries([{"food_id": "ac", "food_name": "Chicken Breast", "meal_type": "dinner",
+                         "quantity": 1, "date": "1993-01-01", "calories": 1}] * 3)
+    top = complete_food_names("chicken", 1)
+    assert top[0]["name"] == "Chicken Breast" and top[0]["uses"] >= 3
+    assert autocomplete._state["index"].base is base
+
+
+def test_catalog_change_rebuilds_the_base(fresh_index):
+    complete_food_names("zz")
+    base = autocomplete._state["index"].base
+
+    upsert_foods([{"id": "ac-zz", "name": "Zzyzx Berry"}])
+    complete_food_names("zz")  # starts the background rebuild, answers from the old index
+    deadline = time.monotonic() + 5
+    while autocomplete._state["building"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert autocomplete._state["index"].base is not base
+    assert [s["name"] for s in complete_food_names("zzy")] == ["Zzyzx Berry"]
@@ -0,0 +1,49 @@
+import threading
+
+from app.database import (
+    db_connection, delete_diary_entry, get_daily_summary, init_database, save_diary_entries, save_diary_entry,
+    verify_daily_totals,
+)
+
+
+def entry(date, calories, name="Totals"):
+    return {"food_id": "dt", "food_name": name, "meal_type": "snack", "quantity": 1, "date": date, "calories": calories}
+
+
+def run_together(calls):
+    """Start every call at once on its own thread"""
+    barrier = threading.Barrier(len(calls))
+
+    def run(fn, *args):
+        barrier.wait()
+        fn(*args)
+
+    threads = [threading.Thread(target=run, args=call) for call in calls]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_deletes_and_writes_keep_totals_exact():
+    init_database()
+    ids = save_diary_entries([entry("1992-02-02", 10) for _ in range(20)])
+
+    # Every entry deleted by four threads at once, while new entries land on the same day
+    calls = [(delete_diary_entry, entry_id) for entry_id in ids for _ in range(4)]
+    calls += [(save_diary_entry, entry("1992-02-02", 7)) for _ in range(10)]
+    run_together(calls)
+
+    summary = get_daily_summary("1992-02-02")
+    assert (summary["total_entries"], summary["calories"]) == (10, 70)
+    assert verify_daily_totals() == []
+
+
+def test_deleting_the_last_entry_drops_the_day_and_unknown_ids_are_ignored():
+    init_database()
+    (entry_id,) = save_diary_entries([entry("1992-03-03", 50)])
+    delete_diary_entry(entry_id)
+    delete_diary_entry(entry_id)  # already gone: nothing to subtract
+    with db_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM daily_totals WHERE date = '1992-03-03'").fetchone()[0] == 0
+    assert get_daily_summary("1992-03-03")["total_entries"] == 0
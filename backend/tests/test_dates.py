@@ -0,0 +1,39 @@
+import sqlite3
+
+from app.database import NUTRIENT_COLUMNS, get_range_summary, init_database, save_diary_entry
+from app.migrations import MIGRATIONS, SCHEMA_VERSION, migrate
+
+
+def entry(date, calories):
+    return {"food_id": "t", "food_name": "Test", "meal_type": "snack", "quantity": 1,
+            "date": date, "calories": calories}
+
+
+def test_unpadded_dates_share_a_period():
+    init_database()
+    save_diary_entry(entry("1999-3-5", 100))
+    save_diary_entry(entry("1999-03-06", 50))
+
+    months = get_range_summary("1999-03-01", "1999-03-31", "month")["periods"]
+    assert [(p["period_start"], p["calories"], p["total_entries"]) for p in months] == [("1999-03-01", 150, 2)]
+    days = get_range_summary("1999-03-01", "1999-03-31", "day")["periods"]
+    assert [(p["period_start"], p["last_date"]) for p in days] == [("1999-03-05", "1999-03-05"), ("1999-03-06", "1999-03-06")]
+
+
+def test_migration_repairs_unpadded_legacy_rows(tmp_path):
+    conn = sqlite3.connect(tmp_path / "legacy.db", isolation_level=None)
+    for version, migration in enumerate(MIGRATIONS[:9], start=1):
+        migration(conn)
+        conn.execute(f"PRAGMA user_version = {version}")
+    # Written before dates were canonicalized: migration 2's julianday() backfill left day NULL
+    conn.execute(
+        f"INSERT INTO diary_entries (food_id, food_name, meal_type, quantity, date, day, {', '.join(NUTRIENT_COLUMNS)}) "
+        f"VALUES ('t', 'Test', 'snack', 1, '2024-3-5', NULL, {', '.join('0' for _ in NUTRIENT_COLUMNS)})"
+    )
+    conn.execute("UPDATE diary_entries SET calories = 120")
+
+    migrate(conn)
+
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    assert conn.execute("SELECT date, day FROM diary_entries").fetchall() == [("2024-03-05", 19787)]
+    assert conn.execute("SELECT date, total_entries, calories FROM daily_totals").fetchall() == [("2024-03-05", 1, 120)]
@@ -0,0 +1,75 @@
+import pytest
+
+from app import database
+from app.database import db_connection, get_daily_summary, save_diary_entries
+from app.routes import diary
+
+
+def item(name, date, **nutrients):
+    return {"food_id": name.lower(), "food_name": name, "meal_type": "lunch", "quantity": 100,
+            "date": date, **nutrients}
+
+
+def day_count(date):
+    with db_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM diary_entries WHERE date = ?", (date,)).fetchone()[0]
+
+
+def test_batch_saves_every_entry_in_order(client):
+    macros = {"calories": 100, "protein": 1, "fat": 1, "carbs": 1}
+    response = client.post("/diary/add-batch", json=[item(f"Batch {i}", "1991-01-01", **macros) for i in range(3)])
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["index"] for r in results] == [0, 1, 2] and all(r["status"] == "ok" for r in results)
+    assert [r["id"] for r in results] == list(range(results[0]["id"], results[0]["id"] + 3))
+    assert get_daily_summary("1991-01-01")["calories"] == 300
+
+
+def test_empty_batch_saves_nothing(client):
+    response = client.post("/diary/add-batch", json=[])
+    assert response.status_code == 200 and response.json()["results"] == []
+
+
+def test_one_bad_item_rejects_the_whole_batch(client):
+    good = item("Batch Good", "1991-02-02", calories=1, protein=1, fat=1, carbs=1)
+    nameless = {**item("x", "1991-02-02"), "food_name": None}  # no macros and nothing to look up
+    response = client.post("/diary/add-batch", json=[good, nameless])
+    assert response.status_code == 422
+    assert response.json()["detail"]["results"] == [
+        {"index": 0, "status": "skipped"},
+        {"index": 1, "status": "error", "detail": "Food name required when nutrition data missing"},
+    ]
+    assert day_count("1991-02-02") == 0
+
+
+def test_invalid_items_fail_validation(client):
+    assert client.post("/diary/add-batch", json=[{"food_id": "x"}]).status_code == 422
+
+
+def test_batch_size_limit(client, monkeypatch):
+    monkeypatch.setattr(diary, "MAX_BATCH_ENTRIES", 2)
+    macros = {"calories": 1, "protein": 1, "fat": 1, "carbs": 1}
+    assert client.post("/diary/add-batch", json=[item("Limit", "1991-03-03", **macros)] * 2).status_code == 200
+    response = client.post("/diary/add-batch", json=[item("Limit", "1991-03-03", **macros)] * 3)
+    assert response.status_code == 413
+    assert day_count("1991-03-03") == 2
+
+
+def test_missing_nutrition_is_looked_up_once_per_food(client, upstream):
+    stub = upstream()
+    entries = [item("Batch Plum", "1991-04-04")] * 5 + [item("batch plum ", "1991-04-04"), item("Batch Fig", "1991-04-04")]
+    response = client.post("/diary/add-batch", json=entries)
+    assert response.status_code == 200
+    assert stub.stats["requests"] == 2
+    assert day_count("1991-04-04") == 7
+
+
+def test_failed_write_rolls_back_the_whole_batch(client, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(database, "record_food_usage", fail)  # runs after the entries are inserted
+    with pytest.raises(RuntimeError):
+        save_diary_entries([item("Rollback", "1991-05-05", calories=1)] * 3)
+    assert day_count("1991-05-05") == 0
+    assert get_daily_summary("1991-05-05")["total_entries"] == 0
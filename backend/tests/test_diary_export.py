@@ -0,0 +1,34 @@
+import csv
+import io
+
+from app.database import NUTRIENT_COLUMNS, db_connection, init_database, save_diary_entries
+from app.diary_export import export_chunks
+
+
+def test_export_spans_batches_and_skips_entries_without_a_day():
+    init_database()
+    save_diary_entries([{"food_id": "x", "food_name": f"Export {i}", "meal_type": "lunch", "quantity": 1,
+                         "date": f"1995-01-0{1 + i % 3}", "calories": i} for i in range(7)])
+    with db_connection() as conn:
+        # Older rows may have no day; they sort first in (day, created_at, id)
+        conn.execute(
+            f"INSERT INTO diary_entries (food_id, food_name, meal_type, quantity, date, day, {', '.join(NUTRIENT_COLUMNS)}) "
+            f"VALUES ('x', 'Export undated', 'lunch', 1, 'someday', NULL, {', '.join('0' for _ in NUTRIENT_COLUMNS)})"
+        )
+        expected = conn.execute("SELECT COUNT(*) FROM diary_entries WHERE day IS NOT NULL").fetchone()[0]
+
+    body = b"".join(export_chunks(None, None, ["date", "food_name"], "csv", batch=2, chunk_size=64))
+    rows = list(csv.reader(io.StringIO(body.decode("utf-8"))))[1:]
+    assert len(rows) == expected
+    assert [row[1] for row in rows if row[0].startswith("1995-")] == [
+        f"Export {i}" for i in (0, 3, 6, 1, 4, 2, 5)
+    ]
+
+
+def test_export_endpoint_streams_a_range(client):
+    save_diary_entries([{"food_id": "x", "food_name": "Export range", "meal_type": "lunch", "quantity": 1,
+                         "date": "1994-05-05", "calories": 1}])
+    response = client.get("/diary/export?from=1994-05-05&to=1994-05-05&format=ndjson&fields=date,food_name")
+    assert response.status_code == 200
+    assert response.text == '{"date":"1994-05-05","food_name":"Export range"}\n'
+    assert client.get("/diary/export?from=1994-05-06&to=1994-05-05").status_code == 400
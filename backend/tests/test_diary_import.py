@@ -0,0 +1,40 @@
+import time
+
+CSV = (
+    "Date,Food,Meal,Calories,Protein (g),Fat (g),Carbohydrates (g)\n"
+    "1998-06-01,Toast,Breakfast,120,4,2,20\n"
+    "1998-06-01,Egg,Breakfast,70,6,5,0\n"
+    "1998-13-01,Bad Date,Lunch,1,1,1,1\n"
+).encode()
+
+
+def wait_until_finished(client, url, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        progress = client.get(url).json()
+        if progress["status"] != "running" or time.monotonic() > deadline:
+            return progress
+        time.sleep(0.02)
+
+
+def test_upload_imports_in_background(client):
+    started = client.post("/diary/import", files={"file": ("history.csv", CSV, "text/csv")})
+    assert started.status_code == 202
+    body = started.json()
+    assert started.headers["Location"] == body["progress_url"]
+
+    progress = wait_until_finished(client, body["progress_url"])
+    assert progress["id"] == body["import_id"]
+    assert (progress["status"], progress["rows_imported"], progress["rows_skipped"]) == ("done", 2, 1)
+    assert client.get("/diary/summary/1998-06-01").json()["calories"] == 190
+
+    # The same file again: already done, nothing duplicated
+    again = client.post("/diary/import", files={"file": ("history.csv", CSV, "text/csv")})
+    assert (again.status_code, again.json()["status"]) == (200, "done")
+    assert client.get("/diary/summary/1998-06-01").json()["calories"] == 190
+
+
+def test_invalid_csv_is_rejected_up_front(client):
+    response = client.post("/diary/import", files={"file": ("x.csv", b"foo,bar\n1,2\n", "text/csv")})
+    assert response.status_code == 400
+    assert client.get("/diary/import/unknown").status_code == 404
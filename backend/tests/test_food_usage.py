@@ -0,0 +1,65 @@
+from app import main
+from app.database import db_connection, get_food_usage, init_database
+from app.usage import USAGE_EPOCH, record_food_usage
+
+USER = 919  # a user of its own, so other tests' diary writes do not show up
+DAY = 86400
+
+
+def log(food_id, times, at, calories=10, quantity=100):
+    entry = {"food_id": food_id, "food_name": food_id.title(), "quantity": quantity, "calories": calories}
+    with db_connection() as conn:
+        record_food_usage(conn, [entry] * times, USAGE_EPOCH + at, user_id=USER)
+
+
+def names(kind):
+    return [food["name"] for food in get_food_usage(kind, 10, user_id=USER)]
+
+
+def test_recent_and_frequent_orders_with_decay():
+    init_database()
+    log("oats", 3, at=0)
+    log("kiwi", 1, at=DAY)
+    assert names("recent") == ["Kiwi", "Oats"]
+    assert names("frequent") == ["Oats", "Kiwi"]
+
+    # Five half-lives later one new use outweighs three old ones
+    log("kiwi", 1, at=70 * DAY)
+    assert names("frequent") == ["Kiwi", "Oats"]
+    kiwi, oats = get_food_usage("frequent", 10, user_id=USER)
+    assert (kiwi["use_count"], oats["use_count"]) == (2, 3)
+    assert get_food_usage("recent", 1, user_id=USER) == [kiwi]
+
+
+def test_last_portion_is_returned_for_relogging():
+    init_database()
+    log("rye", 1, at=0, calories=80, quantity=40)
+    log("rye", 1, at=DAY, calories=120, quantity=60)
+    (rye,) = [food for food in get_food_usage("recent", 10, user_id=USER) if food["id"] == "rye"]
+    assert (rye["serving_size"], rye["serving_unit"], rye["calories"]) == (60, "g", 120)
+    assert rye["protein"] == 0  # every nutrient is present, so no upstream lookup is needed
+
+
+def test_recent_endpoint_tracks_diary_writes(client):
+    before = client.get("/api/foods/recent?limit=1")
+    body = {"food_id": "usage-pear", "food_name": "Usage Pear", "meal_type": "snack", "quantity": 150,
+            "calories": 90, "protein": 1, "fat": 0, "carbs": 20}
+    assert client.post("/diary/add", json=body).status_code == 200
+
+    after = client.get("/api/foods/recent?limit=1", headers={"If-None-Match": before.headers["ETag"]})
+    assert after.status_code == 200
+    (food,) = after.json()["foods"]
+    # The portion as saved: nutrients are sent per 100 g and scaled to 150 g
+    assert (food["id"], food["serving_size"], food["calories"]) == ("usage-pear", 150, 135)
+    assert client.get("/api/foods/recent?kind=frequent&limit=50").status_code == 200
+
+
+def test_recent_endpoint_rejects_bad_parameters(client):
+    for query in ("kind=latest", "limit=0", "limit=51"):
+        assert client.get(f"/api/foods/recent?{query}").status_code == 422
+
+
+def test_catalog_suggestions_before_anything_is_logged(client, monkeypatch):
+    monkeypatch.setattr(main, "get_food_usage", lambda kind, limit: [])
+    foods = client.get("/api/foods/recent?limit=3").json()["foods"]
+    assert [food["name"] for food in foods] == ["Apple", "Banana", "Chicken Breast"]
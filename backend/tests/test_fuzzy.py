@@ -0,0 +1,44 @@
+import pytest
+
+from app.fuzzy import TrigramIndex
+
+VOCABULARY = [("apple", 3), ("banana", 2), ("breast", 4), ("chicken", 5), ("oats", 1),
+              ("milk", 2), ("egg", 2), ("eggplant", 1), ("peanut", 1), ("butter", 2)]
+
+
+@pytest.fixture
+def index():
+    return TrigramIndex(VOCABULARY)
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("bananna", "banana"),
+    ("chiken breast", "chicken breast"),
+    ("aple", "apple"),
+    ("egg plant", "eggplant"),
+    ("peanutbutter", "peanut butter"),
+])
+def test_misspellings_are_corrected(index, query, expected):
+    assert index.correct_query(query) == expected
+
+
+@pytest.mark.parametrize("query", [
+    "apple pie",             # no word is ever dropped
+    "chicken tikka masala",
+    "banana bread",          # two edits away from "breast", too dissimilar
+    "oat milk",              # too short to correct to "oats"
+    "chicken breast",        # nothing to correct
+])
+def test_queries_without_a_safe_correction_are_left_alone(index, query):
+    assert index.correct_query(query) is None
+
+
+def test_search_without_a_local_match_asks_upstream(client, upstream):
+    stub = upstream()
+    response = client.get("/api/search", params={"query": "apple pie"})
+    assert response.status_code == 200
+    assert response.json()["source"] == "nutritionix"
+    assert stub.stats["requests"] >= 1
+
+    local = client.get("/api/search", params={"query": "bananna"}).json()
+    assert local["source"] == "catalog" and local["corrected_query"] == "banana"
@@ -0,0 +1,41 @@
+from email.utils import formatdate
+
+from starlette.requests import Request
+
+from app.http_cache import is_not_modified
+
+
+def request_with(**headers):
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "headers": raw})
+
+
+def test_if_modified_since_never_hides_a_write_in_the_same_second():
+    since = request_with(if_modified_since=formatdate(1_700_000_000, usegmt=True))
+    assert not is_not_modified(since, 'W/"x"', 1_700_000_000.4)  # same second as the client's copy
+    assert is_not_modified(since, 'W/"x"', 1_699_999_999.9)
+    assert not is_not_modified(since, 'W/"x"', 1_700_000_001)
+
+
+def test_if_none_match_compares_the_tag_list():
+    etag = 'W/"catalog-3"'
+    assert is_not_modified(request_with(if_none_match='"other", W/"catalog-3"'), etag)
+    assert is_not_modified(request_with(if_none_match='"a,b", "catalog-3"'), etag)
+    assert not is_not_modified(request_with(if_none_match='"catalog-3, other"'), etag)
+    assert not is_not_modified(request_with(if_none_match='catalog-3'), etag)  # unquoted: malformed
+
+
+def test_if_none_match_star_needs_a_current_representation():
+    star = request_with(if_none_match="*")
+    assert is_not_modified(star, 'W/"x"', exists=True)
+    assert not is_not_modified(star, 'W/"x"', exists=False)
+
+
+def test_recent_foods_revalidate_on_catalog_changes(client):
+    from app.catalog import upsert_foods
+
+    first = client.get("/api/foods/recent")
+    etag = first.headers["ETag"]
+    assert client.get("/api/foods/recent", headers={"If-None-Match": etag}).status_code == 304
+    upsert_foods([{"id": "recent-etag", "name": "Recent Etag Test"}])
+    assert client.get("/api/foods/recent", headers={"If-None-Match": etag}).status_code == 200
@@ -0,0 +1,22 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def test_app_starts_again_after_shutdown():
+    """Shutdown stops executors, pool and log listener; a second start re-creates them"""
+    for _ in range(2):
+        with TestClient(app) as c:
+            assert c.get("/diary").status_code == 200
+            assert c.get("/admin/nutritionix/cache").status_code == 200
+
+
+def test_metrics_scrape_after_shutdown_does_not_start_executors():
+    from app import async_db, nutritionix_client
+    from app.metrics import render
+
+    with TestClient(app) as c:
+        assert 'executor_workers{executor="sqlite"}' in c.get("/metrics").text
+    text = render()
+    assert async_db._db_executor is None and nutritionix_client._upstream_executor is None
+    assert 'executor_workers{executor="sqlite"}' not in text
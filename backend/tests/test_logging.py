@@ -0,0 +1,36 @@
+import json
+import logging
+import queue
+
+from app.logging_config import DebugSampler, JsonFormatter, _EnqueueHandler
+
+
+def test_records_keep_the_values_they_were_logged_with():
+    log_queue = queue.SimpleQueue()
+    logger = logging.getLogger("tests.logging.snapshot")
+    logger.addHandler(_EnqueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    entry = {"food_name": "Toast", "calories": 120}
+    items = ["a"]
+    logger.info("Saved %s", items, extra={"entry": entry})
+    entry["calories"] = 999  # the caller keeps going before the listener formats
+    items.append("b")
+
+    line = json.loads(JsonFormatter().format(log_queue.get_nowait()))
+    assert line["message"] == "Saved ['a']"
+    assert line["entry"] == {"food_name": "Toast", "calories": 120}
+
+
+def test_debug_sampling_only_applies_to_hot_path_loggers():
+    sampler = DebugSampler(0.0)
+
+    def kept(name, level=logging.DEBUG):
+        return sampler.filter(logging.LogRecord(name, level, __file__, 1, "msg", None, None))
+
+    assert not kept("app.database")
+    assert not kept("app.routes.diary")
+    assert kept("app.database", logging.INFO)
+    assert kept("app.main")
+    assert kept("app.routes.diary_extra")  # a different logger, not a child
@@ -0,0 +1,34 @@
+import ast
+import inspect
+import sqlite3
+
+from app import migrations
+from app.migrations import MIGRATIONS, migrate
+
+
+def test_migrations_do_not_import_app_code():
+    tree = ast.parse(inspect.getsource(migrations))
+    imported = [alias.name for node in ast.walk(tree) if isinstance(node, ast.Import) for alias in node.names]
+    imported += [node.module for node in ast.walk(tree) if isinstance(node, ast.ImportFrom)]
+    assert not [name for name in imported if name.split(".")[0] == "app"]
+
+
+def test_food_usage_backfill_and_seed_catalog(tmp_path):
+    conn = sqlite3.connect(tmp_path / "old.db", isolation_level=None)  # no row factory
+    for version, migration in enumerate(MIGRATIONS[:5], start=1):
+        migration(conn)
+        conn.execute(f"PRAGMA user_version = {version}")
+    columns = ", ".join(migrations._DAILY_TOTALS_NUTRIENTS)
+    zeros = ", ".join("0" for _ in migrations._DAILY_TOTALS_NUTRIENTS)
+    for food_id, name, created_at in [("1", "Apple", "2024-01-01 00:00:00"), ("2", "Banana", "2024-01-02 00:00:00"),
+                                      ("1", "Green Apple", "2024-01-15 00:00:00")]:
+        conn.execute(f"INSERT INTO diary_entries (food_id, food_name, meal_type, quantity, date, day, created_at, {columns}) "
+                     f"VALUES (?, ?, 'snack', 2, '2024-01-01', 19723, ?, {zeros})", (food_id, name, created_at))
+
+    migrate(conn)
+
+    usage = conn.execute("SELECT food_id, food_name, use_count, score FROM food_usage ORDER BY food_id").fetchall()
+    assert [row[:3] for row in usage] == [("1", "Green Apple", 2), ("2", "Banana", 1)]
+    # Two uses, the later one a half-life after the epoch: log(1 + 2)
+    assert abs(usage[0][3] - 1.0986) < 1e-3
+    assert conn.execute("SELECT COUNT(*), MIN(name) FROM foods WHERE source = 'builtin'").fetchone() == (10, "Almonds")
@@ -0,0 +1,23 @@
+import time
+
+from app.database import db_connection, init_database
+from app.nutrition_cache import NutritionCache
+
+
+def test_expired_entry_counts_once_and_writes_purge(monkeypatch):
+    init_database()
+    cache = NutritionCache(ttl=60, purge_interval=3600)
+    cache.set("1 cache test stale", {"calories": 1})
+
+    later = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert cache.get("1 cache test stale") is None  # expired in memory and on disk
+    assert cache.stats()["expirations"] == 1
+
+    # A write after the purge interval removes every expired row
+    cache._next_purge = 0.0
+    cache.set("1 cache test fresh", {"calories": 2})
+    with db_connection() as conn:
+        stored = {row[0] for row in conn.execute("SELECT query FROM nutrition_cache WHERE query LIKE '1 cache test%'")}
+    assert stored == {"1 cache test fresh"}
+    assert cache.stats()["purged"] >= 1
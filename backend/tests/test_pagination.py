@@ -0,0 +1,36 @@
+from datetime import datetime
+
+import pytest
+
+from app.database import save_diary_entries
+from app.pagination import encode_cursor
+
+
+@pytest.mark.parametrize("path, position", [
+    ("/diary", {"created_at": [1], "id": 1}),
+    ("/diary", {"created_at": "2024-01-01 00:00:00", "id": "1"}),
+    ("/diary", {"created_at": "2024-01-01 00:00:00", "id": True}),
+    ("/diary", {"id": 1}),
+    ("/foods", {"after": {"id": 1}}),
+    ("/foods?q=apple", {"offset": "5"}),
+    ("/foods?q=apple", {"offset": -1}),
+    ("/foods?q=apple", {"offset": 5, "q": 3}),
+])
+def test_tampered_cursor_is_a_400(client, path, position):
+    separator = "&" if "?" in path else "?"
+    response = client.get(f"{path}{separator}cursor={encode_cursor(position)}")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_malformed_cursor_is_a_400(client):
+    assert client.get("/diary?cursor=not-base64-json").status_code == 400
+
+
+def test_diary_cursor_round_trip(client):
+    today = datetime.now().strftime("%Y-%m-%d")
+    save_diary_entries([{"food_id": "p", "food_name": f"Cursor {name}", "meal_type": "breakfast",
+                         "quantity": 1, "date": today, "calories": 10} for name in ("Toast", "Egg")])
+    first = client.get("/diary?limit=1").json()
+    second = client.get(f"/diary?limit=1&cursor={first['next_cursor']}").json()
+    assert first["entries"][0]["id"] != second["entries"][0]["id"]
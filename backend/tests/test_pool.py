@@ -0,0 +1,35 @@
+import threading
+import time
+
+import pytest
+
+from app import database
+from app.database import ConnectionPool, PoolExhausted
+
+
+def test_exhausted_pool_raises_instead_of_blocking(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=1, timeout=0.1)
+    conn = pool.acquire()
+    start = time.monotonic()
+    with pytest.raises(PoolExhausted):
+        pool.acquire()
+    assert time.monotonic() - start < 2
+
+    # A connection released while waiting is handed over
+    threading.Timer(0.02, pool.release, (conn,)).start()
+    assert pool.acquire() is conn
+    pool.release(conn)
+    pool.close()
+
+
+def test_exhausted_pool_answers_503(client, monkeypatch):
+    pool = ConnectionPool(database.DATABASE_PATH, size=1, timeout=0.05)
+    held = pool.acquire()
+    monkeypatch.setattr(database, "_pool", pool)
+    try:
+        response = client.get("/user/stats")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+    finally:
+        pool.release(held)
+        pool.close()
@@ -0,0 +1,47 @@
+# The per-day diary reads must stay index range scans on
+# idx_diary_entries_day_created (migration 2), however large the history.
+from contextlib import contextmanager
+
+import pytest
+
+import app.database as database
+from app.database import get_diary_page, init_database
+from app.metrics import count_statement
+
+INDEX = "idx_diary_entries_day_created"
+
+
+@pytest.fixture
+def executed_sql(monkeypatch):
+    """SQL statements (parameters inlined) run by app.database while the test calls it"""
+    init_database()  # migrations are not the statements under test
+    statements = []
+    borrow = database.db_connection
+
+    @contextmanager
+    def traced():
+        with borrow() as conn:
+            conn.set_trace_callback(statements.append)
+            try:
+                yield conn
+            finally:
+                conn.set_trace_callback(count_statement)
+
+    monkeypatch.setattr(database, "db_connection", traced)
+    return statements
+
+
+def query_plan(sql):
+    with database.db_connection() as conn:
+        return [row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+@pytest.mark.parametrize("after", [None, ("2024-03-05 12:00:00", 10)], ids=["first page", "keyset page"])
+def test_diary_page_uses_day_index(executed_sql, after):
+    get_diary_page("2024-03-05", 50, after)
+
+    [sql] = [s for s in executed_sql if "FROM diary_entries" in s]
+    plan = query_plan(sql)
+    assert any(INDEX in step for step in plan), plan
+    assert not any(step.startswith("SCAN diary_entries") for step in plan), plan
+    assert not any("TEMP B-TREE" in step for step in plan), plan  # the index order serves ORDER BY
@@ -0,0 +1,32 @@
+# Cold start budget: a fresh interpreter importing app.main and serving its
+# first request. Workers autoscale, so this is on the critical path.
+import os
+import statistics
+import subprocess
+import sys
+
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1000"))
+
+PROBE = """
+import time
+start = time.perf_counter()
+from fastapi.testclient import TestClient
+from app.main import app
+with TestClient(app) as client:
+    assert client.get("/").status_code == 200
+    print((time.perf_counter() - start) * 1000)
+"""
+
+
+def cold_start_ms(database_path):
+    env = {**os.environ, "DATABASE_PATH": str(database_path), "LOG_LEVEL": "WARNING"}
+    out = subprocess.run([sys.executable, "-c", PROBE], env=env, capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def test_cold_start_within_budget(tmp_path):
+    database = tmp_path / "startup.db"
+    cold_start_ms(database)  # first start runs every migration
+    median = statistics.median(cold_start_ms(database) for _ in range(3))
+    assert median <= STARTUP_BUDGET_MS, f"import + first request took {median:.0f}ms (budget {STARTUP_BUDGET_MS:.0f}ms)"
@@ -0,0 +1,24 @@
+from app.database import db_connection, get_daily_summary, get_range_summary, init_database, save_diary_entry
+
+
+def entry(date, calories):
+    return {"food_id": "t", "food_name": "Test", "meal_type": "snack", "quantity": 1,
+            "date": date, "calories": calories}
+
+
+def test_summaries_compare_totals_with_targets():
+    init_database()
+    with db_connection() as conn:
+        conn.execute("UPDATE user_stats SET calories_target = 2000, zinc_target = 0 WHERE id = 1")
+    save_diary_entry(entry("1987-06-01", 1000))  # a Monday
+    save_diary_entry(entry("1987-06-03", 500))
+
+    day = get_daily_summary("1987-06-01")
+    assert day["percent_of_target"]["calories"] == 50.0
+    assert day["percent_of_target"]["zinc"] is None  # no target
+
+    # The week is clipped to the two requested days: 500 of 2 * 2000 kcal
+    (week,) = get_range_summary("1987-06-02", "1987-06-03", "week")["periods"]
+    assert week["percent_of_target"]["calories"] == 12.5
+    (month,) = get_range_summary("1987-06-01", "1987-06-30", "month")["periods"]
+    assert month["percent_of_target"]["calories"] == 2.5
@@ -0,0 +1,29 @@
+# Nutritionix scheduling against the local stub (benchmarks/stub_nutritionix.py)
+import asyncio
+
+from app.routes.nutrionix import get_nutrition_async
+
+
+def test_concurrent_lookups_share_one_request(client, upstream):
+    stub = upstream(latency=0.1)
+
+    async def lookups():
+        return await asyncio.gather(*(get_nutrition_async("coalesced plum") for _ in range(50)))
+
+    results = asyncio.run(lookups())
+    assert stub.stats["requests"] == 1
+    assert all(result == results[0] and result["calories"] for result in results)
+
+
+def test_exhausted_quota_answers_503(client, upstream):
+    stub = upstream(error_rate=1.0, error_status=429)
+    body = {"food_id": "q", "food_name": "quota kiwi", "meal_type": "snack", "quantity": 100}
+
+    first = client.post("/diary/add", json=body)
+    assert first.status_code == 503
+    assert int(first.headers["Retry-After"]) >= 1
+
+    # Paused: later lookups fail fast without calling upstream again
+    again = client.post("/diary/add", json={**body, "food_name": "quota fig"})
+    assert again.status_code == 503
+    assert stub.stats["requests"] == 1
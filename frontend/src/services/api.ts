@@ -100,6 +100,7 @@ export interface DailySummary {
   phosphorus: number;
   potassium: number;
   zinc: number;
+  percent_of_target: Record<string, number | null>;
 }
 
 export interface UserStats {